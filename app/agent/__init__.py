@@ -1,18 +1,25 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from app.init.model import GPT
+from app.init.config import get_settings
 from app.agent.prompt import MAIN_PROMPT
 from app.agent.searcher import Searcher
+from app.services.redis_service import record_question, get_cached_answer
+from app.services.query_log import record_cache, trace_stage
 import logging
 
 logger = logging.getLogger(__name__)
 
+ERROR_ANSWER = "An error occurred while processing your question."
+GENERATION_ERROR_ANSWER = "Error generating answer."
+
 
 class QueryProcessor:
     """Simple RAG processor for question answering"""
     
     def __init__(self):
+        self.config = get_settings()
         self.gpt_client = GPT()
-        self.searcher = Searcher()
+        self.searcher = Searcher(self.gpt_client)
         self.max_documents = 5
     
     async def process_query(self, question: str) -> str:
@@ -23,20 +30,77 @@ class QueryProcessor:
         3. Collect context from documents
         4. Generate final answer via LLM
         """
+        answer, _ = await self.process_conversation(question)
+        return answer
+    
+    async def process_conversation(self, question: str, state: Optional[Dict] = None) -> Tuple[str, Dict]:
+        """
+        Process question as part of a conversation
+        
+        Args:
+            question: User's question
+            state: Conversation state returned for the previous question, None for a new conversation
+            
+        Returns:
+            Tuple of (answer, new conversation state)
+        """
+        if not state:
+            # New questions feed FAQ warm-up and may already have a precomputed answer
+            await record_question(question)
+            
+            precomputed = await self._get_precomputed_answer(question)
+            if precomputed:
+                logger.info("Serving precomputed answer")
+                answer = precomputed['answer']
+                return answer, self._build_state(question, precomputed['titles'], precomputed['categories'], "", answer)
+        
+        return await self.answer_question(question, state)
+    
+    async def answer_question(self, question: str, state: Optional[Dict] = None) -> Tuple[str, Dict]:
+        """Run the full RAG pipeline, bypassing precomputed answers"""
         try:
+            if state:
+                context, documents = await self.searcher.search_followup(question, state)
+            else:
+                context, documents = await self.searcher.search_documents(question)
 
-            context = await self.searcher.search(question)
-
-            answer = await self._generate_answer(question, context)
+            summary = state.get('summary', '') if state else ''
+            with trace_stage("answer"):
+                answer = await self._generate_answer(question, context, summary)
             
-            return answer
+            titles = list(dict.fromkeys(doc['title'] for doc in documents if doc.get('title')))
+            categories = list(dict.fromkeys(doc['category'] for doc in documents if doc.get('category')))
+            return answer, self._build_state(question, titles, categories, summary, answer)
             
         except Exception as e:
             logger.error(f"Error processing query: {e}")
-            return "An error occurred while processing your question."
+            return ERROR_ANSWER, state or {}
+    
+    async def _get_precomputed_answer(self, question: str) -> Optional[Dict]:
+        """Get answer precomputed by FAQ warm-up for current corpus version"""
+        corpus_version = await self.searcher.retriever.get_corpus_version()
+        if not corpus_version:
+            return None
+        precomputed = await get_cached_answer(question, corpus_version)
+        record_cache("answer", precomputed is not None)
+        return precomputed
+    
+    def _build_state(self, question: str, titles: List[str], categories: List[str], summary: str, answer: str) -> Dict:
+        """Conversation state passed back with the next question of the conversation"""
+        return {
+            "question": question,
+            "titles": titles,
+            "categories": categories,
+            "summary": self._update_summary(summary, question, answer)
+        }
+    
+    def _update_summary(self, summary: str, question: str, answer: str) -> str:
+        """Append the last exchange to the rolling summary, keeping only the most recent part"""
+        summary = f"{summary}\nQ: {question}\nA: {answer[:300]}".strip()
+        return summary[-self.config.CONVERSATION_SUMMARY_CHARS:]
         
     
-    async def _generate_answer(self, question: str, context: str) -> str:
+    async def _generate_answer(self, question: str, context: str, summary: str = "") -> str:
         """Generate final answer using LLM with context"""
         try:
 
@@ -46,10 +110,20 @@ class QueryProcessor:
                 {"role": "system", "content": f"DOCUMENTATION CONTEXT:\n{context}"},
                 {"role": "user", "content": question}
             ]
+            if summary:
+                messages.insert(2, {"role": "system", "content": f"CONVERSATION SO FAR:\n{summary}"})
 
-            response = await self.gpt_client.generate_main_response(messages)
+            escalate = self.gpt_client.should_escalate(question, context)
+            if escalate:
+                logger.info("Escalating final answer to larger model")
+            
+            response = await self.gpt_client.generate_main_response(messages, escalate=escalate)
             return response
             
         except Exception as e:
             logger.error(f"Answer generation error: {e}")
-            return "Error generating answer."
\ No newline at end of file
+            return GENERATION_ERROR_ANSWER
+
+    async def close(self):
+        """Release searcher resources"""
+        await self.searcher.close()
\ No newline at end of file
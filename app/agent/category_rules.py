@@ -0,0 +1,169 @@
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(__file__), "category_rules.json")
+
+# Categories kept per question, as C_SORT_PROMPT asks for 2-3
+MAX_CATEGORIES = 3
+
+# Questions routed by rules vs by the LLM sort, process-wide
+_routing_stats = {"rules": 0, "llm": 0}
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton matching all keywords in one pass over the text"""
+
+    def __init__(self, keywords: List[Tuple[str, int]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, int]]] = [[]]  # (rule index, keyword length)
+
+        for keyword, rule_index in keywords:
+            state = 0
+            for ch in keyword:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.output[state].append((rule_index, len(keyword)))
+
+        # Breadth-first pass sets failure links and merges outputs of suffix states
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                if state:
+                    fallback = self.fail[state]
+                    while fallback and ch not in self.goto[fallback]:
+                        fallback = self.fail[fallback]
+                    self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text: str) -> List[int]:
+        """Indexes of rules whose keywords occur in text as whole words"""
+        matched = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for rule_index, length in self.output[state]:
+                start, end = i - length + 1, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matched.append(rule_index)
+        return matched
+
+
+class CategoryRules:
+    """Resolves question categories from keyword and regex rules without an LLM call"""
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self.automaton = KeywordAutomaton([
+            (keyword.lower(), index)
+            for index, rule in enumerate(rules)
+            for keyword in rule.get("keywords", [])
+        ])
+        self.patterns = [
+            (re.compile(pattern, re.IGNORECASE), index)
+            for index, rule in enumerate(rules)
+            for pattern in rule.get("patterns", [])
+        ]
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "CategoryRules":
+        """Load rules from a JSON config file"""
+        with open(path or DEFAULT_RULES_FILE, encoding="utf-8") as f:
+            rules = json.load(f)["rules"]
+        logger.info(f"Loaded {len(rules)} category rules")
+        return cls(rules)
+
+    def match(self, query: str) -> List[Dict]:
+        """Rules that fire for query"""
+        fired = set(self.automaton.search(query.lower()))
+        fired.update(index for pattern, index in self.patterns if pattern.search(query))
+        return [self.rules[index] for index in sorted(fired)]
+
+    def resolve(self, query: str, available: Optional[List[str]] = None) -> Optional[List[str]]:
+        """
+        Resolve categories for query
+
+        Only the highest-priority rules that fired are used. The query is ambiguous
+        when they select more than MAX_CATEGORIES categories.
+
+        Args:
+            query: User question
+            available: Categories present in the database, others are dropped
+
+        Returns:
+            Categories, or None when no rule fired or the query is ambiguous
+        """
+        fired = self.match(query)
+        if not fired:
+            return None
+
+        top_priority = max(rule.get("priority", 0) for rule in fired)
+        categories = []
+        for rule in fired:
+            if rule.get("priority", 0) == top_priority:
+                categories.extend(c for c in rule["categories"] if c not in categories)
+
+        if available is not None:
+            categories = [c for c in categories if c in available]
+
+        if not categories or len(categories) > MAX_CATEGORIES:
+            return None
+
+        logger.debug(f"Rules {[rule['name'] for rule in fired]} routed to {categories}")
+        return categories
+
+
+def record_routing(by_rules: bool):
+    """Count a question routed by rules or by the LLM sort"""
+    _routing_stats["rules" if by_rules else "llm"] += 1
+
+
+def get_routing_stats() -> Dict[str, float]:
+    """Get number of questions routed by rules and by the LLM sort"""
+    total = _routing_stats["rules"] + _routing_stats["llm"]
+    return {
+        "rules": _routing_stats["rules"],
+        "llm": _routing_stats["llm"],
+        "rules_fraction": round(_routing_stats["rules"] / total, 3) if total else 0.0
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Report the fraction of questions routed without an LLM call")
+    parser.add_argument("--rules", default=None, help="Rules file, defaults to the bundled category_rules.json")
+    parser.add_argument("--log", default=None, help="Query log JSON lines file, questions are read from stdin otherwise")
+    parser.add_argument("--show", action="store_true", help="Print the routing of every question")
+    args = parser.parse_args()
+
+    rules = CategoryRules.from_file(args.rules)
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            questions = [json.loads(line)["question"] for line in f if line.strip()]
+    else:
+        questions = [line.strip() for line in sys.stdin if line.strip()]
+
+    for question in questions:
+        categories = rules.resolve(question)
+        record_routing(categories is not None)
+        if args.show:
+            print(f"{'LLM' if categories is None else ', '.join(categories):<60} {question}")
+
+    stats = get_routing_stats()
+    print(f"Questions: {len(questions)}, routed by rules: {stats['rules']} ({stats['rules_fraction']:.1%}), LLM sort: {stats['llm']}")
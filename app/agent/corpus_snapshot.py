@@ -0,0 +1,219 @@
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from app.agent.utils import DocumentRetriever
+from app.agent.vector_engine import parse_vector, normalize_rows
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Snapshot file layout, little-endian:
+#   header    - HEADER fields below
+#   metadata  - UTF-8 JSON: corpus version, creation time, ids, titles, categories, links
+#   index     - uint64 (offset, length) of each document body in the text section
+#   vectors   - float32 matrix, title rows then content rows, L2-normalized, 64-byte aligned
+#   text      - UTF-8 document bodies
+MAGIC = b"ZDOCSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIQQQQQQ")
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    """Round offset up to ALIGNMENT"""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path: str, rows: List[Dict], version: str):
+    """
+    Write documents with their vectors to a snapshot file and publish it atomically
+
+    The file is written next to path and moved over it with os.replace, so readers
+    see either the old or the new snapshot, never a partial one. Processes that
+    still map the old file keep reading it until they reopen.
+    """
+    bodies = [(row['content'] or '').encode('utf-8') for row in rows]
+    metadata = json.dumps({
+        "version": version,
+        "created_at": time.time(),
+        "ids": [row['id'] for row in rows],
+        "titles": [row['title'] for row in rows],
+        "categories": [row['category'] for row in rows],
+        "links": [row['link'] for row in rows]
+    }, ensure_ascii=False).encode('utf-8')
+
+    vectors = np.ascontiguousarray(normalize_rows(np.vstack(
+        [parse_vector(row['t_vector']) for row in rows] + [parse_vector(row['c_vector']) for row in rows]
+    )), dtype='<f4')
+
+    index = np.zeros((len(rows), 2), dtype='<u8')
+    position = 0
+    for i, body in enumerate(bodies):
+        index[i] = (position, len(body))
+        position += len(body)
+
+    meta_offset = HEADER.size
+    index_offset = _align(meta_offset + len(metadata))
+    vectors_offset = _align(index_offset + index.nbytes)
+    text_offset = vectors_offset + vectors.nbytes
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(rows), vectors.shape[1],
+        meta_offset, len(metadata), index_offset, vectors_offset, text_offset, position
+    )
+
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(metadata)
+            f.write(b'\0' * (index_offset - meta_offset - len(metadata)))
+            f.write(index.tobytes())
+            f.write(b'\0' * (vectors_offset - index_offset - index.nbytes))
+            f.write(vectors.tobytes())
+            for body in bodies:
+                f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class SnapshotContents(Sequence):
+    """Document bodies decoded on access from the mapped text section"""
+
+    def __init__(self, snapshot: "CorpusSnapshot"):
+        self.snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot.titles)
+
+    def __getitem__(self, i: int) -> str:
+        offset, length = self.snapshot.offsets[i]
+        start = self.snapshot.text_offset + int(offset)
+        return self.snapshot.buffer[start:start + int(length)].decode('utf-8')
+
+
+class CorpusSnapshot:
+    """Read-only memory map of a snapshot file
+
+    Vectors are numpy views of the mapping and bodies are decoded on access, so every
+    process mapping the same file shares one copy in the page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+
+        (magic, format_version, count, dim, meta_offset, meta_len,
+         index_offset, vectors_offset, self.text_offset, _) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} corpus snapshot")
+
+        metadata = json.loads(self.buffer[meta_offset:meta_offset + meta_len])
+        self.version: str = metadata["version"]
+        self.created_at: float = metadata["created_at"]
+        self.ids: List[int] = metadata["ids"]
+        self.titles: List[str] = metadata["titles"]
+        self.categories: List[str] = metadata["categories"]
+        self.links: List[Optional[str]] = metadata["links"]
+
+        self.offsets = np.frombuffer(self.buffer, dtype='<u8', count=count * 2, offset=index_offset).reshape(count, 2)
+        self.vectors = np.frombuffer(self.buffer, dtype='<f4', count=2 * count * dim, offset=vectors_offset).reshape(2 * count, dim)
+        self.contents = SnapshotContents(self)
+
+    def is_stale(self) -> bool:
+        """True when a newer snapshot has been published at path"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != self.identity
+
+
+def read_snapshot_version(path: str) -> Optional[str]:
+    """Corpus version of the snapshot at path, None if there is none"""
+    try:
+        return CorpusSnapshot(path).version
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+async def export_snapshot(path: str, force: bool = False) -> Optional[str]:
+    """
+    Export zama_fdocs to a snapshot file if the corpus changed since the last export
+
+    Returns:
+        Version of the exported corpus, None when the snapshot was already current
+    """
+    import asyncio
+
+    retriever = DocumentRetriever()
+    version = await retriever.get_corpus_version(refresh=True)
+    if not version:
+        raise RuntimeError("Corpus version unavailable")
+
+    if not force and read_snapshot_version(path) == version:
+        return None
+
+    rows = await retriever.get_document_vectors()
+    if not rows:
+        raise RuntimeError("No documents to export")
+
+    start = time.perf_counter()
+    await asyncio.to_thread(write_snapshot, path, rows, version)
+    logger.info(f"Exported {len(rows)} documents to {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB) "
+                f"in {(time.perf_counter() - start) * 1000:.0f}ms, corpus version {version[:8]}")
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from app.init.config import get_settings
+
+    parser = argparse.ArgumentParser(description="Export zama_fdocs to a memory-mapped snapshot shared by bot processes")
+    parser.add_argument("--path", default=None, help="Snapshot file, defaults to CORPUS_SNAPSHOT_PATH")
+    parser.add_argument("--force", action="store_true", help="Export even if the snapshot is current")
+    parser.add_argument("--watch", type=int, default=0, help="Re-export every N seconds when the corpus changes")
+    parser.add_argument("--info", action="store_true", help="Print the snapshot header and time to open it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    path = args.path or get_settings().CORPUS_SNAPSHOT_PATH
+    if not path:
+        raise SystemExit("Set CORPUS_SNAPSHOT_PATH or pass --path")
+
+    async def run():
+        from app.init.postgres import init_db_pool
+        from app.init.redis import init_redis_client
+
+        config = get_settings()
+        await init_db_pool(config.DATABASE_URL)
+        await init_redis_client(config.REDIS_URL)
+        while True:
+            version = await export_snapshot(path, force=args.force)
+            if version is None:
+                logger.info("Snapshot is current")
+            if not args.watch:
+                break
+            await asyncio.sleep(args.watch)
+
+    if args.info:
+        start = time.perf_counter()
+        snapshot = CorpusSnapshot(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        print(f"{path}: version {snapshot.version[:8]}, {len(snapshot.titles)} documents, "
+              f"{snapshot.vectors.shape[1]} dimensions, {os.path.getsize(path) / 1024 / 1024:.1f} MB, "
+              f"created {time.ctime(snapshot.created_at)}, opened in {open_ms:.2f}ms")
+    else:
+        asyncio.run(run())
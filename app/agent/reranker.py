@@ -0,0 +1,91 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from app.init.config import get_settings
+from app.agent.utils import DocumentRetriever
+from app.agent.vector_engine import VectorIndex, get_vector_engine, parse_vector, normalize_rows
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LocalReranker:
+    """CPU-only relevance ranking against precomputed document vectors
+
+    Replaces the LLM category/title sort calls with cosine scoring. Scoring runs
+    in a thread pool (numpy releases the GIL) so the event loop is never blocked.
+    """
+
+    def __init__(self, retriever: DocumentRetriever = None):
+        self.config = get_settings()
+        self.retriever = retriever or DocumentRetriever()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.RERANK_WORKERS,
+            thread_name_prefix="reranker"
+        )
+        # Shared with in-memory vector_search, so the corpus is loaded once per version
+        self.engine = get_vector_engine()
+
+    async def _run(self, func, *args):
+        """Run CPU-bound work in the reranker thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _get_index(self) -> Optional[VectorIndex]:
+        """Load vector index, refreshing it when the corpus version changes"""
+        return await self.engine.get_index()
+
+    async def rank(self, embedding_str: str) -> Dict[str, List[str]]:
+        """Select categories and titles for query embedding"""
+        index = await self._get_index()
+        if index is None:
+            return {"categories": [], "titles": []}
+
+        query = normalize_rows(parse_vector(embedding_str)[None, :])[0]
+        categories = await self._run(index.rank_categories, query, self.config.RERANK_CATEGORIES)
+        titles = await self._run(index.rank_titles, query, categories, self.config.RERANK_TITLES)
+        return {"categories": categories, "titles": titles}
+
+    async def close(self):
+        """Stop the reranker thread pool"""
+        self.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    # Benchmark: docs/second scored on this machine with synthetic corpus
+    import os
+
+    def benchmark(num_docs: int, dim: int = 1536, repeats: int = 200):
+        rng = np.random.default_rng(0)
+        rows = [
+            {
+                'title': f"doc {i}",
+                'category': f"category-{i % 8}",
+                't_vector': '[' + ','.join(map(str, rng.standard_normal(dim))) + ']',
+                'c_vector': '[' + ','.join(map(str, rng.standard_normal(dim))) + ']',
+            }
+            for i in range(num_docs)
+        ]
+
+        start = time.perf_counter()
+        index = VectorIndex(rows)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        query = normalize_rows(rng.standard_normal((1, dim)).astype(np.float32))[0]
+        categories = index.rank_categories(query, 3)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.rank_titles(query, categories, 4)
+        elapsed = time.perf_counter() - start
+
+        scored_docs = int(np.isin(index.categories, categories).sum()) * repeats
+        print(f"docs={num_docs:>6}  load={load_ms:8.1f}ms  "
+              f"rank={elapsed / repeats * 1000:7.3f}ms  "
+              f"throughput={scored_docs / elapsed:,.0f} docs/s")
+
+    print(f"Local reranker benchmark (cpu_count={os.cpu_count()})")
+    for num_docs in (100, 500, 2000, 10000):
+        benchmark(num_docs)
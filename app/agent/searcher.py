@@ -1,9 +1,14 @@
 import json
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from app.init.model import GPT
+from app.init.config import get_settings
 from app.agent.prompt import  C_SORT_PROMPT,T_SORT_PROMPT,UPDATE_PROMPT
 from app.agent.utils import DocumentRetriever
+from app.agent.reranker import LocalReranker
+from app.agent.category_rules import CategoryRules, record_routing
+from app.services.query_log import trace_stage, record_selection, record_fallback, record_cache
+from app.services.query_preprocessor import rewrite_locally
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,36 +17,57 @@ logger = logging.getLogger(__name__)
 class Searcher:
     """Query planner for document selection"""
     
-    def __init__(self):
-        self.gpt = GPT()
+    def __init__(self, gpt: GPT = None):
+        self.config = get_settings()
+        self.gpt = gpt or GPT()
         self.retriever = DocumentRetriever()
+        self.reranker = LocalReranker(self.retriever) if self.config.RERANK_MODE == "local" else None
+        self.category_rules = self._load_category_rules()
         self.max_documents = 3
       
 
-    async def search(self, query: str) -> Dict:
+    async def search(self, query: str) -> str:
         """Plan document search for query"""
+        context, _ = await self.search_documents(query)
+        return context
+    
+    async def search_documents(self, query: str) -> Tuple[str, List[Dict]]:
+        """Plan document search for query, returning context and the documents it was built from"""
+        if self.config.SEARCH_MODE == "hybrid":
+            return await self.hybrid_search(query)
+        
         try:
-            categories = await self.sort_by_query(query)
-            logger.info(f"categories: {categories}")
-            
-            if not categories:
-                raise Exception("No relevant categories found")
-            
-            titles = await self.title_sort(query, categories)
+            if self.reranker:
+                with trace_stage("local_sort"):
+                    categories, titles = await self.local_sort(query)
+            else:
+                with trace_stage("category_sort"):
+                    categories = await self.rule_sort(query)
+                    if categories is None:
+                        categories = await self.sort_by_query(query)
+                logger.info(f"categories: {categories}")
+                
+                if not categories:
+                    raise Exception("No relevant categories found")
+                
+                with trace_stage("title_sort"):
+                    titles = await self.title_sort(query, categories)
             logger.info(f"titles: {titles}")
+            record_selection(categories, titles)
             
             if not titles:
                 raise Exception("No relevant titles found")
             
             # Get documents by titles from selected categories
-            documents = await self.retriever.get_content_by_title_and_category(titles, categories)
+            with trace_stage("documents"):
+                documents = await self.retriever.get_content_by_title_and_category(titles, categories)
             
             if len(documents) == 0:
                 raise Exception("No documents found")
             
             # Build context from found documents
             context = self._build_context(documents)
-            return context
+            return context, documents
         
         except json.JSONDecodeError as e:
             logger.error(f"JSON parsing error: {e}")
@@ -50,19 +76,106 @@ class Searcher:
             logger.error(f"Planner error: {e}")
             return await self._create_fallback_response(str(e), query)
     
-    async def _create_fallback_response(self, error: str, query: str) -> str:
+    async def search_followup(self, query: str, state: Dict) -> Tuple[str, List[Dict]]:
+        """Search for a follow-up question, reusing previous documents when the topic is unchanged
+        
+        The follow-up is embedded together with the previous question, so "and how do I deploy it?"
+        keeps its subject. If the nearest documents overlap the previously used ones the topic is
+        considered unchanged: previous documents are reused and extended, and the sort calls are skipped.
+        """
+        previous_titles = state.get('titles', [])
+        previous_categories = state.get('categories', [])
+        
+        try:
+            if not previous_titles or not previous_categories:
+                raise Exception("No previous documents")
+            
+            with trace_stage("followup_search"):
+                embedding_str = await self.gpt.generate_embedding(f"{state.get('question', '')}\n{query}", dimensions=self.retriever.query_dimensions())
+                nearest = await self.retriever.vector_search(embedding_str, limit=self.max_documents)
+            
+            if not any(doc['title'] in previous_titles for doc in nearest):
+                raise Exception("Topic changed")
+            
+            with trace_stage("documents"):
+                previous = await self.retriever.get_content_by_title_and_category(previous_titles, previous_categories)
+            record_selection(previous_categories, previous_titles)
+            documents = previous + [doc for doc in nearest if doc['title'] not in previous_titles]
+            logger.info(f"Follow-up reused {len(previous)} documents, added {len(documents) - len(previous)}")
+            
+            return self._build_context(documents), documents
+        
+        except Exception as e:
+            logger.info(f"Follow-up runs full search: {e}")
+            return await self.search_documents(query)
+    
+    async def _create_fallback_response(self, error: str, query: str) -> Tuple[str, List[Dict]]:
         """Create fallback response using vector search"""
         logger.info(f"Fallback triggered: {error}")
         logger.info("Using vector search fallback")
+        record_fallback()
         
         try:
-            updated_query = await self.update_query(query)
-            documents = await self._search_documents(updated_query, limit=4)
+            with trace_stage("rewrite"):
+                updated_query = await self.update_query(query)
+            with trace_stage("fallback_search"):
+                documents = await self._search_documents(updated_query, limit=4)
             context = self._build_context(documents)
-            return context
+            return context, documents
         except Exception as e:
             logger.error(f"Fallback error: {e}")
-            return f"Error in fallback: {str(e)}"
+            return f"Error in fallback: {str(e)}", []
+    
+    async def hybrid_search(self, query: str) -> Tuple[str, List[Dict]]:
+        """Search documents with full-text + vector fusion, without LLM sort calls"""
+        try:
+            with trace_stage("hybrid_search"):
+                documents = await self._search_documents(query, limit=self.max_documents + 1)
+            
+            if len(documents) == 0:
+                raise Exception("No documents found")
+            
+            return self._build_context(documents), documents
+        except Exception as e:
+            logger.error(f"Hybrid search error: {e}")
+            return await self._create_fallback_response(str(e), query)
+    
+    async def local_sort(self, query: str) -> Tuple[List[str], List[str]]:
+        """Select categories and titles with the local reranker instead of LLM sort calls"""
+        embedding_str = await self.gpt.generate_embedding(query)
+        ranked = await self.reranker.rank(embedding_str)
+        logger.info(f"categories: {ranked['categories']}")
+        
+        if not ranked['categories']:
+            raise Exception("No relevant categories found")
+        
+        return ranked['categories'], ranked['titles']
+    
+    def _load_category_rules(self) -> Optional[CategoryRules]:
+        """Load category routing rules, None when disabled or the file is invalid"""
+        if not self.config.CATEGORY_RULES_ENABLED:
+            return None
+        try:
+            return CategoryRules.from_file(self.config.CATEGORY_RULES_FILE)
+        except Exception as e:
+            logger.error(f"Category rules load error: {e}")
+            return None
+    
+    async def rule_sort(self, query: str) -> Optional[List[str]]:
+        """Resolve categories from keyword rules, None when the LLM sort is needed"""
+        if not self.category_rules:
+            return None
+        
+        try:
+            categories_data = await self.retriever.get_categories()
+            categories = self.category_rules.resolve(query, [cat['category'] for cat in categories_data])
+        except Exception as e:
+            logger.error(f"Rule sort error: {e}")
+            categories = None
+        
+        record_routing(categories is not None)
+        record_cache("category_rules", categories is not None)
+        return categories
     
     async def sort_by_query(self, query: str) -> List[str]:
         """Sort categories by query"""
@@ -172,8 +285,13 @@ class Searcher:
         
     
     async def update_query(self, query:str) -> str:
-        """Update query for search"""
+        """Update query for search, skipping the LLM for clean English queries"""
         try:
+            local_query = await rewrite_locally(query)
+            record_cache("local_rewrite", local_query is not None)
+            if local_query:
+                return local_query
+
             return await self.gpt.update_question([
                 {"role": "system", "content": UPDATE_PROMPT},
                 {"role": "user", "content": query}
@@ -183,10 +301,13 @@ class Searcher:
             return query
         
     async def _search_documents(self, question: str, limit: int = 4) -> List[Dict]:
-        """Search for documents using vector similarity"""
+        """Search for documents using full-text + vector similarity fusion"""
         try:
-            embedding_str = await self.gpt.generate_embedding(question)
-            documents = await self.retriever.vector_search(embedding_str, limit=limit)
+            embedding_str = await self.gpt.generate_embedding(question, dimensions=self.retriever.query_dimensions())
+            documents = await self.retriever.hybrid_search(question, embedding_str, limit=limit)
+            
+            if not documents:
+                documents = await self.retriever.vector_search(embedding_str, limit=limit)
             
             return documents
         except Exception as e:
@@ -202,7 +323,7 @@ class Searcher:
             similarity = doc.get('similarity', 0)
             
             # Keep document with highest similarity if duplicate title exists
-            if title not in unique_docs or similarity > unique_docs[title]['similarity']:
+            if title not in unique_docs or similarity > unique_docs[title].get('similarity', 0):
                 unique_docs[title] = doc
         
         # Step 2: Sort by similarity and take all documents
@@ -222,12 +343,16 @@ class Searcher:
         
         return "\n".join(context_parts)
 
+    async def close(self):
+        """Release the local reranker threads"""
+        if self.reranker:
+            await self.reranker.close()
+
 
 if __name__ == "__main__":
     import asyncio
     from app.init.postgres import init_db_pool
     from app.init.redis import init_redis_client
-    from app.init.config import get_settings
     
 
     async def test_planner():
@@ -1,33 +1,242 @@
-from typing import List, Dict, Union
-from app.init.postgres import get_db_pool
-from app.services.redis_service import get_cached_categories, cache_categories, get_cached_titles, cache_titles_by_category, get_cached_documents_by_title_category, cache_documents_by_title_category
+from typing import List, Dict, Optional, Union
+from app.init.postgres import acquire_connection, hnsw_candidates, register_statement, query_timeout, LOOKUP, SEARCH, BULK
+from app.init.config import get_settings
+from app.services.redis_service import get_cached_categories, cache_categories, get_cached_titles, cache_titles_by_category, get_cached_documents_by_title_category, cache_documents_by_title_category, get_cached_corpus_version, cache_corpus_version
+from app.services.query_log import record_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fixed-shape queries: list parameters are bound as arrays so every call
+# reuses the same prepared statement and plan regardless of list length
+TITLES_BY_CATEGORIES = "titles_by_categories"
+CONTENT_BY_TITLES = "content_by_titles"
+CONTENT_BY_TITLES_AND_CATEGORIES = "content_by_titles_and_categories"
+HYBRID_SEARCH = "hybrid_search"
+COMPACT_VECTOR_SEARCH = "compact_vector_search"
+DOCUMENT_VECTORS = "document_vectors"
+ALL_TITLES = "all_titles"
+DOCUMENT_BY_ID = "document_by_id"
+
+register_statement(TITLES_BY_CATEGORIES, '''
+    SELECT 
+      id,
+      title,
+      category
+    FROM zama_fdocs
+    WHERE category = ANY($1::text[])
+    ORDER BY id
+''')
+
+register_statement(CONTENT_BY_TITLES, '''
+    SELECT 
+      id,
+      title,
+      content,
+      category
+    FROM zama_fdocs
+    WHERE title = ANY($1::text[])
+''')
+
+register_statement(CONTENT_BY_TITLES_AND_CATEGORIES, '''
+    SELECT 
+      title,
+      content,
+      link,
+      category
+    FROM zama_fdocs
+    WHERE title = ANY($1::text[]) AND category = ANY($2::text[])
+''')
+
+register_statement(ALL_TITLES, '''
+    SELECT 
+      id,
+      title,
+      category
+    FROM zama_fdocs
+    ORDER BY id
+''', BULK)
+
+register_statement(DOCUMENT_BY_ID, '''
+    SELECT 
+      id,
+      title,
+      content,
+      link,
+      category
+    FROM zama_fdocs
+    WHERE id = $1
+''')
+
+register_statement(DOCUMENT_VECTORS, '''
+    SELECT 
+      id,
+      title,
+      content,
+      link,
+      category,
+      t_vector::text AS t_vector,
+      c_vector::text AS c_vector
+    FROM zama_fdocs
+    ORDER BY id
+''', BULK)
+
+# Vector storage modes: the full-precision vector columns, or the compact halfvec/binary
+# columns added by app.agent.vector_storage. Compact columns keep the leading VECTOR_DIMENSIONS
+# of each vector; their index scan returns candidates that are reranked at full precision.
+# Their statements are registered for every mode but only prepared once used (see
+# PreparedConnection.prepare_registered), so deployments without the columns never prepare them.
+FULL = "full"
+HALFVEC = "halfvec"
+BINARY = "binary"
+
+COMPACT_SUFFIX = {HALFVEC: "half", BINARY: "bin"}
+
+
+def compact_distance(column: str, mode: str, query: str, dims: str) -> str:
+    """SQL distance of a compact column to the query embedding truncated to dims, served by its HNSW index"""
+    if mode == HALFVEC:
+        return f"{column}_half <=> subvector({query}::vector, 1, {dims})::halfvec"
+    return f"{column}_bin <~> binary_quantize(subvector({query}::vector, 1, {dims}))"
+
+
+def exact_distance(column: str, query: str, dims: str) -> str:
+    """SQL full-precision cosine distance over the leading dims of a full vector column"""
+    return f"subvector({column}, 1, {dims}) <=> subvector({query}::vector, 1, {dims})"
+
+
+def _vector_ranking(column: str, mode: str) -> str:
+    """Top $3 document ids by distance to the query embedding $2"""
+    if mode == FULL:
+        return f'''
+        SELECT id, ROW_NUMBER() OVER (ORDER BY {column} <=> $2::vector) AS rank
+        FROM zama_fdocs
+        ORDER BY {column} <=> $2::vector
+        LIMIT $3'''
+    # $6 - dimensions, $7 - compact candidates
+    return f'''
+        SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+        FROM (
+            SELECT id, {exact_distance(column, "$2", "$6")} AS distance
+            FROM zama_fdocs
+            ORDER BY {compact_distance(column, mode, "$2", "$6")}
+            LIMIT $7
+        ) candidates
+        ORDER BY distance
+        LIMIT $3'''
+
+
+def _hybrid_query(mode: str) -> str:
+    """Full-text and vector rankings fused with reciprocal rank fusion in one round trip
+
+    Each ranking is an index-backed top-k: GIN on search_tsv, ivfflat on the full vectors
+    or HNSW on the compact ones.
+    """
+    return f'''
+    WITH text_ranked AS (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY ts_rank_cd(search_tsv, query) DESC) AS rank
+        FROM zama_fdocs, websearch_to_tsquery('english', $1) AS query
+        WHERE search_tsv @@ query
+        ORDER BY ts_rank_cd(search_tsv, query) DESC
+        LIMIT $3
+    ),
+    title_ranked AS ({_vector_ranking("t_vector", mode)}
+    ),
+    content_ranked AS ({_vector_ranking("c_vector", mode)}
+    ),
+    fused AS (
+        SELECT id, SUM(1.0 / ($4 + rank)) AS score
+        FROM (
+            SELECT id, rank FROM text_ranked
+            UNION ALL
+            SELECT id, rank FROM title_ranked
+            UNION ALL
+            SELECT id, rank FROM content_ranked
+        ) rankings
+        GROUP BY id
+    )
+    SELECT 
+      d.title,
+      d.content,
+      d.link,
+      d.category,
+      f.score::float AS similarity
+    FROM fused f
+    JOIN zama_fdocs d ON d.id = f.id
+    ORDER BY f.score DESC
+    LIMIT $5
+'''
+
+
+def _compact_vector_query(mode: str) -> str:
+    """Best of title and content similarity, computed at full precision for compact-column candidates"""
+    return f'''
+    WITH candidates AS (
+        (
+            SELECT id FROM zama_fdocs
+            ORDER BY {compact_distance("t_vector", mode, "$1", "$3")}
+            LIMIT $4
+        )
+        UNION
+        (
+            SELECT id FROM zama_fdocs
+            ORDER BY {compact_distance("c_vector", mode, "$1", "$3")}
+            LIMIT $4
+        )
+    )
+    SELECT 
+      title,
+      content,
+      link,
+      category,
+      GREATEST(
+          1 - ({exact_distance("t_vector", "$1", "$3")}),
+          1 - ({exact_distance("c_vector", "$1", "$3")})
+      ) AS similarity
+    FROM zama_fdocs
+    WHERE id IN (SELECT id FROM candidates)
+    ORDER BY similarity DESC
+    LIMIT $2
+'''
+
+
+register_statement(HYBRID_SEARCH, _hybrid_query(FULL), SEARCH)
+for _mode in COMPACT_SUFFIX:
+    register_statement(f"{HYBRID_SEARCH}_{_mode}", _hybrid_query(_mode), SEARCH)
+    register_statement(f"{COMPACT_VECTOR_SEARCH}_{_mode}", _compact_vector_query(_mode), SEARCH)
+
 
 class DocumentRetriever:
     """Class for retrieving documents from database"""
     
-    @staticmethod
-    def _build_where_conditions(field_name: str, values: List[str], start_param: int = 1) -> tuple[str, List[str]]:
-        """Build WHERE conditions for multiple values"""
-        if not values:
-            return "", []
+    def query_dimensions(self) -> Optional[int]:
+        """Embedding dimensions to request for searches, None for full-length vectors"""
+        config = get_settings()
+        # The in-memory engine holds full-length vectors
+        if config.VECTOR_STORAGE == FULL or config.VECTOR_SEARCH_ENGINE == "memory":
+            return None
+        return config.VECTOR_DIMENSIONS
+    
+    async def vector_search(self, embedding_str: str, limit: int = 4) -> List[Dict]:
+        """Search documents by vector similarity, in process when the vector engine is enabled"""
+        if get_settings().VECTOR_SEARCH_ENGINE == "memory":
+            # Imported here - the engine module imports this one
+            from app.agent.vector_engine import get_vector_engine
+            try:
+                return await get_vector_engine().search(embedding_str, limit)
+            except Exception as e:
+                logger.error(f"In-memory vector search error, using Postgres: {e}")
         
-        placeholders = []
-        for i, _ in enumerate(values, start=start_param):
-            placeholders.append(f"${i}")
+        return await self.postgres_vector_search(embedding_str, limit)
+    
+    async def postgres_vector_search(self, embedding_str: str, limit: int = 4) -> List[Dict]:
+        """Search documents by vector similarity in Postgres"""
+        config = get_settings()
+        if config.VECTOR_STORAGE != FULL:
+            return await self.compact_vector_search(embedding_str, limit, config.VECTOR_STORAGE)
         
-        where_clause = f"{field_name} IN ({', '.join(placeholders)})"
-        return where_clause, values
-
-    async def vector_search(self, embedding_str: str, limit: int = 4) -> List[Dict]:
-        """Search documents by vector similarity"""
         try:
-            pool = await get_db_pool()
-            
-            async with pool.acquire() as conn:
+            async with acquire_connection(SEARCH) as conn:
                 results = await conn.fetch('''
                     SELECT 
                         title,
@@ -44,7 +253,7 @@ class DocumentRetriever:
                         1 - (c_vector <=> $1::vector)
                         ) DESC
                     LIMIT $2
-                ''', embedding_str, limit)
+                ''', embedding_str, limit, timeout=query_timeout(SEARCH))
                 
                 return [dict(row) for row in results]
         
@@ -52,24 +261,107 @@ class DocumentRetriever:
             logger.error(f"Vector search error: {e}")
             return []
 
+    async def compact_vector_search(self, embedding_str: str, limit: int = 4, mode: str = HALFVEC, candidates: Optional[int] = None) -> List[Dict]:
+        """Search compact halfvec/binary columns, reranking their candidates at full precision"""
+        try:
+            config = get_settings()
+            candidates = max(candidates or config.VECTOR_RERANK_CANDIDATES, limit)
+            async with acquire_connection(SEARCH) as conn:
+                async with hnsw_candidates(conn, candidates):
+                    results = await conn.fetch_prepared(
+                        f"{COMPACT_VECTOR_SEARCH}_{mode}",
+                        embedding_str,
+                        limit,
+                        config.VECTOR_DIMENSIONS,
+                        candidates
+                    )
+                
+                return [dict(row) for row in results]
+        
+        except Exception as e:
+            logger.error(f"Compact vector search error: {e}")
+            return []
+
+    async def hybrid_search(self, query: str, embedding_str: str, limit: int = 4) -> List[Dict]:
+        """Search documents by full-text and vector rankings fused with RRF
+        
+        'similarity' holds the fused RRF score, so results sort the same way as vector_search ones
+        """
+        try:
+            config = get_settings()
+            args = [query, embedding_str, config.HYBRID_CANDIDATES, config.HYBRID_RRF_K, limit]
+            name = HYBRID_SEARCH
+            candidates = 0  # Full vectors are scanned through ivfflat, ef_search does not apply
+            if config.VECTOR_STORAGE != FULL:
+                name = f"{HYBRID_SEARCH}_{config.VECTOR_STORAGE}"
+                candidates = max(config.VECTOR_RERANK_CANDIDATES, config.HYBRID_CANDIDATES)
+                args += [config.VECTOR_DIMENSIONS, candidates]
+            
+            async with acquire_connection(SEARCH) as conn:
+                async with hnsw_candidates(conn, candidates):
+                    results = await conn.fetch_prepared(name, *args)
+                
+                return [dict(row) for row in results]
+        
+        except Exception as e:
+            logger.error(f"Hybrid search error: {e}")
+            return []
+
+    async def get_document_vectors(self) -> List[Dict]:
+        """Get all documents with their precomputed title and content vectors"""
+        try:
+            async with acquire_connection(BULK) as conn:
+                results = await conn.fetch_prepared(DOCUMENT_VECTORS)
+                
+                return [dict(row) for row in results]
+        
+        except Exception as e:
+            logger.error(f"Get document vectors error: {e}")
+            return []
+
+    async def get_corpus_version(self, refresh: bool = False) -> Optional[str]:
+        """Get corpus version - a hash over all documents, changes whenever the docs change"""
+        try:
+            if not refresh:
+                cached_version = await get_cached_corpus_version()
+                if cached_version:
+                    return cached_version
+            
+            async with acquire_connection(BULK) as conn:
+                version = await conn.fetchval('''
+                    SELECT md5(string_agg(
+                        id::text || ':' || md5(title || coalesce(category, '') || coalesce(link, '') || content),
+                        ',' ORDER BY id
+                    ))
+                    FROM zama_fdocs
+                ''', timeout=query_timeout(BULK))
+                
+                if version:
+                    await cache_corpus_version(version)
+                
+                return version
+        
+        except Exception as e:
+            logger.error(f"Get corpus version error: {e}")
+            return None
+
     async def get_categories(self) -> List[Dict]:
         """Get all categories from cache or database"""
         try:
             # Try to get from cache first
             cached_categories = await get_cached_categories()
+            record_cache("categories", bool(cached_categories))
             if cached_categories:
                 return cached_categories
             
             # If not in cache, get from database
-            pool = await get_db_pool()
-            
-            async with pool.acquire() as conn:
+            async with acquire_connection(LOOKUP) as conn:
                 results = await conn.fetch('''
                     SELECT DISTINCT
                         category
                     FROM zama_fdocs
                     ORDER BY category
-                ''')
+                ''', timeout=query_timeout(LOOKUP))
                 
                 categories = [dict(row) for row in results]
                 
@@ -91,26 +383,13 @@ class DocumentRetriever:
             
             # Try to get from cache first
             cached_titles = await get_cached_titles(categories)
+            record_cache("titles", bool(cached_titles))
             if cached_titles:
                 return cached_titles
             
             # If not in cache, get from database
-            pool = await get_db_pool()
-            
-            async with pool.acquire() as conn:
-                where_clause, values = self._build_where_conditions("category", categories)
-                
-                query = f'''
-                    SELECT 
-                      id,
-                      title,
-                      category
-                    FROM zama_fdocs
-                    WHERE {where_clause}
-                    ORDER BY id
-                '''
-                
-                results = await conn.fetch(query, *values)
+            async with acquire_connection(LOOKUP) as conn:
+                results = await conn.fetch_prepared(TITLES_BY_CATEGORIES, categories)
                 all_titles = [dict(row) for row in results]
                 
                 # Group titles by category for caching
@@ -130,29 +409,39 @@ class DocumentRetriever:
             logger.error(f"Get titles error: {e}")
             return []
         
+    async def get_all_titles(self) -> List[Dict]:
+        """Get id, title and category of every document straight from the database, bypassing the titles cache"""
+        try:
+            async with acquire_connection(BULK) as conn:
+                results = await conn.fetch_prepared(ALL_TITLES)
+                
+                return [dict(row) for row in results]
+        
+        except Exception as e:
+            logger.error(f"Get all titles error: {e}")
+            return []
+    
+    async def get_document_by_id(self, document_id: int) -> Optional[Dict]:
+        """Get one document by id"""
+        try:
+            async with acquire_connection(LOOKUP) as conn:
+                results = await conn.fetch_prepared(DOCUMENT_BY_ID, document_id)
+                
+                return dict(results[0]) if results else None
+        
+        except Exception as e:
+            logger.error(f"Get document by id error: {e}")
+            return None
+        
     async def get_content_by_title(self, titles: Union[str, List[str]]) -> List[Dict]:
         """Get content by titles"""
         try:
-            pool = await get_db_pool()
-            
             # Convert single title to list for uniform handling
             if isinstance(titles, str):
                 titles = [titles]
             
-            async with pool.acquire() as conn:
-                where_clause, values = self._build_where_conditions("title", titles)
-                
-                query = f'''
-                    SELECT 
-                      id,
-                      title,
-                      content,
-                      category
-                    FROM zama_fdocs
-                    WHERE {where_clause}
-                '''
-                
-                results = await conn.fetch(query, *values)
+            async with acquire_connection(LOOKUP) as conn:
+                results = await conn.fetch_prepared(CONTENT_BY_TITLES, titles)
                 
                 return [dict(row) for row in results]
         
@@ -171,28 +460,13 @@ class DocumentRetriever:
             
             # Try to get from cache first
             cached_documents = await get_cached_documents_by_title_category(titles, categories)
+            record_cache("documents", bool(cached_documents))
             if cached_documents:
                 return cached_documents
             
             # If not in cache, get from database
-            pool = await get_db_pool()
-            
-            async with pool.acquire() as conn:
-                # Build WHERE conditions for both titles and categories
-                title_clause, title_values = self._build_where_conditions("title", titles, start_param=1)
-                category_clause, category_values = self._build_where_conditions("category", categories, start_param=len(titles) + 1)
-                
-                query = f'''
-                    SELECT 
-                      title,
-                      content,
-                      link,
-                      category
-                    FROM zama_fdocs
-                    WHERE {title_clause} AND {category_clause}
-                '''
-                
-                results = await conn.fetch(query, *title_values, *category_values)
+            async with acquire_connection(LOOKUP) as conn:
+                results = await conn.fetch_prepared(CONTENT_BY_TITLES_AND_CATEGORIES, titles, categories)
                 documents = [dict(row) for row in results]
                 
                 # Cache the results
@@ -0,0 +1,338 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.init.config import get_settings
+from app.agent.utils import DocumentRetriever
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_vector(vector_str: str) -> np.ndarray:
+    """Parse pgvector text representation '[x,y,...]' into float32 array"""
+    return np.array(vector_str.strip('[]').split(','), dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize matrix rows so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """Normalized title/content vectors of the corpus held in memory"""
+
+    def __init__(self, rows: List[Dict]):
+        # Title rows then content rows in one contiguous float32 matrix, so a query is a single
+        # BLAS matrix-vector product
+        matrix = np.ascontiguousarray(normalize_rows(np.vstack(
+            [parse_vector(row['t_vector']) for row in rows] + [parse_vector(row['c_vector']) for row in rows]
+        )), dtype=np.float32)
+        self._setup(
+            [row['title'] for row in rows],
+            [row.get('content', '') for row in rows],
+            [row.get('link') for row in rows],
+            [row['category'] for row in rows],
+            matrix
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "VectorIndex":
+        """Index over a mapped CorpusSnapshot, sharing its vectors and bodies instead of copying them"""
+        index = cls.__new__(cls)
+        index._setup(snapshot.titles, snapshot.contents, snapshot.links, snapshot.categories, snapshot.vectors)
+        return index
+
+    def _setup(self, titles: List[str], contents: Sequence[str], links: List[Optional[str]], categories: List[str], matrix: np.ndarray):
+        """Set documents and their normalized vectors, t_matrix and c_matrix are views of the matrix halves"""
+        self.titles = titles
+        self.contents = contents
+        self.links = links
+        self.categories = np.array(categories, dtype=object)
+        self.matrix = matrix
+        self.t_matrix = self.matrix[:len(titles)]
+        self.c_matrix = self.matrix[len(titles):]
+
+        # Category masks and centroids for filtering and category ranking
+        self.category_names = sorted(set(self.categories))
+        self.category_masks = {category: self.categories == category for category in self.category_names}
+        self.centroids = normalize_rows(np.vstack([
+            self.c_matrix[self.category_masks[category]].mean(axis=0)
+            for category in self.category_names
+        ]))
+
+    def mask_for(self, categories: List[str]) -> np.ndarray:
+        """Boolean mask of documents in any of categories"""
+        mask = np.zeros(len(self.titles), dtype=bool)
+        for category in categories:
+            if category in self.category_masks:
+                mask |= self.category_masks[category]
+        return mask
+
+    def score(self, query: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Document scores - best of title and content cosine, same as vector_search"""
+        t_matrix, c_matrix = self.t_matrix, self.c_matrix
+        if mask is not None:
+            t_matrix, c_matrix = t_matrix[mask], c_matrix[mask]
+        return np.maximum(t_matrix @ query, c_matrix @ query)
+
+    def top_k(self, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best k documents for a batch of normalized queries
+
+        Args:
+            queries: Query vectors, one per row
+            k: Documents per query
+            mask: Documents allowed, all when None
+
+        Returns:
+            Document indices and scores, one row per query, best first
+        """
+        # (documents, queries) scores; masked documents sink to the bottom instead of copying the matrices
+        products = self.matrix @ queries[0][:, None] if len(queries) == 1 else self.matrix @ queries.T
+        n = len(self.titles)
+        scores = np.maximum(products[:n], products[n:])
+        if mask is not None:
+            scores[~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+
+        # argpartition is O(n) per query, only the k selected are sorted
+        candidates = np.argpartition(-scores, k - 1, axis=0)[:k].T
+        candidate_scores = np.take_along_axis(scores.T, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+    def document(self, i: int, similarity: float) -> Dict:
+        """Document i shaped like a vector_search row"""
+        return {
+            "title": self.titles[i],
+            "content": self.contents[i],
+            "link": self.links[i],
+            "category": self.categories[i],
+            "similarity": float(similarity)
+        }
+
+    def rank_categories(self, query: np.ndarray, top_k: int) -> List[str]:
+        """Rank categories by cosine between query and category centroid"""
+        scores = self.centroids @ query
+        order = np.argsort(-scores)[:top_k]
+        return [self.category_names[i] for i in order]
+
+    def rank_titles(self, query: np.ndarray, categories: List[str], top_k: int) -> List[str]:
+        """Rank titles inside selected categories"""
+        mask = self.mask_for(categories)
+        indices = np.flatnonzero(mask)
+        if len(indices) == 0:
+            return []
+
+        scores = self.score(query, mask)
+        order = np.argsort(-scores)
+
+        selected_titles = []
+        for i in order:
+            title = self.titles[indices[i]]
+            if title not in selected_titles:
+                selected_titles.append(title)
+            if len(selected_titles) == top_k:
+                break
+        return selected_titles
+
+
+class VectorEngine:
+    """In-process vector search over the whole corpus, reloaded when the corpus version changes
+
+    Searches run inline on the event loop: for a corpus of this size a query is one
+    small matrix-vector product, cheaper than a hop to a thread pool.
+    """
+
+    def __init__(self, retriever: DocumentRetriever = None):
+        self.config = get_settings()
+        self.retriever = retriever or DocumentRetriever()
+        self.index: Optional[VectorIndex] = None
+        self.version: Optional[str] = None
+        self.snapshot = None  # CorpusSnapshot the index maps, None when loaded from Postgres
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Load the corpus now, used at startup so the first question does not pay for it"""
+        await self.refresh()
+
+    async def refresh(self):
+        """Reload documents and vectors if the corpus version changed"""
+        async with self._lock:
+            try:
+                version = await self.retriever.get_corpus_version()
+                if self.config.CORPUS_SNAPSHOT_PATH and await self._load_snapshot(version):
+                    pass
+                elif self.index is None or self.snapshot is not None or (version and version != self.version):
+                    rows = await self.retriever.get_document_vectors()
+                    if rows:
+                        start = time.perf_counter()
+                        # Parsing and normalizing is CPU-bound, keep it off the event loop
+                        self.index = await asyncio.to_thread(VectorIndex, rows)
+                        self.version = version
+                        self.snapshot = None
+                        logger.info(f"Vector engine loaded {len(rows)} documents "
+                                    f"({self.index.matrix.nbytes / 1024 / 1024:.1f} MB) "
+                                    f"in {(time.perf_counter() - start) * 1000:.0f}ms, corpus version {str(version)[:8]}")
+            except Exception as e:
+                logger.error(f"Vector engine refresh error: {e}")
+            self._checked_at = time.monotonic()
+
+    async def _load_snapshot(self, version: Optional[str]) -> bool:
+        """Serve the index from the mapped snapshot, False when it is missing or behind the corpus"""
+        # Imported here - the snapshot module imports this one
+        from app.agent.corpus_snapshot import CorpusSnapshot
+
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.is_stale():
+            try:
+                snapshot = CorpusSnapshot(self.config.CORPUS_SNAPSHOT_PATH)
+            except (FileNotFoundError, ValueError) as e:
+                logger.warning(f"Corpus snapshot unavailable, loading from Postgres: {e}")
+                return False
+
+        # Without a corpus version (database down) any snapshot is better than none
+        if version and snapshot.version != version:
+            logger.warning(f"Corpus snapshot {snapshot.version[:8]} is behind corpus version {version[:8]}, loading from Postgres")
+            return False
+
+        if snapshot is not self.snapshot:
+            start = time.perf_counter()
+            self.index = await asyncio.to_thread(VectorIndex.from_snapshot, snapshot)
+            self.version = snapshot.version
+            self.snapshot = snapshot
+            logger.info(f"Vector engine mapped {len(snapshot.titles)} documents from {snapshot.path} "
+                        f"in {(time.perf_counter() - start) * 1000:.0f}ms, corpus version {snapshot.version[:8]}")
+        return True
+
+    async def get_index(self) -> Optional[VectorIndex]:
+        """Current index, loaded on first use; version checks run in the background afterwards"""
+        if self.index is None:
+            await self.refresh()
+        elif time.monotonic() - self._checked_at >= self.config.CORPUS_VERSION_TTL_SECONDS:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh())
+        return self.index
+
+    async def search(self, embedding_str: str, limit: int = 4, categories: Optional[List[str]] = None) -> List[Dict]:
+        """Search documents by vector similarity, optionally within categories"""
+        index = await self.get_index()
+        if index is None:
+            raise RuntimeError("Vector engine has no documents loaded")
+
+        query = normalize_rows(parse_vector(embedding_str)[None, :])
+        indices, scores = index.top_k(query, limit, index.mask_for(categories) if categories else None)
+        return [index.document(i, score) for i, score in zip(indices[0], scores[0])]
+
+    async def close(self):
+        """Cancel a background refresh still in progress"""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+
+
+# Global vector engine
+_engine: Optional[VectorEngine] = None
+
+
+def get_vector_engine() -> VectorEngine:
+    """Get process-wide vector engine"""
+    global _engine
+    if _engine is None:
+        _engine = VectorEngine()
+    return _engine
+
+
+async def init_vector_engine():
+    """Load the corpus into the vector engine"""
+    await get_vector_engine().load()
+
+
+if __name__ == "__main__":
+    # Benchmark: in-process top-k on a synthetic corpus, and against Postgres with --postgres
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark in-process vector search")
+    parser.add_argument("--postgres", action="store_true", help="Compare with Postgres vector_search on the real corpus")
+    parser.add_argument("--queries", type=int, default=50, help="Queries for the Postgres comparison")
+    parser.add_argument("--limit", type=int, default=4, help="Documents per search")
+    args = parser.parse_args()
+
+    def percentiles(latencies: List[float]) -> str:
+        latencies = sorted(latencies)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        return f"p50={p50:7.3f}ms p95={p95:7.3f}ms"
+
+    def benchmark(num_docs: int, dim: int = 1536, repeats: int = 500):
+        rng = np.random.default_rng(0)
+        rows = [
+            {
+                'title': f"doc {i}",
+                'category': f"category-{i % 8}",
+                't_vector': '[' + ','.join(map(str, rng.standard_normal(dim))) + ']',
+                'c_vector': '[' + ','.join(map(str, rng.standard_normal(dim))) + ']',
+            }
+            for i in range(num_docs)
+        ]
+        index = VectorIndex(rows)
+        queries = normalize_rows(rng.standard_normal((repeats, dim)).astype(np.float32))
+        mask = index.mask_for(["category-0", "category-1"])
+
+        single, masked = [], []
+        for query in queries:
+            start = time.perf_counter()
+            index.top_k(query[None, :], args.limit)
+            single.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            index.top_k(query[None, :], args.limit, mask)
+            masked.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.top_k(queries, args.limit)
+        batch_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        print(f"docs={num_docs:>6}  single {percentiles(single)}  masked {percentiles(masked)}  batched={batch_ms:.3f}ms/query")
+
+    async def compare():
+        from app.init.postgres import init_db_pool
+        from app.init.redis import init_redis_client
+
+        config = get_settings()
+        await init_db_pool(config.DATABASE_URL)
+        await init_redis_client(config.REDIS_URL)
+
+        engine = get_vector_engine()
+        await engine.load()
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(engine.index.titles), size=min(args.queries, len(engine.index.titles)), replace=False)
+        queries = ['[' + ','.join(map(str, engine.index.c_matrix[i])) + ']' for i in picks]
+
+        memory, postgres, same = [], [], 0
+        for query in queries:
+            start = time.perf_counter()
+            memory_docs = await engine.search(query, args.limit)
+            memory.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            postgres_docs = await engine.retriever.postgres_vector_search(query, args.limit)
+            postgres.append(time.perf_counter() - start)
+
+            same += [doc['title'] for doc in memory_docs] == [doc['title'] for doc in postgres_docs]
+
+        print(f"{len(queries)} queries over {len(engine.index.titles)} documents, same top-{args.limit}: {same}/{len(queries)}")
+        print(f"memory   {percentiles(memory)}")
+        print(f"postgres {percentiles(postgres)}")
+
+    for num_docs in (500, 2000, 10000):
+        benchmark(num_docs)
+    if args.postgres:
+        asyncio.run(compare())
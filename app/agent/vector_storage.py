@@ -0,0 +1,219 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+from app.agent.utils import DocumentRetriever, COMPACT_SUFFIX, HALFVEC, BINARY
+from app.init.config import get_settings
+from app.init.postgres import acquire_connection, BULK
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Compact column type and HNSW operator class per storage mode
+COMPACT_TYPES = {
+    HALFVEC: ("halfvec({dims})", "subvector({column}, 1, {dims})::halfvec({dims})", "halfvec_cosine_ops"),
+    BINARY: ("bit({dims})", "binary_quantize(subvector({column}, 1, {dims}))::bit({dims})", "bit_hamming_ops")
+}
+
+VECTOR_COLUMNS = ("t_vector", "c_vector")
+
+
+async def get_column_types() -> Dict[str, str]:
+    """Types of the vector columns of zama_fdocs, compact ones included"""
+    async with acquire_connection(BULK) as conn:
+        rows = await conn.fetch('''
+            SELECT attname, format_type(atttypid, atttypmod) AS type
+            FROM pg_attribute
+            WHERE attrelid = 'zama_fdocs'::regclass AND attnum > 0 AND NOT attisdropped AND attname LIKE '%vector%'
+        ''')
+        return {row['attname']: row['type'] for row in rows}
+
+
+async def get_index_sizes() -> Dict[str, int]:
+    """Size in bytes of every vector index of zama_fdocs"""
+    async with acquire_connection(BULK) as conn:
+        rows = await conn.fetch('''
+            SELECT c.relname AS name, pg_relation_size(i.indexrelid) AS size
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am a ON a.oid = c.relam
+            WHERE i.indrelid = 'zama_fdocs'::regclass AND a.amname IN ('ivfflat', 'hnsw')
+            ORDER BY c.relname
+        ''')
+        return {row['name']: row['size'] for row in rows}
+
+
+async def migrate(dimensions: int, reset: bool = False) -> List[str]:
+    """
+    Add compact halfvec and binary columns of the title and content vectors with their HNSW indexes
+
+    The columns are generated from the full vectors, so adding them backfills every row and
+    later inserts or updates keep them in sync. They hold the leading dimensions of each vector,
+    which for text-embedding-3 models is the same as requesting shorter embeddings.
+
+    Adding a STORED generated column rewrites the whole table under an ACCESS EXCLUSIVE
+    lock, once per column: reads and writes of zama_fdocs block until it finishes, so run
+    it in a quiet window. Only the index builds that follow run concurrently.
+
+    Args:
+        dimensions: Leading dimensions kept, VECTOR_DIMENSIONS must match it at search time
+        reset: Drop existing compact columns first, needed to change dimensions
+
+    Returns:
+        Names of the indexes created
+    """
+    async with acquire_connection(BULK) as conn:
+        version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        if not version or tuple(int(part) for part in version.split('.')[:2]) < (0, 7):
+            raise RuntimeError(f"pgvector 0.7+ is required for halfvec and binary_quantize, installed: {version}")
+
+        if reset:
+            for column in VECTOR_COLUMNS:
+                for suffix in COMPACT_SUFFIX.values():
+                    await conn.execute(f"ALTER TABLE zama_fdocs DROP COLUMN IF EXISTS {column}_{suffix}")
+
+    types = await get_column_types()
+    created = []
+
+    async with acquire_connection(BULK) as conn:
+        for mode, (column_type, expression, ops) in COMPACT_TYPES.items():
+            for column in VECTOR_COLUMNS:
+                name = f"{column}_{COMPACT_SUFFIX[mode]}"
+                expected = column_type.format(dims=dimensions)
+                if name in types and types[name] != expected:
+                    raise RuntimeError(f"{name} is {types[name]}, not {expected} - run with --reset to change dimensions")
+
+                # Rewrites the table to backfill the generated values, blocking reads and writes
+                start = time.perf_counter()
+                await conn.execute(
+                    f"ALTER TABLE zama_fdocs ADD COLUMN IF NOT EXISTS {name} {expected} "
+                    f"GENERATED ALWAYS AS ({expression.format(column=column, dims=dimensions)}) STORED",
+                    timeout=None
+                )
+
+                # CONCURRENTLY keeps the table writable during the index build only; it cannot
+                # run inside a transaction
+                index = f"zama_fdocs_{name}_hnsw"
+                await conn.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON zama_fdocs USING hnsw ({name} {ops})",
+                    timeout=None
+                )
+                created.append(index)
+                logger.info(f"{name} ({expected}) and {index} ready in {time.perf_counter() - start:.1f}s")
+
+        await conn.execute("ANALYZE zama_fdocs", timeout=None)
+
+    return created
+
+
+async def get_sample_queries(count: int) -> List[str]:
+    """Content vectors of random documents, used as queries without embedding calls"""
+    async with acquire_connection(BULK) as conn:
+        rows = await conn.fetch('SELECT c_vector::text AS vector FROM zama_fdocs ORDER BY random() LIMIT $1', count)
+        return [row['vector'] for row in rows]
+
+
+async def exact_search(embedding_str: str, limit: int) -> List[str]:
+    """Titles of the true nearest documents, scanning the full vectors without an index"""
+    async with acquire_connection(BULK) as conn:
+        rows = await conn.fetch('''
+            SELECT title
+            FROM zama_fdocs
+            ORDER BY GREATEST(1 - (t_vector <=> $1::vector), 1 - (c_vector <=> $1::vector)) DESC
+            LIMIT $2
+        ''', embedding_str, limit)
+        return [row['title'] for row in rows]
+
+
+async def exact_search_documents(embedding_str: str, limit: int) -> List[Dict]:
+    """exact_search with results shaped like DocumentRetriever ones"""
+    return [{"title": title} for title in await exact_search(embedding_str, limit)]
+
+
+async def recall_report(queries: List[str], limit: int = 4, candidates: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Recall and latency of compact searches against exact full-precision search
+
+    Args:
+        queries: Query embeddings
+        limit: Documents returned per search, recall is measured at this depth
+        candidates: Compact-column candidate counts to compare
+
+    Returns:
+        One row per mode and candidate count with recall and p50/p95 latency
+    """
+    retriever = DocumentRetriever()
+    truth = [set(await exact_search(query, limit)) for query in queries]
+
+    async def measure(mode: str, search, candidate_count: Optional[int]) -> Dict:
+        latencies, found = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            documents = await search(query)
+            latencies.append(time.perf_counter() - start)
+            found += len(expected & {doc['title'] for doc in documents})
+
+        latencies.sort()
+        return {
+            "mode": mode,
+            "candidates": candidate_count,
+            "recall": round(found / max(sum(len(expected) for expected in truth), 1), 3),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+        }
+
+    rows = [await measure("exact", lambda query: exact_search_documents(query, limit), None)]
+    for mode in COMPACT_TYPES:
+        for candidate_count in candidates or [limit, 20, 40, 100]:
+            rows.append(await measure(
+                mode,
+                lambda query: retriever.compact_vector_search(query, limit, mode, candidate_count),
+                candidate_count
+            ))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.init.postgres import init_db_pool
+    from app.init.model import GPT
+
+    parser = argparse.ArgumentParser(description="Add compact vector columns to zama_fdocs and report recall against latency")
+    parser.add_argument("--migrate", action="store_true", help="Add and backfill halfvec/binary columns with HNSW indexes")
+    parser.add_argument("--reset", action="store_true", help="Drop existing compact columns first")
+    parser.add_argument("--dimensions", type=int, default=None, help="Leading dimensions kept, defaults to VECTOR_DIMENSIONS")
+    parser.add_argument("--report", action="store_true", help="Print recall and latency of every storage mode")
+    parser.add_argument("--samples", type=int, default=50, help="Random document vectors used as report queries")
+    parser.add_argument("--questions", default=None, help="File with one question per line, embedded as report queries")
+    parser.add_argument("--limit", type=int, default=4, help="Documents per search")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        config = get_settings()
+        await init_db_pool(config.DATABASE_URL)
+        dimensions = args.dimensions or config.VECTOR_DIMENSIONS
+
+        if args.migrate:
+            await migrate(dimensions, reset=args.reset)
+
+        if args.report:
+            if dimensions != config.VECTOR_DIMENSIONS:
+                raise SystemExit(f"Set VECTOR_DIMENSIONS={dimensions} to report on these columns")
+
+            if args.questions:
+                gpt = GPT()
+                with open(args.questions, encoding="utf-8") as f:
+                    queries = [await gpt.generate_embedding(line.strip()) for line in f if line.strip()]
+            else:
+                queries = await get_sample_queries(args.samples)
+
+            print(f"{len(queries)} queries, recall@{args.limit} against exact search, {dimensions} dimensions")
+            print(f"{'mode':<8} {'candidates':>10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+            for row in await recall_report(queries, args.limit):
+                print(f"{row['mode']:<8} {row['candidates'] or '-':>10} {row['recall']:>7.3f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}")
+
+        for name, size in (await get_index_sizes()).items():
+            print(f"{name:<45} {size / 1024 / 1024:8.1f} MB")
+
+    asyncio.run(run())
@@ -4,8 +4,11 @@ from typing import Optional
 import os
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+REQUIRED_VARIABLES = ["DATABASE_URL", "REDIS_URL", "DISCORD_TOKEN", "LLM_MODEL", "OPENAI_API_KEY"]
+
+
+class ConfigurationError(Exception):
+    """Raised when settings are missing or invalid"""
 
 
 class Settings(BaseSettings):
@@ -26,6 +29,17 @@ class Settings(BaseSettings):
     DB_MIN_SIZE: int = 5
     DB_MAX_SIZE: int = 20
     DB_COMMAND_TIMEOUT: int = 60
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # Server-side limit for any statement
+    DB_LOOKUP_TIMEOUT: float = 5.0  # Client-side timeouts per query class, seconds
+    DB_SEARCH_TIMEOUT: float = 10.0
+    DB_BULK_TIMEOUT: float = 60.0
+    DB_IVFFLAT_PROBES: int = 0  # pgvector search settings per session (0 - server default)
+    DB_HNSW_EF_SEARCH: int = 0
+    DB_HNSW_ITERATIVE_SCAN: str = ""  # "strict_order" or "relaxed_order" (pgvector 0.8+), "" - off
+    DB_MAX_INACTIVE_LIFETIME: float = 300.0  # Idle seconds before connections above DB_MIN_SIZE close
+    DB_ADAPTIVE_CONCURRENCY: bool = True  # Cut concurrency between min/max size when queries slow down
+    DB_LATENCY_TOLERANCE: float = 2.0  # Slowdown over baseline that cuts concurrency
+    DB_DRAIN_TIMEOUT: float = 10.0  # Seconds in-flight queries get on shutdown
     
     # Redis settings
     REDIS_HEALTH_CHECK_INTERVAL: int = 30
@@ -35,19 +49,114 @@ class Settings(BaseSettings):
     CHANNEL_RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_TTL: int = 60
     
+    # Quota settings - defaults for every guild, overridden per guild/tier by the quota:config Redis key
+    QUOTA_ENABLED: bool = False  # Replaces the per-user/per-channel limits above
+    QUOTA_GUILD_REQUESTS_PER_MINUTE: int = 60  # Token bucket refill rate per guild (0 disables)
+    QUOTA_GUILD_BURST: int = 20  # Token bucket capacity per guild
+    QUOTA_USER_BURST: int = 5  # Token bucket capacity per user, refilled at USER_RATE_LIMIT_PER_MINUTE
+    QUOTA_GUILD_DAILY_TOKENS: int = 0  # OpenAI tokens per guild per UTC day (0 - unlimited)
+    QUOTA_GUILD_DAILY_COST_USD: float = 0.0  # OpenAI cost per guild per UTC day (0 - unlimited)
+    QUOTA_CONFIG_REFRESH_SECONDS: int = 30  # How often the Redis config is re-read
+    
     # Cache settings
     CACHE_TTL_SECONDS: int = 86400  # 24 hours
     
+    CORPUS_VERSION_TTL_SECONDS: int = 300  # How often the documents are checked for changes
+    
+    # FAQ warm-up settings
+    FAQ_TOP_N: int = 50  # Most frequent questions answered ahead of time
+    FAQ_ANSWER_TTL_SECONDS: int = 604800  # 7 days, answers are also invalidated by corpus version
+    FAQ_WARMUP_CONCURRENCY: int = 3
+    FAQ_WARMUP_INTERVAL_SECONDS: int = 3600  # Watch mode check interval
+    FAQ_QUESTION_DAYS: int = 14  # Days of question counts kept, older questions expire
+    FAQ_QUESTIONS_PER_DAY: int = 5000  # Distinct questions kept per day, trimmed to this once twice as many are stored
+    
+    # Query log settings
+    QUERY_LOG_SINK: str = "postgres"  # "postgres" (zama_query_log table), "file" (rotating JSON lines) or "off"
+    QUERY_LOG_BATCH_SIZE: int = 50
+    QUERY_LOG_FLUSH_SECONDS: float = 5.0
+    QUERY_LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped instead of blocking replies
+    QUERY_LOG_FILE: str = "query_log.jsonl"
+    QUERY_LOG_FILE_MAX_BYTES: int = 10 * 1024 * 1024
+    QUERY_LOG_FILE_BACKUPS: int = 5
+    
+    # Conversation settings
+    CONVERSATION_TTL_SECONDS: int = 3600  # Follow-ups older than this start a new conversation
+    CONVERSATION_SUMMARY_CHARS: int = 1500  # Rolling summary length
+    
+    # Processor selection
+    PROCESSOR: str = "agent"  # Live pipeline: agent, new, old_title, hybrid
+    SHADOW_PROCESSOR: Optional[str] = None  # Candidate pipeline that receives mirrored traffic
+    SHADOW_SAMPLE_RATE: float = 0.0  # Fraction of live questions mirrored to the candidate
+    SHADOW_CONCURRENCY: int = 2  # Shadow questions in flight, extra samples are dropped
+    
+    # Retrieval settings
+    SEARCH_MODE: str = "llm"  # "llm" - category/title sort, "hybrid" - full-text + vector fusion
+    HYBRID_CANDIDATES: int = 20  # Top-k taken from each ranking before fusion
+    HYBRID_RRF_K: int = 60  # Reciprocal rank fusion smoothing constant
+    VECTOR_STORAGE: str = "full"  # "full" - vector columns, "halfvec"/"binary" - compact columns reranked at full precision
+    VECTOR_DIMENSIONS: int = 1536  # Leading dimensions kept by the compact columns (text-embedding-3 vectors are Matryoshka)
+    VECTOR_RERANK_CANDIDATES: int = 40  # Compact-column candidates per vector reranked at full precision
+    VECTOR_SEARCH_ENGINE: str = "postgres"  # "postgres" or "memory" - vector_search over an in-process copy of the corpus
+    CORPUS_SNAPSHOT_PATH: Optional[str] = None  # Memory-mapped corpus snapshot the in-process engine opens instead of querying Postgres
+    
+    # Reranking settings
+    RERANK_MODE: str = "llm"  # "llm" - GPT sort calls, "local" - cosine against stored vectors
+    RERANK_WORKERS: int = 2  # Thread pool size for local scoring
+    RERANK_CATEGORIES: int = 3  # Categories kept by the local ranker
+    RERANK_TITLES: int = 4  # Titles kept by the local ranker
+    
+    # Category routing settings
+    CATEGORY_RULES_ENABLED: bool = True  # Resolve categories from keyword rules before the LLM sort
+    CATEGORY_RULES_FILE: Optional[str] = None  # Rules file, default app/agent/category_rules.json
+    
     # OpenAI settings
     OPENAI_TIMEOUT: int = 30
     OPENAI_MAX_RETRIES: int = 3
     OPENAI_TEMPERATURE: float = 0.3
     OPENAI_MAX_TOKENS: int = 4000
+    OPENAI_BASE_URL: Optional[str] = None  # Custom endpoint, e.g. a proxy or local fake server
+    
+    # OpenAI connection pool settings
+    OPENAI_MAX_CONNECTIONS: int = 50
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY: float = 120.0  # Seconds an idle connection is kept open
+    OPENAI_HTTP2: bool = False  # Requires the optional 'h2' package
+    OPENAI_WARMUP_CONNECTIONS: int = 2  # Connections opened at startup
+    
+    # OpenAI rate governor settings - limits of the account, shared by all replicas (0 disables)
+    OPENAI_TPM_LIMIT: int = 0
+    OPENAI_RPM_LIMIT: int = 0
+    OPENAI_GOVERNOR_HEADROOM: float = 0.9  # Fraction of the limits the bot may use
+    OPENAI_GOVERNOR_LOW_PRIORITY_SHARE: float = 0.7  # Fraction of that budget open to low-priority calls
+    OPENAI_GOVERNOR_MAX_WAIT: float = 10.0  # Seconds a high-priority call may queue for the next window
+    
+    # OpenAI resilience settings
+    OPENAI_SORT_TIMEOUT: float = 6.0  # Time budgets per stage, retries included
+    OPENAI_REWRITE_TIMEOUT: float = 8.0
+    OPENAI_EMBEDDING_TIMEOUT: float = 6.0
+    OPENAI_RETRY_BUDGET_RATIO: float = 0.2  # Retries allowed per request, process-wide
+    OPENAI_RETRY_BUDGET_MIN: int = 5  # Retries always allowed per 10s window
+    OPENAI_BREAKER_FAILURES: int = 5  # Consecutive failures that open a model circuit
+    OPENAI_BREAKER_RESET_SECONDS: float = 30.0  # Open circuit duration before a probe request
+    OPENAI_FALLBACK_MODEL: Optional[str] = None  # Model used while a circuit is open, default SORT_MODEL
+    OPENAI_HEDGE_SORT: bool = False  # Hedge sort calls slower than their p95 latency
+    
+    # Model routing - empty values fall back to LLM_MODEL
+    SORT_MODEL: Optional[str] = None  # Category/title sort stages
+    REWRITE_MODEL: Optional[str] = None  # Query rewrite stage
+    MAIN_MODEL: Optional[str] = None  # Final answer
+    ESCALATION_MODEL: Optional[str] = None  # Final answer for large context or complex questions
+    ESCALATION_CONTEXT_CHARS: int = 12000  # Context size that triggers escalation
+    ESCALATION_COMPLEXITY_THRESHOLD: float = 0.5  # Question complexity score (0-1) that triggers escalation
     
     # Planner specific settings
     PLANNER_TEMPERATURE: float = 0.3
     PLANNER_MAX_TOKENS: int = 2000
     
+    # Shutdown settings
+    SHUTDOWN_DRAIN_SECONDS: float = 20.0  # Time in-flight answers get after SIGTERM, keep below the platform kill timeout
+    
     # Railway deployment settings
     PORT: Optional[int] = None
     RAILWAY_ENVIRONMENT: Optional[str] = None
@@ -71,6 +180,54 @@ class Settings(BaseSettings):
             raise ValueError(f'LOG_LEVEL must be one of: {", ".join(valid_levels)}')
         return v.upper()
     
+    @validator('PROCESSOR', 'SHADOW_PROCESSOR')
+    def validate_processor(cls, v):
+        valid_processors = ['agent', 'new', 'old_title', 'hybrid']
+        if v is not None and v not in valid_processors:
+            raise ValueError(f'Processor must be one of: {", ".join(valid_processors)}')
+        return v
+    
+    @validator('SEARCH_MODE')
+    def validate_search_mode(cls, v):
+        valid_modes = ['llm', 'hybrid']
+        if v.lower() not in valid_modes:
+            raise ValueError(f'SEARCH_MODE must be one of: {", ".join(valid_modes)}')
+        return v.lower()
+    
+    @validator('VECTOR_STORAGE')
+    def validate_vector_storage(cls, v):
+        valid_modes = ['full', 'halfvec', 'binary']
+        if v.lower() not in valid_modes:
+            raise ValueError(f'VECTOR_STORAGE must be one of: {", ".join(valid_modes)}')
+        return v.lower()
+    
+    @validator('VECTOR_SEARCH_ENGINE')
+    def validate_vector_search_engine(cls, v):
+        valid_engines = ['postgres', 'memory']
+        if v.lower() not in valid_engines:
+            raise ValueError(f'VECTOR_SEARCH_ENGINE must be one of: {", ".join(valid_engines)}')
+        return v.lower()
+    
+    @validator('VECTOR_DIMENSIONS')
+    def validate_vector_dimensions(cls, v):
+        if v < 1:
+            raise ValueError('VECTOR_DIMENSIONS must be positive')
+        return v
+    
+    @validator('RERANK_MODE')
+    def validate_rerank_mode(cls, v):
+        valid_modes = ['llm', 'local']
+        if v.lower() not in valid_modes:
+            raise ValueError(f'RERANK_MODE must be one of: {", ".join(valid_modes)}')
+        return v.lower()
+    
+    @validator('QUERY_LOG_SINK')
+    def validate_query_log_sink(cls, v):
+        valid_sinks = ['postgres', 'file', 'off']
+        if v.lower() not in valid_sinks:
+            raise ValueError(f'QUERY_LOG_SINK must be one of: {", ".join(valid_sinks)}')
+        return v.lower()
+    
     @validator('OPENAI_TEMPERATURE')
     def validate_temperature(cls, v):
         if not 0.0 <= v <= 2.0:
@@ -88,27 +245,27 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-# Global settings instance - validates on import
-try:
-    settings = Settings()
-    print(f"✅ Configuration loaded successfully")
-    print(f"   Log Level: {settings.LOG_LEVEL}")
-    print(f"   Database: {settings.DATABASE_URL[:30]}...")
-    print(f"   Redis: {settings.REDIS_URL[:30]}...")
-    print(f"   Discord Token: {'*' * 20}")
-    print(f"   LLM Model: {settings.LLM_MODEL}")
-except Exception as e:
-    print(f"❌ Configuration validation failed: {e}")
-    print("Please check your environment variables and .env file")
-    print("\nRequired variables:")
-    print("  - DATABASE_URL")
-    print("  - REDIS_URL") 
-    print("  - DISCORD_TOKEN")
-    print("  - LLM_MODEL")
-    print("  - OPENAI_API_KEY")
-    exit(1)
+# Global settings instance, created and validated on first use
+_settings: Optional[Settings] = None
 
 
 def get_settings() -> Settings:
-    """Get application settings"""
-    return settings
\ No newline at end of file
+    """
+    Get application settings, loading and validating them on first call
+
+    Raises:
+        ConfigurationError: required variables are missing or a value is invalid
+    """
+    global _settings
+    if _settings is None:
+        # Load environment variables from .env file
+        load_dotenv()
+        try:
+            _settings = Settings()
+        except Exception as e:
+            raise ConfigurationError(
+                f"Configuration validation failed: {e}\n"
+                f"Please check your environment variables and .env file. "
+                f"Required variables: {', '.join(REQUIRED_VARIABLES)}"
+            ) from e
+    return _settings
@@ -1,97 +1,304 @@
 from openai import AsyncOpenAI
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 import logging
+import re
+import time
 from app.init.config import get_settings
+from app.init.resilience import ResilientCaller
+from app.init.openai_client import get_openai_client
+from app.services.query_log import record_usage
+from app.services.token_governor import reserve, settle, estimate_tokens, HIGH_PRIORITY, LOW_PRIORITY
 
 logger = logging.getLogger(__name__)
 
+# USD per 1M tokens: (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+# Markers of questions that need deeper reasoning than a lookup
+COMPLEX_QUESTION_PATTERN = re.compile(
+    r"\b(compare|comparison|difference|differences|versus|vs|why|trade-?offs?|architecture|"
+    r"design|security|optimi[sz]e|debug|step[- ]by[- ]step|explain how)\b",
+    re.IGNORECASE
+)
+
+# Per-route counters shared by all GPT instances
+_route_stats: Dict[str, Dict] = {}
+
+# Breakers, retry budget and latency windows shared by all GPT instances
+_resilient_caller: ResilientCaller = None
+
+
+def _get_resilient_caller() -> ResilientCaller:
+    global _resilient_caller
+    if _resilient_caller is None:
+        _resilient_caller = ResilientCaller(get_settings())
+    return _resilient_caller
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate request cost in USD, 0 for unknown models"""
+    # Responses report dated snapshots (gpt-4.1-nano-2025-04-14), match the longest known prefix
+    model = model.lower()
+    prompt_price, completion_price = 0.0, 0.0
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            prompt_price, completion_price = MODEL_PRICES[name]
+            break
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _record_route(route: str, model: str, latency: float, prompt_tokens: int, completion_tokens: int):
+    """Accumulate latency, token and cost metrics for a route"""
+    stats = _route_stats.setdefault(route, {
+        "model": model,
+        "calls": 0,
+        "latency_total": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0
+    })
+    stats["model"] = model
+    stats["calls"] += 1
+    stats["latency_total"] += latency
+    stats["prompt_tokens"] += prompt_tokens
+    stats["completion_tokens"] += completion_tokens
+    stats["cost_usd"] += estimate_cost(model, prompt_tokens, completion_tokens)
+
+
+def get_route_stats() -> Dict[str, Dict]:
+    """Get per-route latency, token and cost metrics"""
+    return {
+        route: {
+            "model": stats["model"],
+            "calls": stats["calls"],
+            "avg_latency_ms": round(stats["latency_total"] / stats["calls"] * 1000, 1),
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "cost_usd": round(stats["cost_usd"], 6)
+        }
+        for route, stats in _route_stats.items()
+    }
+
 
 class GPT:
-    def __init__(self):
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
         self.config = get_settings()
-        self.client = AsyncOpenAI(
-            api_key=self.config.OPENAI_API_KEY,
-            timeout=self.config.OPENAI_TIMEOUT
-        )
+        # One process-wide client keeps warm keep-alive connections for every GPT instance
+        self.client = client or get_openai_client()
+        self.resilience = _get_resilient_caller()
         self.model = self.config.LLM_MODEL
         self.embedding_model = self.config.EMBEDDING_MODEL
-    
-    async def _generate_response(self, messages: List[Dict], **kwargs) -> str:
+
+        # Model per pipeline stage
+        main_model = self.config.MAIN_MODEL or self.model
+        self.routes = {
+            "sort": self.config.SORT_MODEL or self.model,
+            "rewrite": self.config.REWRITE_MODEL or self.model,
+            "planner": self.model,
+            "main": main_model,
+            "escalated": self.config.ESCALATION_MODEL or main_model
+        }
+        self.fallback_model = self.config.OPENAI_FALLBACK_MODEL or self.routes["sort"]
+        self.timeouts = {
+            "sort": self.config.OPENAI_SORT_TIMEOUT,
+            "rewrite": self.config.OPENAI_REWRITE_TIMEOUT,
+            "embedding": self.config.OPENAI_EMBEDDING_TIMEOUT
+        }
+        # Query rewrite is optional for answering, so it is shed first under provider limits
+        self.priorities = {"rewrite": LOW_PRIORITY}
+
+    def _governed(
+        self,
+        model: str,
+        reservation: Optional[Tuple[str, int]],
+        tokens: int,
+        priority: str,
+        create: Callable[[str, float], Awaitable]
+    ) -> Tuple[Callable[[str, float], Awaitable], Callable[[], Awaitable]]:
+        """
+        Wrap a (model, timeout) request so every attempt holds a token governor reservation
+
+        The first attempt on the reserved model uses the reservation made before the call;
+        retries, hedged requests and fallback-model attempts reserve their own without
+        queueing. Every reservation is settled with the reported usage, 0 when the attempt failed.
+
+        Returns:
+            The wrapped request and a coroutine function returning the first reservation if no attempt used it
+        """
+        unclaimed = [reservation]
+
+        async def request(attempt_model: str, timeout: float):
+            if unclaimed and attempt_model == model:
+                attempt_reservation = unclaimed.pop()
+            else:
+                attempt_reservation = await reserve(attempt_model, tokens, priority, wait=False)
+
+            used = 0
+            try:
+                response = await create(attempt_model, timeout)
+                used = response.usage.total_tokens if response.usage else 0
+                return response
+            finally:
+                await settle(attempt_reservation, used)
+
+        async def release():
+            if unclaimed:
+                await settle(unclaimed.pop(), 0)
+
+        return request, release
+
+    async def _generate_response(self, messages: List[Dict], route: str = "main", **kwargs) -> str:
         """Base method for generating responses"""
         try:
             # Set defaults from config, but allow override from kwargs
             params = {
-                'model': self.model,
+                'model': self.routes[route],
                 'messages': messages,
                 'temperature': self.config.OPENAI_TEMPERATURE,
                 'max_tokens': self.config.OPENAI_MAX_TOKENS,
                 'timeout': self.config.OPENAI_TIMEOUT,
-                
+
             }
-            
+
             # Update with any provided kwargs (allows overriding defaults)
             params.update(kwargs)
-            
-            response = await self.client.chat.completions.create(**params)
-            
+
+            async def create(model: str, timeout: float):
+                return await self.client.chat.completions.create(**{**params, 'model': model, 'timeout': timeout})
+
+            tokens = estimate_tokens(messages) + params['max_tokens']
+            priority = self.priorities.get(route, HIGH_PRIORITY)
+            reservation = await reserve(params['model'], tokens, priority)
+            request, release = self._governed(params['model'], reservation, tokens, priority, create)
+
+            start = time.perf_counter()
+            try:
+                response = await self.resilience.call(
+                    route,
+                    params['model'],
+                    request,
+                    timeout=self.timeouts.get(route, params['timeout']),
+                    fallback_model=self.fallback_model,
+                    hedge=route == "sort" and self.config.OPENAI_HEDGE_SORT
+                )
+            finally:
+                await release()
+            latency = time.perf_counter() - start
+
             # Log token usage
+            prompt_tokens = completion_tokens = 0
             if response.usage:
                 prompt_tokens = response.usage.prompt_tokens
                 completion_tokens = response.usage.completion_tokens
                 total_tokens = response.usage.total_tokens
-                
-                logger.info(f"Token usage - Model: {params['model']}, "
+
+                logger.info(f"Token usage - Route: {route}, Model: {response.model}, "
                            f"Prompt: {prompt_tokens}, "
                            f"Completion: {completion_tokens}, "
-                           f"Total: {total_tokens}")
-            
+                           f"Total: {total_tokens}, "
+                           f"Latency: {latency * 1000:.0f}ms")
+
+            _record_route(route, response.model, latency, prompt_tokens, completion_tokens)
+            record_usage(prompt_tokens, completion_tokens, estimate_cost(response.model, prompt_tokens, completion_tokens))
+
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise
-    
+
+    def classify_complexity(self, question: str) -> float:
+        """Score question complexity from 0 (simple lookup) to 1 (needs deep reasoning)"""
+        score = 0.0
+        if len(question.split()) > 40:
+            score += 0.4
+        if '```' in question or re.search(r"\w+\(.*\)|;\s*$", question, re.MULTILINE):
+            score += 0.3
+        if COMPLEX_QUESTION_PATTERN.search(question):
+            score += 0.3
+        if question.count('?') > 1:
+            score += 0.2
+        return min(score, 1.0)
+
+    def should_escalate(self, question: str, context: str) -> bool:
+        """Decide whether the final answer needs the larger model"""
+        if self.routes["escalated"] == self.routes["main"]:
+            return False
+        if len(context) >= self.config.ESCALATION_CONTEXT_CHARS:
+            return True
+        return self.classify_complexity(question) >= self.config.ESCALATION_COMPLEXITY_THRESHOLD
+
     async def generate_planner_response(self, messages: List[Dict]) -> str:
         """Generate response for planner"""
         return await self._generate_response(
             messages,
+            route="planner",
             temperature=self.config.PLANNER_TEMPERATURE,
             max_tokens=self.config.PLANNER_MAX_TOKENS,
             response_format={"type": "json_object"}
         )
-    
+
     async def generate_sort_response(self, messages: List[Dict]) -> str:
         """Generate response for planner"""
         return await self._generate_response(
             messages,
+            route="sort",
             temperature=0,
             max_tokens=100,
             response_format={"type": "json_object"}
         )
-    
-    async def generate_main_response(self, messages: List[Dict]) -> str:
+
+    async def generate_main_response(self, messages: List[Dict], escalate: bool = False) -> str:
         """Generate main response"""
-        return await self._generate_response(messages)
-    
+        return await self._generate_response(messages, route="escalated" if escalate else "main")
+
     async def update_question(self, messages: List[Dict]) -> str:
         """Generate main response"""
-        return await self._generate_response(messages)
-    
-    async def generate_embedding(self, query: str) -> str:
-        """Generate text embedding"""
+        return await self._generate_response(messages, route="rewrite")
+
+    async def generate_embedding(self, query: str, dimensions: Optional[int] = None) -> str:
+        """Generate text embedding, shortened to its leading dimensions when given (text-embedding-3 models)"""
         try:
-            response = await self.client.embeddings.create(
-                model=self.embedding_model,
-                input=query
-            )
-            
+            async def create(model: str, timeout: float):
+                if dimensions:
+                    return await self.client.embeddings.create(model=model, input=query, dimensions=dimensions, timeout=timeout)
+                return await self.client.embeddings.create(model=model, input=query, timeout=timeout)
+
+            tokens = estimate_tokens(query)
+            reservation = await reserve(self.embedding_model, tokens)
+            request, release = self._governed(self.embedding_model, reservation, tokens, HIGH_PRIORITY, create)
+
+            start = time.perf_counter()
+            try:
+                response = await self.resilience.call(
+                    "embedding",
+                    self.embedding_model,
+                    request,
+                    timeout=self.timeouts["embedding"]
+                )
+            finally:
+                await release()
+            latency = time.perf_counter() - start
+
             # Log token usage for embeddings
+            total_tokens = 0
             if response.usage:
                 total_tokens = response.usage.total_tokens
                 logger.info(f"Embedding token usage - Model: {self.embedding_model}, "
                            f"Tokens: {total_tokens}")
-            
+
+            _record_route("embedding", self.embedding_model, latency, total_tokens, 0)
+            record_usage(total_tokens, 0, estimate_cost(self.embedding_model, total_tokens, 0))
+
             embedding = response.data[0].embedding
             return '[' + ','.join(map(str, embedding)) + ']'
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,85 @@
+import asyncio
+import importlib.util
+import logging
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Global OpenAI client shared by every GPT instance
+_openai_client: Optional["AsyncOpenAI"] = None
+
+
+def _create_client() -> "AsyncOpenAI":
+    """Create OpenAI client on top of a tuned keep-alive connection pool"""
+    # The SDK is heavy to import, load it only when the client is created
+    import httpx
+    from openai import AsyncOpenAI
+    from app.init.config import get_settings
+
+    config = get_settings()
+
+    http2 = config.OPENAI_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("OPENAI_HTTP2 is enabled but 'h2' is not installed, using HTTP/1.1")
+        http2 = False
+
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(config.OPENAI_TIMEOUT, connect=5.0)
+    )
+
+    # Retries are handled by ResilientCaller within stage time budgets
+    return AsyncOpenAI(
+        api_key=config.OPENAI_API_KEY,
+        base_url=config.OPENAI_BASE_URL,
+        timeout=config.OPENAI_TIMEOUT,
+        max_retries=0,
+        http_client=http_client
+    )
+
+
+async def init_openai_client(warmup_connections: int = None) -> "AsyncOpenAI":
+    """Initialize shared OpenAI client and open warm connections"""
+    from app.init.config import get_settings
+
+    global _openai_client
+    if _openai_client is None:
+        config = get_settings()
+        _openai_client = _create_client()
+
+        # Pay TCP/TLS handshakes now instead of on the first user question
+        warmup_connections = warmup_connections or config.OPENAI_WARMUP_CONNECTIONS
+        results = await asyncio.gather(
+            *[_openai_client.models.retrieve(config.LLM_MODEL) for _ in range(warmup_connections)],
+            return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning(f"OpenAI connection warmup failed: {failed[0]}")
+        else:
+            logger.info(f"OpenAI client warmed up with {warmup_connections} connections")
+    return _openai_client
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Get shared OpenAI client, creating it without warmup if not initialized"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = _create_client()
+    return _openai_client
+
+
+async def close_openai_client():
+    """Close shared OpenAI client and its connection pool"""
+    global _openai_client
+    if _openai_client:
+        await _openai_client.close()
+        _openai_client = None
@@ -1,23 +1,187 @@
-from typing import Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Set, Tuple
+import logging
 import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+logger = logging.getLogger(__name__)
 
 # Global connection pool
 _db_pool: Optional[asyncpg.Pool] = None
 
+# Query classes with their own time budgets: point lookups, vector/full-text scans, full-table reads
+LOOKUP = "lookup"
+SEARCH = "search"
+BULK = "bulk"
+
+# Client-side timeouts per query class, set from Settings by init_db_pool
+_timeouts: Dict[str, float] = {LOOKUP: 5.0, SEARCH: 10.0, BULK: 60.0}
+
+# Named statements prepared on pooled connections, with their query class
+_statements: Dict[str, Tuple[str, str]] = {}
+
+# Registered statements this process has run, new connections prepare only these
+_in_use: Set[str] = set()
+
+# Acquire-wait and hold time metrics per query class
+_acquire_stats: Dict[str, Dict] = {}
+
+# Concurrency limiter in front of the pool, None when disabled
+_limiter: Optional["AdaptiveLimiter"] = None
+
+# pgvector hnsw.ef_search default, in effect when DB_HNSW_EF_SEARCH is 0, and its upper bound
+HNSW_DEFAULT_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+
+def register_statement(name: str, query: str, query_class: str = LOOKUP):
+    """Register fixed-shape SQL, prepared on a connection the first time it runs there"""
+    _statements[name] = (query, query_class)
+
+
+def query_timeout(query_class: str) -> float:
+    """Client-side timeout for a query class, the query is cancelled on the server when exceeded"""
+    return _timeouts.get(query_class, _timeouts[LOOKUP])
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit between pool min and max size
+
+    Every window of queries the average connection hold time is compared with the best
+    window seen so far: when the database slows down the limit is cut, when callers
+    queue at the limit and latency is fine it grows by one connection.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, tolerance: float, window: int = 50):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.tolerance = tolerance
+        self.window = window
+        self.in_flight = 0
+        self.saturated = False
+        self.baseline: Optional[float] = None
+        self.samples: List[float] = []
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, timeout: float):
+        """Take a slot, raising asyncio.TimeoutError when none frees up within timeout"""
+        async with self.condition:
+            if self.in_flight >= self.limit:
+                self.saturated = True
+            await asyncio.wait_for(self.condition.wait_for(lambda: self.in_flight < self.limit), timeout)
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float]):
+        async with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._update(latency)
+            self.condition.notify_all()
+
+    def _update(self, latency: float):
+        self.samples.append(latency)
+        if len(self.samples) < self.window:
+            return
+
+        average = sum(self.samples) / len(self.samples)
+        self.samples = []
+        # Baseline may drift up slowly so a permanently slower database is accepted eventually
+        self.baseline = average if self.baseline is None else min(average, self.baseline * 1.05)
+
+        if average > self.baseline * self.tolerance:
+            new_limit = max(self.min_limit, int(self.limit * 0.75))
+        elif self.saturated:
+            new_limit = min(self.max_limit, self.limit + 1)
+        else:
+            new_limit = self.limit
+        self.saturated = False
+
+        if new_limit != self.limit:
+            logger.info(f"Database concurrency limit {self.limit} -> {new_limit} (window avg {average * 1000:.1f}ms, baseline {self.baseline * 1000:.1f}ms)")
+            self.limit = new_limit
+
+
+class PreparedConnection(asyncpg.Connection):
+    """Connection that keeps registered statements prepared for its whole lifetime"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prepared: Dict[str, PreparedStatement] = {}
+
+    async def prepare_registered(self):
+        """
+        Prepare the registered statements this process has already run
+
+        Statements of processors or storage modes that never ran (e.g. tables this
+        deployment does not have) are skipped, so warm-up only covers the live set.
+        """
+        for name in list(_in_use):
+            try:
+                self._prepared[name] = await self.prepare(_statements[name][0])
+            except asyncpg.PostgresError as e:
+                # Do not fail the whole pool because of one statement (e.g. a dropped column)
+                logger.error(f"Failed to prepare statement {name}: {e}")
+
+    async def fetch_prepared(self, name: str, *args) -> List[asyncpg.Record]:
+        """Fetch rows using a registered statement within its query class timeout"""
+        query, query_class = _statements[name]
+        statement = self._prepared.get(name)
+        if statement is None:
+            statement = await self.prepare(query)
+            self._prepared[name] = statement
+            _in_use.add(name)
+        return await statement.fetch(*args, timeout=query_timeout(query_class))
+
+
+async def _init_connection(conn: PreparedConnection):
+    """Pool init hook - runs once for every new connection, warming it before first use"""
+    await conn.prepare_registered()
+
+
+def _server_settings(config) -> Dict[str, str]:
+    """Session settings sent on connect, so they survive the RESET ALL done on pool release"""
+    settings = {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}
+    if config.DB_IVFFLAT_PROBES:
+        settings["ivfflat.probes"] = str(config.DB_IVFFLAT_PROBES)
+    if config.DB_HNSW_EF_SEARCH:
+        settings["hnsw.ef_search"] = str(config.DB_HNSW_EF_SEARCH)
+    if config.DB_HNSW_ITERATIVE_SCAN:
+        settings["hnsw.iterative_scan"] = config.DB_HNSW_ITERATIVE_SCAN
+    return settings
+
 
 async def init_db_pool(database_url: str, min_size: int = None, max_size: int = None, command_timeout: int = None) -> asyncpg.Pool:
     """Initialize database connection pool"""
     from app.init.config import get_settings
-    
-    global _db_pool
+
+    global _db_pool, _limiter
     if _db_pool is None:
         config = get_settings()
+        min_size = min_size or config.DB_MIN_SIZE
+        max_size = max_size or config.DB_MAX_SIZE
+        _timeouts.update({
+            LOOKUP: config.DB_LOOKUP_TIMEOUT,
+            SEARCH: config.DB_SEARCH_TIMEOUT,
+            BULK: config.DB_BULK_TIMEOUT
+        })
         _db_pool = await asyncpg.create_pool(
             database_url,
-            min_size=min_size or config.DB_MIN_SIZE,
-            max_size=max_size or config.DB_MAX_SIZE,
-            command_timeout=command_timeout or config.DB_COMMAND_TIMEOUT
+            min_size=min_size,
+            max_size=max_size,
+            command_timeout=command_timeout or config.DB_COMMAND_TIMEOUT,
+            # Connections above min_size are closed after idling, so the pool shrinks after a burst
+            max_inactive_connection_lifetime=config.DB_MAX_INACTIVE_LIFETIME,
+            server_settings=_server_settings(config),
+            connection_class=PreparedConnection,
+            init=_init_connection
         )
+        if config.DB_ADAPTIVE_CONCURRENCY:
+            _limiter = AdaptiveLimiter(min_size, max_size, config.DB_LATENCY_TOLERANCE)
+        logger.info(f"Database pool ready: {_db_pool.get_size()} warm connections, max {max_size}")
     return _db_pool
 
 
@@ -29,9 +193,101 @@ async def get_db_pool() -> asyncpg.Pool:
     return _db_pool
 
 
-async def close_db_pool():
-    """Close connection pool"""
-    global _db_pool
+@asynccontextmanager
+async def acquire_connection(query_class: str = LOOKUP):
+    """Acquire a pooled connection through the concurrency limiter, recording wait and hold times"""
+    pool = await get_db_pool()
+    stats = _acquire_stats.setdefault(query_class, {
+        "acquires": 0,
+        "timeouts": 0,
+        "wait_total": 0.0,
+        "wait_max": 0.0,
+        "hold_total": 0.0
+    })
+
+    start = time.perf_counter()
+    timeout = query_timeout(query_class)
+    if _limiter:
+        try:
+            await _limiter.acquire(timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise
+    hold: Optional[float] = None
+    try:
+        try:
+            # The limiter wait counts against the same query class budget
+            conn = await pool.acquire(timeout=max(0.0, timeout - (time.perf_counter() - start)))
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise
+
+        acquired = time.perf_counter()
+        wait = acquired - start
+        stats["acquires"] += 1
+        stats["wait_total"] += wait
+        stats["wait_max"] = max(stats["wait_max"], wait)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+            hold = time.perf_counter() - acquired
+            stats["hold_total"] += hold
+    finally:
+        if _limiter:
+            await _limiter.release(hold)
+
+
+@asynccontextmanager
+async def hnsw_candidates(conn: asyncpg.Connection, candidates: int):
+    """
+    Let HNSW index scans run in the block return at least candidates rows
+
+    An HNSW scan returns at most hnsw.ef_search rows, so a larger LIMIT is silently capped.
+    When candidates exceed the session value the block runs in a transaction with
+    SET LOCAL hnsw.ef_search, which ends with it.
+    """
+    from app.init.config import get_settings
+
+    if candidates <= (get_settings().DB_HNSW_EF_SEARCH or HNSW_DEFAULT_EF_SEARCH):
+        yield
+        return
+
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL hnsw.ef_search = {min(int(candidates), HNSW_MAX_EF_SEARCH)}")
+        yield
+
+
+def get_pool_stats() -> Dict:
+    """Get pool size and per-query-class acquire metrics"""
+    return {
+        "size": _db_pool.get_size() if _db_pool else 0,
+        "idle": _db_pool.get_idle_size() if _db_pool else 0,
+        "limit": _limiter.limit if _limiter else None,
+        "classes": {
+            query_class: {
+                "acquires": stats["acquires"],
+                "timeouts": stats["timeouts"],
+                "avg_wait_ms": round(stats["wait_total"] / stats["acquires"] * 1000, 2) if stats["acquires"] else 0.0,
+                "max_wait_ms": round(stats["wait_max"] * 1000, 2),
+                "avg_hold_ms": round(stats["hold_total"] / stats["acquires"] * 1000, 2) if stats["acquires"] else 0.0
+            }
+            for query_class, stats in _acquire_stats.items()
+        }
+    }
+
+
+async def close_db_pool(timeout: float = None):
+    """Drain and close connection pool: new acquires fail, in-flight queries get until the timeout"""
+    from app.init.config import get_settings
+
+    global _db_pool, _limiter
     if _db_pool:
-        await _db_pool.close()
+        logger.info(f"Draining database pool: {get_pool_stats()}")
+        try:
+            await asyncio.wait_for(_db_pool.close(), timeout or get_settings().DB_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Database pool drain timed out, terminating remaining connections")
+            _db_pool.terminate()
         _db_pool = None
+        _limiter = None
@@ -0,0 +1,362 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+import openai
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying and counting against a circuit breaker
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate model has an open circuit"""
+
+
+class CircuitBreaker:
+    """Fails fast after consecutive failures, lets a single probe through after reset timeout"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # When the half-open probe was let through, None while no probe is in flight
+        self.probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Closed circuits let every request through, half-open ones only one probe at a time
+
+        A probe that never reports back (cancelled, non-retryable error) stops blocking
+        the next one after reset timeout.
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        now = time.monotonic()
+        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probe_started = None
+
+
+class RetryBudget:
+    """Process-wide cap on retries: a ratio of requests plus a small floor per window"""
+
+    def __init__(self, ratio: float, min_retries: int, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._window_start = time.monotonic()
+        self._requests = 0
+        self._retries = 0
+
+    def _roll(self):
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self._requests = 0
+            self._retries = 0
+
+    def record_request(self):
+        self._roll()
+        self._requests += 1
+
+    def try_retry(self) -> bool:
+        """Withdraw one retry from the budget, False when exhausted"""
+        self._roll()
+        if self._retries >= self.min_retries + self._requests * self.ratio:
+            return False
+        self._retries += 1
+        return True
+
+
+class LatencyTracker:
+    """Rolling latency window for percentile estimates"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile, None until enough samples are collected"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class ResilientCaller:
+    """Wraps upstream calls with stage time budgets, retry budget, circuit breakers and hedging"""
+
+    def __init__(self, config):
+        self.config = config
+        self.retry_budget = RetryBudget(config.OPENAI_RETRY_BUDGET_RATIO, config.OPENAI_RETRY_BUDGET_MIN)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, LatencyTracker] = {}
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(
+                self.config.OPENAI_BREAKER_FAILURES,
+                self.config.OPENAI_BREAKER_RESET_SECONDS
+            )
+        return self.breakers[model]
+
+    def _latency(self, route: str) -> LatencyTracker:
+        if route not in self.latencies:
+            self.latencies[route] = LatencyTracker()
+        return self.latencies[route]
+
+    def _select_model(self, model: str, fallback_model: Optional[str]) -> str:
+        """Primary model unless its circuit is open, then the fallback"""
+        if self._breaker(model).allow():
+            return model
+        if fallback_model and fallback_model != model and self._breaker(fallback_model).allow():
+            logger.warning(f"Circuit open for {model}, routing to {fallback_model}")
+            return fallback_model
+        raise CircuitOpenError(f"Circuit open for {model}")
+
+    async def _hedged(self, route: str, model: str, request: Callable, timeout: float):
+        """Send a second identical request if the first is slower than route p95"""
+        delay = self._latency(route).percentile(0.95)
+        tasks = [asyncio.ensure_future(request(model, timeout))]
+        try:
+            if delay is None or delay >= timeout:
+                return await tasks[0]
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info(f"Hedging {route} request after {delay * 1000:.0f}ms")
+                tasks.append(asyncio.ensure_future(request(model, timeout - delay)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every request failed - surface the first error
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(
+        self,
+        route: str,
+        model: str,
+        request: Callable[[str, float], Awaitable],
+        timeout: float,
+        fallback_model: Optional[str] = None,
+        hedge: bool = False
+    ):
+        """
+        Call upstream within a total time budget
+
+        Args:
+            route: Pipeline stage name, used for latency tracking
+            model: Preferred model
+            request: Coroutine factory taking (model, timeout)
+            timeout: Time budget for the whole stage, retries included
+            fallback_model: Model used while the preferred model's circuit is open
+            hedge: Send a hedged request after route p95 latency
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self.retry_budget.record_request()
+        attempt = 0
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"{route} time budget of {timeout}s exhausted")
+            current_model = self._select_model(model, fallback_model)
+
+            start = time.perf_counter()
+            try:
+                if hedge:
+                    response = await asyncio.wait_for(self._hedged(route, current_model, request, remaining), remaining)
+                else:
+                    response = await asyncio.wait_for(request(current_model, remaining), remaining)
+                self._breaker(current_model).record_success()
+                self._latency(route).record(time.perf_counter() - start)
+                return response
+            except RETRYABLE_ERRORS as e:
+                self._breaker(current_model).record_failure()
+                attempt += 1
+                if attempt > self.config.OPENAI_MAX_RETRIES or not self.retry_budget.try_retry():
+                    raise
+                backoff = min(0.25 * 2 ** (attempt - 1), max(0.0, deadline - loop.time()))
+                logger.warning(f"Retrying {route} ({attempt}/{self.config.OPENAI_MAX_RETRIES}) after error: {e}")
+                await asyncio.sleep(backoff)
+
+
+if __name__ == "__main__":
+    # Check breakers, retries and probing against a local fake OpenAI server that injects latency and errors
+    import json
+    import os
+    import random
+    from aiohttp import web
+
+    FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0.2"))
+    FAKE_SLOW_RATE = float(os.getenv("FAKE_SLOW_RATE", "0.1"))
+    FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0.2"))
+    random.seed(int(os.getenv("FAKE_SEED", "0")))
+
+    # Faults injected by the fake server, changed between phases, and requests it received
+    faults = {"error_rate": FAKE_ERROR_RATE, "slow_rate": FAKE_SLOW_RATE}
+    hits = {"count": 0}
+
+    def check_breaker():
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.state == "closed" and breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.state == "half_open"
+        assert [breaker.allow() for _ in range(10)].count(True) == 1, "half-open circuit let more than one probe through"
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed" and all(breaker.allow() for _ in range(10))
+
+        # A probe that never reports back stops blocking after reset timeout
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow() and not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        print("breaker: ok")
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        hits["count"] += 1
+        roll = random.random()
+        if roll < faults["error_rate"]:
+            return web.json_response({"error": {"message": "injected failure", "type": "server_error"}}, status=500)
+        await asyncio.sleep(FAKE_LATENCY * (10 if roll < faults["error_rate"] + faults["slow_rate"] else 1))
+        return web.json_response({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"nums": "0,1"})},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        })
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", chat_completions)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 8765)
+        await site.start()
+
+        os.environ["OPENAI_BASE_URL"] = "http://127.0.0.1:8765/v1"
+        os.environ.setdefault("OPENAI_BREAKER_RESET_SECONDS", "1")
+        # No fallback model, so the probes counted below all go to one circuit
+        os.environ["OPENAI_FALLBACK_MODEL"] = ""
+        from app.init.model import GPT, get_route_stats
+
+        gpt = GPT()
+        messages = [{"role": "user", "content": "What is FHE?"}]
+
+        async def send() -> bool:
+            try:
+                await gpt.generate_sort_response(messages)
+                return True
+            except Exception as e:
+                logger.debug(f"Request failed: {e}")
+                return False
+
+        # Injected errors and slow responses: retries absorb the errors within the stage budget
+        ok = failed = 0
+        latencies = []
+        for _ in range(100):
+            start = time.perf_counter()
+            if await send():
+                ok += 1
+            else:
+                failed += 1
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+        print(f"ok={ok} failed={failed} "
+              f"p50={latencies[len(latencies) // 2] * 1000:.0f}ms "
+              f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.0f}ms "
+              f"max={latencies[-1] * 1000:.0f}ms")
+        print(f"routes: {get_route_stats()}")
+        assert ok >= 90, f"only {ok}/100 requests succeeded with {FAKE_ERROR_RATE:.0%} injected errors"
+
+        # Outage: the circuit opens, then requests fail fast without reaching the server
+        model = gpt.routes["sort"]
+        breaker = gpt.resilience._breaker(model)
+        faults.update(error_rate=1.0, slow_rate=0.0)
+        assert not any(await asyncio.gather(*(send() for _ in range(10))))
+        assert breaker.state == "open", f"circuit is {breaker.state} after an outage"
+
+        before = hits["count"]
+        start = time.perf_counter()
+        assert not any(await asyncio.gather(*(send() for _ in range(20))))
+        assert hits["count"] == before, "open circuit let requests through"
+        print(f"outage: circuit open, 20 requests rejected in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        # Recovery: after reset timeout a burst sends exactly one probe, its success closes the circuit
+        faults.update(error_rate=0.0)
+        await asyncio.sleep(breaker.reset_timeout)
+        before = hits["count"]
+        results = await asyncio.gather(*(send() for _ in range(20)))
+        assert hits["count"] == before + 1, f"half-open circuit sent {hits['count'] - before} probes"
+        assert results.count(True) == 1 and breaker.state == "closed"
+        assert all(await asyncio.gather(*(send() for _ in range(20))))
+        print("recovery: one probe sent, circuit closed")
+
+        await runner.cleanup()
+
+    check_breaker()
+    asyncio.run(run())
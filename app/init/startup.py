@@ -0,0 +1,30 @@
+import time
+from typing import List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reference point for startup phases - the entrypoint imports this module first
+_started_at = time.perf_counter()
+_last_mark = _started_at
+_phases: List[Tuple[str, float]] = []
+
+
+def mark_phase(name: str):
+    """Record the time spent since the previous mark as a startup phase"""
+    global _last_mark
+    now = time.perf_counter()
+    _phases.append((name, now - _last_mark))
+    _last_mark = now
+
+
+def get_startup_report() -> str:
+    """Startup phases with their durations in milliseconds"""
+    total = _last_mark - _started_at
+    phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in _phases)
+    return f"Startup took {total * 1000:.0f}ms: {phases}"
+
+
+def log_startup_report():
+    """Log startup phases"""
+    logger.info(get_startup_report())
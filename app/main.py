@@ -3,13 +3,19 @@
 import sys
 import os
 import logging
-from dotenv import load_dotenv
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Imported first so startup phases are measured from here
+from app.init.startup import mark_phase
+
+from dotenv import load_dotenv
+from app.init.config import get_settings, ConfigurationError
 from app.services.discord_service import main
 
+mark_phase("import")
+
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +24,24 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
+logger = logging.getLogger(__name__)
+
+
+def load_settings():
+    """Validate configuration before connecting anywhere, exit with a clear message if invalid"""
+    try:
+        settings = get_settings()
+    except ConfigurationError as e:
+        logger.error(e)
+        sys.exit(1)
+
+    logger.info("Configuration loaded successfully")
+    logger.info(f"   Database: {settings.DATABASE_URL[:30]}...")
+    logger.info(f"   Redis: {settings.REDIS_URL[:30]}...")
+    logger.info(f"   LLM Model: {settings.LLM_MODEL}")
+    mark_phase("settings")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    load_settings()
+    main()
@@ -12,7 +12,7 @@ class QueryProcessor:
     
     def __init__(self):
         self.gpt_client = GPT()
-        self.searcher = Searcher()
+        self.searcher = Searcher(self.gpt_client)
         self.max_documents = 5
     
     async def process_query(self, question: str) -> str:
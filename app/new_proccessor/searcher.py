@@ -12,8 +12,8 @@ logger = logging.getLogger(__name__)
 class Searcher:
     """Query planner for document selection"""
     
-    def __init__(self):
-        self.gpt = GPT()
+    def __init__(self, gpt: GPT = None):
+        self.gpt = gpt or GPT()
         self.categories = {
             0:"protocol",
             1:"relayer-sdk-guides",
@@ -71,14 +71,21 @@ class Searcher:
             result = json.loads(content)
             
             nums = result.get('nums', '').split(',')
-            return [self.categories[int(nums[0])], self.categories[int(nums[1])]]
+            categories = []
+            for num in nums:
+                if num.strip().isdigit() and int(num.strip()) in self.categories:
+                    category = self.categories[int(num.strip())]
+                    if category not in categories:
+                        categories.append(category)
+            
+            return categories or ['protocol', 'zama-protocol-litepaper']
         
         except json.JSONDecodeError as e:
             logger.error(f"JSON parsing error: {e}")
-            return ['protocol', 'litepaper']
+            return ['protocol', 'zama-protocol-litepaper']
         except Exception as e:
             logger.error(f"Sort error: {e}")
-            return ['protocol', 'litepaper']
+            return ['protocol', 'zama-protocol-litepaper']
         
     
     async def update_query(self, query:str) -> str:
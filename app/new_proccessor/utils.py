@@ -1,38 +1,148 @@
-from typing import List, Dict
-from app.init.postgres import get_db_pool
-from app.init.model import GPT
+from typing import List, Dict, Optional
+from app.init.postgres import acquire_connection, register_statement, SEARCH, BULK
 import logging
 
 logger = logging.getLogger(__name__)
 
+CATEGORY_VECTOR_SEARCH = "new_category_vector_search"
+
+# Per-category top-k for title and content vectors in one round trip. Each branch is a
+# plain ORDER BY distance LIMIT k with a category filter. The category comes from unnest,
+# so it is not known at plan time and partial per-category indexes could never match;
+# instead one HNSW index per vector column serves every category (see create_vector_indexes)
+# and the filter is applied during the index scan.
+CATEGORY_VECTOR_QUERY = '''
+    SELECT
+      c.category,
+      d.title,
+      d.content,
+      d.link,
+      d.similarity
+    FROM unnest($2::text[]) AS c(category)
+    CROSS JOIN LATERAL (
+        (
+            SELECT title, content, link, 1 - (vector_title <=> $1::vector) AS similarity
+            FROM zama_docs
+            WHERE category = c.category
+            ORDER BY vector_title <=> $1::vector
+            LIMIT $3
+        )
+        UNION ALL
+        (
+            SELECT title, content, link, 1 - (vector_content <=> $1::vector) AS similarity
+            FROM zama_docs
+            WHERE category = c.category
+            ORDER BY vector_content <=> $1::vector
+            LIMIT $3
+        )
+    ) d
+'''
+
+register_statement(CATEGORY_VECTOR_SEARCH, CATEGORY_VECTOR_QUERY, SEARCH)
+
+
+async def vector_search(embedding_str: str, categories: List[str], limit: int = 5, per_category: Optional[int] = None) -> List[Dict]:
+    """
+    Search documents by vector similarity within any number of categories
+
+    Args:
+        embedding_str: Query embedding
+        categories: Categories to search in
+        limit: Documents returned after merging
+        per_category: Top-k taken from each category and vector, defaults to limit
+
+    Returns:
+        Documents sorted by similarity, one per title
+    """
+    if not categories:
+        return []
 
-async def vector_search(embedding_str: str, categories: List[str] ,limit: int = 5) -> List[Dict]:
-    """Search documents by vector similarity"""
     try:
-        pool = await get_db_pool()
-        
-        async with pool.acquire() as conn:
-            results = await conn.fetch('''
-                SELECT 
-                    title,
-                    content,
-                    link,
-                    category,
-                    GREATEST(
-                        1 - (vector_title <=> $1::vector),
-                        1 - (vector_content <=> $1::vector)
-                    ) as similarity
-                FROM zama_docs
-                WHERE category = $2 OR category = $3
-                ORDER BY GREATEST(
-                    1 - (vector_title <=> $1::vector),
-                    1 - (vector_content <=> $1::vector)
-                    ) DESC
-                LIMIT $4
-            ''', embedding_str, categories[0], categories[1], limit)
-            
-            return [dict(row) for row in results]
-    
+        async with acquire_connection(SEARCH) as conn:
+            results = await conn.fetch_prepared(CATEGORY_VECTOR_SEARCH, embedding_str, list(categories), per_category or limit)
+
+        # Merge title and content hits of all categories, keeping the best hit per title
+        best: Dict[str, Dict] = {}
+        for row in results:
+            if row['title'] not in best or row['similarity'] > best[row['title']]['similarity']:
+                best[row['title']] = dict(row)
+
+        return sorted(best.values(), key=lambda doc: doc['similarity'], reverse=True)[:limit]
+
     except Exception as e:
         logger.error(f"Vector search error: {e}")
         return []
+
+
+async def create_vector_indexes() -> List[str]:
+    """
+    Create one HNSW index per vector column and drop the old partial per-category ones
+
+    A filtered HNSW scan stops after hnsw.ef_search candidates, so a small category can
+    return fewer than k rows; set DB_HNSW_ITERATIVE_SCAN (pgvector 0.8+) to keep scanning
+    until enough rows of the category are found.
+    """
+    async with acquire_connection(BULK) as conn:
+        partial = await conn.fetch('''
+            SELECT c.relname AS name
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am a ON a.oid = c.relam
+            WHERE i.indrelid = 'zama_docs'::regclass AND a.amname = 'hnsw' AND i.indpred IS NOT NULL
+        ''')
+        for row in partial:
+            # CONCURRENTLY keeps the table writable; it cannot run inside a transaction
+            await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{row["name"]}"', timeout=None)
+            logger.info(f"Dropped partial index: {row['name']}")
+
+        created = []
+        for column in ("vector_title", "vector_content"):
+            name = f"zama_docs_{column}_hnsw"
+            await conn.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON zama_docs USING hnsw ({column} vector_cosine_ops)",
+                timeout=None
+            )
+            created.append(name)
+            logger.info(f"Index ready: {name}")
+
+        await conn.execute("ANALYZE zama_docs", timeout=None)
+        return created
+
+
+async def explain_category_search(categories: List[str], limit: int = 5) -> List[str]:
+    """Plan of the category search for a sample document vector, shows which index each branch uses"""
+    async with acquire_connection(BULK) as conn:
+        embedding_str = await conn.fetchval('SELECT vector_content::text FROM zama_docs LIMIT 1')
+        rows = await conn.fetch(
+            f"EXPLAIN (ANALYZE, COSTS OFF) {CATEGORY_VECTOR_QUERY}",
+            embedding_str, categories, limit, timeout=None
+        )
+        return [row[0] for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from app.init.postgres import init_db_pool
+    from app.init.config import get_settings
+
+    parser = argparse.ArgumentParser(description="Create the zama_docs vector indexes and explain the category search")
+    parser.add_argument("--explain", nargs="*", default=None, metavar="CATEGORY", help="Print the search plan for these categories (all when none given)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        await init_db_pool(get_settings().DATABASE_URL)
+        if args.explain is None:
+            indexes = await create_vector_indexes()
+            print(f"{len(indexes)} indexes ready")
+            return
+
+        categories = args.explain
+        if not categories:
+            async with acquire_connection(BULK) as conn:
+                categories = [row['category'] for row in await conn.fetch('SELECT DISTINCT category FROM zama_docs WHERE category IS NOT NULL')]
+        print("\n".join(await explain_category_search(categories)))
+
+    asyncio.run(run())
@@ -1,7 +1,8 @@
 from typing import List, Dict
 from app.init.model import GPT
-from app.hybrid_proccessor.utils import vector_search_by_content, vector_search_by_title
-from app.hybrid_proccessor.prompt import MAIN_PROMPT, UPDATE_PROMPT
+from app.old_releases.hybrid_proccessor.utils import hybrid_search
+from app.old_releases.hybrid_proccessor.prompt import MAIN_PROMPT, UPDATE_PROMPT
+from app.services.query_preprocessor import rewrite_locally
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,8 +49,12 @@ class QueryProcessor:
             return "An error occurred while processing your question."
         
     async def _update_query(self, question: str) -> str:
-        """Update query for search from llm"""
+        """Update query for search from llm, skipping it for clean English queries"""
         try:
+            local_question = await rewrite_locally(question)
+            if local_question:
+                return local_question
+
             messages = [
                 {"role": "system", "content": UPDATE_PROMPT},
                 {"role": "user", "content": question}
@@ -63,10 +68,8 @@ class QueryProcessor:
         """Search for documents using vector similarity"""
         try:
             embedding_str = await self.gpt_client.generate_embedding(question)
-            title_result = await vector_search_by_title(embedding_str, limit=self.max_documents)
-            content_result = await vector_search_by_content(embedding_str, limit=self.max_documents)
-            
-            return title_result+content_result
+            # Title and content top-k, deduplicated by title, in one query
+            return await hybrid_search(embedding_str, limit=self.max_documents)
         except Exception as e:
             logger.error(f"Document search error: {e}")
             return []
@@ -1,10 +1,66 @@
 from typing import List, Dict
-from app.init.postgres import get_db_pool
+from app.init.postgres import get_db_pool, acquire_connection, register_statement, SEARCH
 from app.init.model import GPT
 import logging
 
 logger = logging.getLogger(__name__)
 
+HYBRID_SEARCH = "hybrid_title_content_search"
+
+# Title and content top-k in one statement. Each branch is a plain ORDER BY distance
+# LIMIT k, so both stay index scans. Both scores are computed for the few rows returned,
+# and DISTINCT ON keeps the best row per title, which is what _build_context used to do.
+register_statement(HYBRID_SEARCH, '''
+    SELECT title, content, category, subcategory, keywords, title_similarity, content_similarity, similarity
+    FROM (
+        SELECT DISTINCT ON (title)
+            *,
+            GREATEST(title_similarity, content_similarity) AS similarity
+        FROM (
+            (
+                SELECT title, content, category, subcategory, keywords,
+                    1 - (title_vector <=> $1::vector) AS title_similarity,
+                    1 - (content_vector <=> $1::vector) AS content_similarity
+                FROM zama_documents
+                ORDER BY title_vector <=> $1::vector
+                LIMIT $2
+            )
+            UNION ALL
+            (
+                SELECT title, content, category, subcategory, keywords,
+                    1 - (title_vector <=> $1::vector) AS title_similarity,
+                    1 - (content_vector <=> $1::vector) AS content_similarity
+                FROM zama_documents
+                ORDER BY content_vector <=> $1::vector
+                LIMIT $2
+            )
+        ) hits
+        ORDER BY title, GREATEST(title_similarity, content_similarity) DESC
+    ) best
+    ORDER BY similarity DESC
+''', SEARCH)
+
+
+async def hybrid_search(embedding_str: str, limit: int = 5) -> List[Dict]:
+    """
+    Search documents by title and content vectors in one round trip
+
+    Args:
+        embedding_str: Query embedding
+        limit: Top-k taken from each of the title and content vectors
+
+    Returns:
+        Documents sorted by similarity, one per title, with title_similarity and content_similarity
+    """
+    try:
+        async with acquire_connection(SEARCH) as conn:
+            results = await conn.fetch_prepared(HYBRID_SEARCH, embedding_str, limit)
+            return [dict(row) for row in results]
+
+    except Exception as e:
+        logger.error(f"Hybrid search error: {e}")
+        return []
+
 
 async def vector_search_by_title(query: str, limit: int = 5) -> List[Dict]:
     """Search documents by vector similarity"""
@@ -61,3 +117,50 @@ async def vector_search_by_content(query: str, limit: int = 5) -> List[Dict]:
     except Exception as e:
         logger.error(f"Vector search error: {e}")
         return []
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import time
+    from app.init.postgres import init_db_pool
+    from app.init.config import get_settings
+
+    parser = argparse.ArgumentParser(description="Benchmark sequential title+content search against the combined query")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per question")
+    parser.add_argument("--limit", type=int, default=5, help="Top-k per vector")
+    parser.add_argument("questions", nargs="*", default=[
+        "How do I encrypt a uint64 in a contract?",
+        "How does access control work for ciphertexts?",
+        "What is the Zama token used for?"
+    ])
+    args = parser.parse_args()
+
+    def percentile(values: List[float], fraction: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+    async def run():
+        await init_db_pool(get_settings().DATABASE_URL)
+        client = GPT()
+        sequential, combined = [], []
+
+        for question in args.questions:
+            embedding_str = await client.generate_embedding(question)
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                old = await vector_search_by_title(embedding_str, args.limit) + await vector_search_by_content(embedding_str, args.limit)
+                sequential.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                new = await hybrid_search(embedding_str, args.limit)
+                combined.append(time.perf_counter() - start)
+
+            old_titles = {doc['title'] for doc in old}
+            new_titles = {doc['title'] for doc in new}
+            print(f"{question[:50]:<50} titles: {len(old_titles)} sequential, {len(new_titles)} combined, same: {old_titles == new_titles}")
+
+        for name, latencies in (("sequential", sequential), ("combined", combined)):
+            print(f"{name:<10} p50 {percentile(latencies, 0.5):.1f}ms, p95 {percentile(latencies, 0.95):.1f}ms")
+
+    asyncio.run(run())
@@ -1,7 +1,8 @@
 from typing import List, Dict
 from app.init.model import GPT
-from app.vt_proccessor.utils import vector_search
-from app.vt_proccessor.prompt import MAIN_PROMPT,UPDATE_PROMPT
+from app.old_releases.vt_proccessor.utils import vector_search
+from app.old_releases.vt_proccessor.prompt import MAIN_PROMPT,UPDATE_PROMPT
+from app.services.query_preprocessor import rewrite_locally
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,8 +49,12 @@ class QueryProcessor_vt:
             return "An error occurred while processing your question."
         
     async def _update_query(self, question: str) -> str:
-        """Update query for search from llm"""
+        """Update query for search from llm, skipping it for clean English queries"""
         try:
+            local_question = await rewrite_locally(question)
+            if local_question:
+                return local_question
+
             messages = [
                 {"role": "system", "content": UPDATE_PROMPT},
                 {"role": "user", "content": question}
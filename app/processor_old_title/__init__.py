@@ -12,9 +12,9 @@ class QueryProcessor:
     """Main class for processing queries - orchestrates the entire RAG process"""
     
     def __init__(self):
-        self.planner = QueryPlanner()
-        self.executor = QueryExecutor()
         self.gpt = GPT()
+        self.planner = QueryPlanner(self.gpt)
+        self.executor = QueryExecutor(self.gpt)
         
         logger.info("QueryProcessor initialized successfully")
     
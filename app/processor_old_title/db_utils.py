@@ -1,16 +1,48 @@
+import asyncio
 from typing import List, Dict
-from app.init.postgres import get_db_pool
+import asyncpg
+from app.init.postgres import get_db_pool, acquire_connection, query_timeout, SEARCH
 from app.init.model import GPT
 from app.services.redis_service import get_cached_documents, cache_documents
 import logging
 
 logger = logging.getLogger(__name__)
 
+TITLE_BATCH_QUERY = '''
+    SELECT 
+        q.title AS query,
+        d.title,
+        d.content,
+        d.category,
+        d.subcategory,
+        d.keywords
+    FROM unnest($1::text[]) WITH ORDINALITY AS q(title, ord)
+    CROSS JOIN LATERAL (
+        SELECT title, content, category, subcategory, keywords
+        FROM zama_documents
+        WHERE {match}
+        ORDER BY {order}
+        LIMIT $2
+    ) d
+    ORDER BY q.ord
+'''
+TRIGRAM_TITLE_QUERY = TITLE_BATCH_QUERY.format(
+    match="title ILIKE '%' || q.title || '%' OR title % q.title",
+    order="similarity(title, q.title) DESC",
+)
+ILIKE_TITLE_QUERY = TITLE_BATCH_QUERY.format(
+    match="title ILIKE '%' || q.title || '%'",
+    order="length(title)",
+)
 
-async def vector_search(query: str, limit: int = 5) -> List[Dict]:
+# Cleared once the database reports pg_trgm missing, lookups then use ILIKE only
+_trigram_available = True
+
+
+async def vector_search(query: str, limit: int = 5, client: GPT = None) -> List[Dict]:
     """Search documents by vector similarity"""
     try:
-        client = GPT()
+        client = client or GPT()
         embedding_str = await client.generate_embedding(query)
         
         pool = await get_db_pool()
@@ -38,37 +70,72 @@ async def vector_search(query: str, limit: int = 5) -> List[Dict]:
 
 async def title_search(query: str, limit: int = 10) -> List[Dict]:
     """Search documents by title with Redis caching"""
+    results = await title_search_batch([query], limit=limit)
+    return results.get(query, [])
+
+
+async def title_search_batch(titles: List[str], limit: int = 1) -> Dict[str, List[Dict]]:
+    """
+    Search documents for several titles in one query with Redis caching
+
+    Each title matches documents whose title contains it or is similar to it (pg_trgm),
+    best similarity first. Both conditions are served by the trigram GIN index on title.
+    Without pg_trgm only the ILIKE condition is used, and when the query fails the
+    Redis-cached titles are still returned.
+
+    Args:
+        titles: Titles selected by the planner
+        limit: Documents per title
+
+    Returns:
+        Dict of title to matching documents
+    """
     try:
-        # First, check Redis cache
-        cached_documents = await get_cached_documents(query)
-        if cached_documents is not None:
-            # Apply limit to cached results
-            return cached_documents[:limit]
+        titles = list(dict.fromkeys(titles))
         
-        # Cache miss - query database
-        pool = await get_db_pool()
+        # First, check Redis cache for every title
+        cached = await asyncio.gather(*[get_cached_documents(title) for title in titles])
+        results = {title: documents[:limit] for title, documents in zip(titles, cached) if documents is not None}
+        missing = [title for title in titles if title not in results]
+        if not missing:
+            return results
         
-        async with pool.acquire() as conn:
-            results = await conn.fetch('''
-                SELECT 
-                    title,
-                    content,
-                    category,
-                    subcategory,
-                    keywords
-                FROM zama_documents
-                WHERE LOWER(title) LIKE LOWER($1)
-                LIMIT $2
-            ''', f'%{query}%', limit)
-            
-            documents = [dict(row) for row in results]
-            
-            # Cache the results for next time
+        # Cache miss - one query for all remaining titles
+        try:
+            rows = await _fetch_titles(missing, limit)
+        except Exception as e:
+            logger.error(f"Title search error: {e}")
+            return results
+        
+        found: Dict[str, List[Dict]] = {title: [] for title in missing}
+        for row in rows:
+            document = dict(row)
+            found[document.pop('query')].append(document)
+        
+        # Cache the results for next time
+        for title, documents in found.items():
             if documents:
-                await cache_documents(query, documents)
-            
-            return documents
+                await cache_documents(title, documents)
+        
+        results.update(found)
+        return results
     
     except Exception as e:
         logger.error(f"Title search error: {e}")
-        return []
\ No newline at end of file
+        return {}
+
+
+async def _fetch_titles(titles: List[str], limit: int) -> List[asyncpg.Record]:
+    """Run the batched title lookup, falling back to ILIKE when pg_trgm is not installed"""
+    global _trigram_available
+    
+    async with acquire_connection(SEARCH) as conn:
+        if _trigram_available:
+            try:
+                return await conn.fetch(TRIGRAM_TITLE_QUERY, titles, limit, timeout=query_timeout(SEARCH))
+            except asyncpg.exceptions.UndefinedFunctionError:
+                _trigram_available = False
+                logger.error("pg_trgm extension is missing, title search falls back to ILIKE; "
+                             "run CREATE EXTENSION pg_trgm to enable similarity matching")
+        
+        return await conn.fetch(ILIKE_TITLE_QUERY, titles, limit, timeout=query_timeout(SEARCH))
@@ -0,0 +1,161 @@
+import asyncio
+import re
+import time
+from itertools import groupby
+from typing import Dict, Optional, Tuple
+from app.init.config import get_settings
+from app.init.postgres import acquire_connection, query_timeout, BULK
+from app.processor_old_title.prompts import DOCUMENTATION_INDEX
+from app.services.redis_service import get_cached_planner_index, cache_planner_index
+from app.services.token_governor import estimate_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tells the planner how to read the outline below it
+OUTLINE_HEADER = "Documentation index, one line per section: Section: number title | number title"
+
+# Process-wide index and when the document table version was last checked
+_index: Optional[Dict] = None
+_checked_at = 0.0
+_lock: Optional[asyncio.Lock] = None
+_static_index: Optional[Dict] = None
+
+
+def split_title(title: str, category: Optional[str] = None) -> Tuple[str, str]:
+    """Split 'Section - Title' into section and title, documents without a prefix go under their category"""
+    if " - " in title:
+        section, name = title.split(" - ", 1)
+        return section.strip(), name.strip()
+    return (category or "Other").strip(), title.strip()
+
+
+def encode_outline(documents: Dict[int, str], categories: Optional[Dict[int, str]] = None) -> str:
+    """
+    Encode numbered titles as a compact outline
+
+    Consecutive documents of one section share a line, so the section name is sent
+    once instead of once per document and list numbering punctuation is dropped.
+    """
+    categories = categories or {}
+    entries = [(num, *split_title(documents[num], categories.get(num))) for num in sorted(documents)]
+
+    lines = [OUTLINE_HEADER]
+    for section, group in groupby(entries, key=lambda entry: entry[1]):
+        lines.append(f"{section}: " + " | ".join(f"{num} {name}" for num, _, name in group))
+    return "\n".join(lines)
+
+
+def build_index(version: str, documents: Dict[int, str], categories: Optional[Dict[int, str]] = None) -> Dict:
+    """Build the planner index with its prompt token count"""
+    outline = encode_outline(documents, categories)
+    return {
+        "version": version,
+        "outline": outline,
+        "documents": documents,
+        "tokens": estimate_tokens(outline)
+    }
+
+
+def get_static_index() -> Dict:
+    """Index parsed from the hand-maintained DOCUMENTATION_INDEX, used when the database is unavailable"""
+    global _static_index
+    if _static_index is None:
+        documents = {}
+        for line in DOCUMENTATION_INDEX.strip().split('\n'):
+            match = re.match(r'^(\d+)\.\s+(.+)$', line.strip())
+            if match:
+                documents[int(match.group(1))] = match.group(2)
+        _static_index = build_index("static", documents)
+    return _static_index
+
+
+async def get_index_version() -> Optional[str]:
+    """Version of the document table - a hash over titles and categories, the only inputs of the index"""
+    async with acquire_connection(BULK) as conn:
+        return await conn.fetchval('''
+            SELECT md5(string_agg(title || ':' || coalesce(category, ''), E'\\n' ORDER BY title, category))
+            FROM zama_documents
+        ''', timeout=query_timeout(BULK))
+
+
+async def load_index(version: str) -> Dict:
+    """Build the index from the document table, numbering documents by section then title"""
+    async with acquire_connection(BULK) as conn:
+        rows = await conn.fetch('''
+            SELECT title, max(category) AS category
+            FROM zama_documents
+            GROUP BY title
+        ''', timeout=query_timeout(BULK))
+
+    rows = sorted(rows, key=lambda row: split_title(row['title'], row['category']))
+    documents = {num: row['title'] for num, row in enumerate(rows, 1)}
+    categories = {num: row['category'] for num, row in enumerate(rows, 1)}
+    return build_index(version, documents, categories)
+
+
+async def get_documentation_index() -> Dict:
+    """
+    Get the planner documentation index for the current document table
+
+    The table version is checked at most every CORPUS_VERSION_TTL_SECONDS. The index
+    is rebuilt only when the version changes, and is shared through Redis so every
+    replica builds it once per version.
+
+    Returns:
+        Dict with version, outline (prompt text), documents (number to title) and tokens
+    """
+    global _index, _checked_at, _lock
+    if _index is not None and time.monotonic() - _checked_at < get_settings().CORPUS_VERSION_TTL_SECONDS:
+        return _index
+
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        # Another caller may have refreshed it while we waited
+        if _index is not None and time.monotonic() - _checked_at < get_settings().CORPUS_VERSION_TTL_SECONDS:
+            return _index
+
+        try:
+            version = await get_index_version()
+            if not version:
+                raise ValueError("zama_documents is empty")
+
+            if _index is None or _index["version"] != version:
+                index = await get_cached_planner_index(version)
+                if index:
+                    # JSON object keys are strings
+                    index["documents"] = {int(num): title for num, title in index["documents"].items()}
+                else:
+                    index = await load_index(version)
+                    await cache_planner_index(version, index)
+                    logger.info(f"Planner index built for version {version[:8]}: {len(index['documents'])} documents, "
+                                f"{index['tokens']} tokens (static index {estimate_tokens(DOCUMENTATION_INDEX)} tokens)")
+                _index = index
+
+        except Exception as e:
+            logger.error(f"Planner index error: {e}")
+            if _index is None:
+                _index = get_static_index()
+
+        _checked_at = time.monotonic()
+        return _index
+
+
+if __name__ == "__main__":
+    from app.init.postgres import init_db_pool
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        static = get_static_index()
+        print(f"Static index: {len(static['documents'])} documents, "
+              f"{estimate_tokens(DOCUMENTATION_INDEX)} tokens as numbered list, {static['tokens']} tokens as outline")
+
+        await init_db_pool(get_settings().DATABASE_URL)
+        index = await get_documentation_index()
+        print(f"Database index {index['version'][:8]}: {len(index['documents'])} documents, {index['tokens']} tokens")
+        print(index["outline"])
+
+    asyncio.run(run())
@@ -1,5 +1,7 @@
+import asyncio
 from typing import Dict, List
-from app.processor_old_title.db_utils import vector_search, title_search
+from app.init.model import GPT
+from app.processor_old_title.db_utils import vector_search, title_search_batch
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,26 +10,31 @@ logger = logging.getLogger(__name__)
 class QueryExecutor:
     """Query executor - performs search based on planner results"""
     
-    def __init__(self):
-        pass
+    def __init__(self, gpt: GPT = None):
+        self.gpt = gpt or GPT()
     
     async def execute(self, planner_result: Dict, original_query: str) -> List[Dict]:
         """Execute document search based on planner results"""
         try:
-            documents = []
+            searches = []
             
             # Search by specific documents
             if planner_result.get("documents"):
-                documents.extend(await self._search_by_titles(planner_result))
+                searches.append(self._search_by_titles(planner_result))
             
             # Vector search
             if planner_result.get("vector_search", False):
                 search_query = self._prepare_vector_query(planner_result, original_query)
-                vector_results = await vector_search(
+                searches.append(vector_search(
                     query=search_query,
-                    limit=5
-                )
-                documents.extend(vector_results)
+                    limit=5,
+                    client=self.gpt
+                ))
+            
+            # Both branches run concurrently, title matches keep their place first
+            documents = []
+            for results in await asyncio.gather(*searches):
+                documents.extend(results)
             
             return self._remove_duplicates(documents)
             
@@ -36,17 +43,15 @@ class QueryExecutor:
             return await self._fallback_search(original_query)
     
     async def _search_by_titles(self, planner_result: Dict) -> List[Dict]:
-        """Search documents by titles"""
+        """Search documents by titles in one batched lookup"""
         documents = []
         document_titles = planner_result.get("document_titles", [])
+        if not document_titles:
+            return documents
         
+        title_results = await title_search_batch(document_titles, limit=1)
         for title in document_titles:
-            title_results = await title_search(
-                query=title,
-                limit=1
-            )
-            if title_results:
-                documents.extend(title_results)
+            documents.extend(title_results.get(title, []))
         
         return documents
     
@@ -74,7 +79,8 @@ class QueryExecutor:
         try:
             return await vector_search(
                 query=original_query,
-                limit=5
+                limit=5,
+                client=self.gpt
             )
         except Exception as fallback_error:
             logger.error(f"Error in fallback vector search: {fallback_error}")
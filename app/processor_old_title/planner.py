@@ -1,8 +1,8 @@
 import json
-import re
 from typing import Dict, List
 from app.init.model import GPT
-from app.processor_old_title.prompts import DOCUMENTATION_INDEX, PLANNER_PROMPT
+from app.processor_old_title.doc_index import get_documentation_index
+from app.processor_old_title.prompts import PLANNER_PROMPT
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,40 +11,28 @@ logger = logging.getLogger(__name__)
 class QueryPlanner:
     """Query planner for document selection"""
     
-    def __init__(self):
-        self.gpt = GPT()
-        self.documents_list = DOCUMENTATION_INDEX.strip()
-        self._parse_documentation_index()
-    
-    def _parse_documentation_index(self):
-        """Parse documentation index into structured format"""
-        self.documents = {}
-        lines = self.documents_list.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                match = re.match(r'^(\d+)\.\s+(.+)$', line)
-                if match:
-                    num = int(match.group(1))
-                    title = match.group(2)
-                    self.documents[num] = title
+    def __init__(self, gpt: GPT = None):
+        self.gpt = gpt or GPT()
     
     async def plan(self, query: str) -> Dict:
         """Plan document search for query"""
         try:
+            # Generated from the document table, numbers are only valid for this index version
+            index = await get_documentation_index()
+            documents = index["documents"]
+            
             messages = [
                 {"role": "system", "content": PLANNER_PROMPT},
-                {"role": "system", "content": self.documents_list},
+                {"role": "system", "content": index["outline"]},
                 {"role": "user", "content": query}
             ]
             
             content = await self.gpt.generate_planner_response(messages)
             result = json.loads(content)
-            result = self._validate_and_normalize_result(result)
+            result = self._validate_and_normalize_result(result, documents)
             
             if result.get("documents"):
-                result["document_titles"] = self.get_titles_by_numbers(result["documents"])
+                result["document_titles"] = self.get_titles_by_numbers(result["documents"], documents)
             
             return result
             
@@ -64,7 +52,7 @@ class QueryPlanner:
             "reasoning": "Error in planning process, falling back to vector search"
         }
     
-    def _validate_and_normalize_result(self, result: Dict) -> Dict:
+    def _validate_and_normalize_result(self, result: Dict, documents: Dict[int, str]) -> Dict:
         """Validate and normalize LLM result"""
         if "documents" not in result:
             result["documents"] = []
@@ -72,7 +60,7 @@ class QueryPlanner:
         if isinstance(result["documents"], list):
             valid_docs = []
             for doc in result["documents"]:
-                if isinstance(doc, int) and 1 <= doc <= len(self.documents):
+                if isinstance(doc, int) and doc in documents:
                     valid_docs.append(doc)
             result["documents"] = valid_docs[:5]
         else:
@@ -86,11 +74,11 @@ class QueryPlanner:
         
         return result
     
-    def get_titles_by_numbers(self, numbers: List[int]) -> List[str]:
+    def get_titles_by_numbers(self, numbers: List[int], documents: Dict[int, str]) -> List[str]:
         """Get document titles by numbers"""
         titles = []
         for num in numbers:
-            if num in self.documents:
-                titles.append(self.documents[num])
+            if num in documents:
+                titles.append(documents[num])
         return titles
 
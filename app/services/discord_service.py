@@ -1,16 +1,28 @@
+import asyncio
 import logging
+import signal
+import time
+from typing import Dict, List, Optional
 import discord
+from discord import app_commands
 from discord.ext import commands
-from app.agent import QueryProcessor
-# from app.hybrid_proccessor import QueryProcessor
-
 from app.init.postgres import init_db_pool
 from app.init.redis import init_redis_client
+from app.init.openai_client import init_openai_client
 from app.services.rate_limit import check_rate_limit
+from app.services.quota import check_quota, record_quota_usage
+from app.services.redis_service import get_conversation_state, save_conversation_state
+from app.services.query_log import init_query_logger, start_trace, log_query
+from app.services.lifecycle import get_lifecycle, RESTART_ANSWER
+from app.services.processor_registry import ProcessorRouter, record_processor_run
 from app.init.config import get_settings
+from app.init.startup import mark_phase, log_startup_report
 
 logger = logging.getLogger(__name__)
 
+# Discord message length limit
+MESSAGE_LIMIT = 2000
+
 
 class ZamaDiscordBot(commands.Bot):
     """Discord bot for Zama Protocol RAG system"""
@@ -24,31 +36,118 @@ class ZamaDiscordBot(commands.Bot):
         
         super().__init__(command_prefix='!', intents=intents)
         
-        self.processor=None
+        self.router: Optional[ProcessorRouter] = None
+        self.titles = None  # TitleAutocomplete, created in setup_hook
+        self.lifecycle = get_lifecycle()
+        self.shutdown_task: Optional[asyncio.Task] = None
+        self._ready_logged = False
 
     async def setup_hook(self):
         """Called when the bot is starting up"""
         logger.info("ZamaDiscordBot is starting up...")
+        mark_phase("login")
         
         # Initialize database pool
         await init_db_pool(
             self.config.DATABASE_URL,
             min_size=self.config.DB_MIN_SIZE,
-            max_size=self.config.DB_MAX_SIZE
+            max_size=self.config.DB_MAX_SIZE,
+            command_timeout=self.config.DB_COMMAND_TIMEOUT
         )
+        mark_phase("db_pool")
         
         # Initialize Redis client
         await init_redis_client(self.config.REDIS_URL)
+        mark_phase("redis")
+        
+        # Initialize shared OpenAI client with warm connections
+        await init_openai_client()
+        mark_phase("openai_client")
+        
+        # Start background query log writer
+        await init_query_logger()
+        mark_phase("query_log")
+        
+        # Initialize processors - their stacks are imported here, not at module import
+        self.router = ProcessorRouter()
+        mark_phase("processor")
+        
+        # Load the corpus for in-process vector search before the first question
+        if self.config.VECTOR_SEARCH_ENGINE == "memory":
+            from app.agent.vector_engine import init_vector_engine
+            await init_vector_engine()
+            mark_phase("vector_engine")
+        
+        # /docs slash command, its autocomplete reads an in-memory title index
+        from app.services.title_index import TitleAutocomplete
+        self.titles = TitleAutocomplete()
+        await self.titles.refresh()
+        self._register_commands()
+        mark_phase("title_index")
+        try:
+            await self.tree.sync()
+        except Exception as e:
+            logger.error(f"Slash command sync error: {e}")
+        mark_phase("commands")
         
-        # Initialize QueryProcessor
-        self.processor = QueryProcessor()
+        # Redeploys send SIGTERM: finish in-flight answers before exiting
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._handle_signal, sig)
+            except NotImplementedError:  # Windows event loops
+                pass
+    
+    def _register_commands(self):
+        """Register /docs with title autocomplete"""
+        @app_commands.command(name="docs", description="Show a Zama documentation page")
+        @app_commands.describe(title="Start typing a page title")
+        async def docs(interaction: discord.Interaction, title: str):
+            await self.handle_docs(interaction, title)
+        
+        @docs.autocomplete("title")
+        async def docs_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+            # Answered from memory only - Discord drops autocomplete responses after 3 seconds
+            index = self.titles.get_index()
+            if index is None:
+                return []
+            return [
+                app_commands.Choice(name=f"{doc['title']} · {doc['category']}"[:100], value=f"#{doc['id']}")
+                for doc in index.suggest(current)
+            ]
+        
+        self.tree.add_command(docs)
+    
+    def _handle_signal(self, sig: signal.Signals):
+        """Start graceful shutdown once, further signals are ignored"""
+        if self.shutdown_task is None:
+            logger.info(f"Received {sig.name}, shutting down gracefully")
+            self.shutdown_task = asyncio.create_task(self.close())
 
 
+    async def close(self):
+        """Called on shutdown - drain in-flight answers, flush logs and close pools, then disconnect from Discord"""
+        if self.lifecycle.begin_shutdown():
+            await self.lifecycle.drain(self.config.SHUTDOWN_DRAIN_SECONDS)
+        # Resources close before super().close(): once the client is closed, run() returns
+        # and the event loop cancels whatever this task has left to do
+        if self.router:
+            await self.router.close()
+        if self.titles:
+            await self.titles.close()
+        await self.lifecycle.close_resources()
+        await super().close()
+
     async def on_ready(self):
         """Called when the bot is ready"""
         logger.info(f'{self.user} has connected to Discord!')
         logger.info(f'Bot is in {len(self.guilds)} guilds')
         
+        if not self._ready_logged:
+            self._ready_logged = True
+            mark_phase("gateway")
+            log_startup_report()
+        
     async def on_message(self, message: discord.Message):
         """Handle incoming messages"""
         # Ignore messages from bots
@@ -97,28 +196,68 @@ class ZamaDiscordBot(commands.Bot):
         
     async def process_query(self, message: discord.Message, query: str):
         """Process user query through RAG pipeline with rate limiting"""
+        # New questions are not accepted while shutting down
+        if not self.lifecycle.accepting:
+            await message.reply(RESTART_ANSWER)
+            return
+        
+        async with self.lifecycle.track(message):
+            await self._process_query(message, query)
+    
+    async def _process_query(self, message: discord.Message, query: str):
+        """Rate limit, answer and log one question"""
         user_id = message.author.id
         channel_id = message.channel.id
+        guild_id = message.guild.id if message.guild else None
         
-        # Check rate limits
-        is_allowed, wait_seconds = await check_rate_limit(user_id, channel_id)
+        # Check guild/tier quotas, or the global rate limits when quotas are disabled
+        if self.config.QUOTA_ENABLED:
+            role_ids = [role.id for role in getattr(message.author, 'roles', [])]
+            is_allowed, wait_seconds, limit = await check_quota(guild_id, user_id, channel_id, role_ids)
+        else:
+            is_allowed, wait_seconds = await check_rate_limit(user_id, channel_id)
+            limit = "minute"
         
         if not is_allowed:
-            rate_limit_message = f"Too many requests! Please wait {wait_seconds} seconds before sending another message."
+            if limit == "daily" and guild_id is None:
+                rate_limit_message = "You have used your daily question budget. Please try again tomorrow."
+            elif limit == "daily":
+                rate_limit_message = "This server has used its daily question budget. Please try again tomorrow."
+            else:
+                rate_limit_message = f"Too many requests! Please wait {wait_seconds} seconds before sending another message."
             await message.reply(rate_limit_message)
             return
         
+        trace = start_trace(query, processor=self.router.name)
+        
         # Show typing indicator
         async with message.channel.typing():
             try:
                 logger.info(f"Processing query from user {user_id}: {query[:50]}...")
                 
-                # Use QueryProcessor to get answer
-                answer_hd = await self.processor.process_query(query)
-
+                # Continue the conversation this message belongs to, if any
+                conversation_key = self._conversation_key(message)
+                state = await get_conversation_state(conversation_key) if conversation_key else None
+                
+                # Mirror new questions to the shadow candidate, follow-ups need context it does not have
+                if state is None:
+                    self.router.mirror(query)
+                
+                # Use the live processor to get answer
+                start = time.perf_counter()
+                try:
+                    answer_hd, new_state = await self.router.answer(query, state)
+                except Exception:
+                    record_processor_run(self.router.name, time.perf_counter() - start, trace, error=True)
+                    raise
+                record_processor_run(self.router.name, time.perf_counter() - start, trace)
 
                 # Send response
-                await message.reply(answer_hd)
+                reply = await message.reply(answer_hd)
+                
+                # Replies to the bot answer continue the same conversation
+                if new_state:
+                    await save_conversation_state(self._channel_conversation_key(message) or f"reply:{reply.id}", new_state)
 
                 logger.info(f"Successfully processed query for user {user_id}")
                         
@@ -126,6 +265,64 @@ class ZamaDiscordBot(commands.Bot):
                 logger.error(f"Error processing query: {e}")
                 error_response = "Sorry, an error occurred while processing your request. Please try again."
                 await message.reply(error_response)
+            finally:
+                log_query(trace)
+                await record_quota_usage(guild_id, trace.prompt_tokens + trace.completion_tokens, trace.cost_usd, user_id)
+                    
+    async def handle_docs(self, interaction: discord.Interaction, title: str):
+        """Send the chosen documentation page, read by id without any LLM stage"""
+        if not self.lifecycle.accepting:
+            await interaction.response.send_message(RESTART_ANSWER, ephemeral=True)
+            return
+        
+        index = self.titles.get_index() if self.titles else None
+        document = index.resolve(title) if index else None
+        if document is None:
+            await interaction.response.send_message(f"No documentation page matches \"{title[:100]}\".", ephemeral=True)
+            return
+        
+        logger.info(f"/docs from user {interaction.user.id}: {document['title']}")
+        async with self.lifecycle.track(None):
+            await interaction.response.defer(thinking=True)
+            try:
+                # By id: several rows can share a title and category, the user picked this one
+                page = await self.titles.retriever.get_document_by_id(document['id'])
+                if page:
+                    await interaction.followup.send(self._format_document(page))
+                else:
+                    await interaction.followup.send("Sorry, this page could not be loaded. Please try again.")
+            except Exception as e:
+                logger.error(f"/docs error: {e}")
+                await interaction.followup.send("Sorry, an error occurred while loading this page. Please try again.")
+    
+    def _format_document(self, document: Dict) -> str:
+        """Title, link and as much of the page as fits in one message"""
+        header = f"**{document['title']}**"
+        if document.get('link'):
+            header += f"\n<{document['link']}>"
+        
+        content = document.get('content') or ''
+        room = MESSAGE_LIMIT - len(header) - 2
+        if len(content) > room:
+            content = content[:room - 1] + "…"
+        return f"{header}\n\n{content}"
+    
+    def _conversation_key(self, message: discord.Message) -> Optional[str]:
+        """Key of the conversation a message continues: its thread, its DM, or the bot answer it replies to"""
+        channel_key = self._channel_conversation_key(message)
+        if channel_key:
+            return channel_key
+        if message.reference and message.reference.message_id:
+            return f"reply:{message.reference.message_id}"
+        return None
+    
+    def _channel_conversation_key(self, message: discord.Message) -> Optional[str]:
+        """Threads and DMs are conversations on their own"""
+        if isinstance(message.channel, discord.Thread):
+            return f"thread:{message.channel.id}"
+        if isinstance(message.channel, discord.DMChannel):
+            return f"dm:{message.channel.id}"
+        return None
                     
     def run_bot(self):
         """Run the Discord bot"""
@@ -0,0 +1,119 @@
+import asyncio
+import argparse
+from typing import Dict, Optional
+from app.init.config import get_settings
+from app.init.redis import get_redis_client
+from app.services.redis_service import get_top_questions, get_cached_answer, cache_answer
+import logging
+
+logger = logging.getLogger(__name__)
+
+WARMED_VERSION_KEY = "faq:warmed_version"
+
+
+async def warm_faq_answers(processor, top_n: int = None, force: bool = False) -> Dict[str, int]:
+    """
+    Precompute answers for the most frequent questions with the current corpus version
+
+    Args:
+        processor: agent.QueryProcessor used to answer
+        top_n: Number of most frequent questions to warm
+        force: Recompute answers that are already cached
+
+    Returns:
+        Dict with counts of warmed, skipped and failed questions
+    """
+    from app.agent import ERROR_ANSWER, GENERATION_ERROR_ANSWER
+
+    config = get_settings()
+    top_n = top_n or config.FAQ_TOP_N
+
+    corpus_version = await processor.searcher.retriever.get_corpus_version(refresh=True)
+    if not corpus_version:
+        raise RuntimeError("Corpus version unavailable, database is not reachable")
+
+    questions = await get_top_questions(top_n)
+    logger.info(f"Warming {len(questions)} questions for corpus version {corpus_version}")
+
+    stats = {"warmed": 0, "skipped": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(config.FAQ_WARMUP_CONCURRENCY)
+
+    async def warm(question: str):
+        async with semaphore:
+            if not force and await get_cached_answer(question, corpus_version):
+                stats["skipped"] += 1
+                return
+
+            answer, state = await processor.answer_question(question)
+            if answer in (ERROR_ANSWER, GENERATION_ERROR_ANSWER):
+                logger.warning(f"Failed to warm question: {question[:50]}...")
+                stats["failed"] += 1
+                return
+
+            await cache_answer(question, corpus_version, {
+                "answer": answer,
+                "titles": state.get("titles", []),
+                "categories": state.get("categories", [])
+            })
+            stats["warmed"] += 1
+
+    await asyncio.gather(*[warm(question) for question in questions])
+
+    redis_client = await get_redis_client()
+    await redis_client.set(WARMED_VERSION_KEY, corpus_version)
+
+    logger.info(f"FAQ warm-up finished: {stats}")
+    return stats
+
+
+async def watch_corpus(processor, top_n: int = None):
+    """Keep answers warm: a corpus change produces a new version, so every answer is recomputed
+
+    Nothing is warmed while the corpus version is unchanged; questions that became frequent
+    since the last run are picked up at the next change or by a one-off run.
+    """
+    config = get_settings()
+    redis_client = await get_redis_client()
+
+    while True:
+        try:
+            warmed_version: Optional[str] = await redis_client.get(WARMED_VERSION_KEY)
+            corpus_version = await processor.searcher.retriever.get_corpus_version(refresh=True)
+            if corpus_version and corpus_version != warmed_version:
+                logger.info(f"Corpus changed ({warmed_version} -> {corpus_version}), re-warming answers")
+                await warm_faq_answers(processor, top_n)
+        except Exception as e:
+            logger.error(f"FAQ warm-up error: {e}")
+
+        await asyncio.sleep(config.FAQ_WARMUP_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    from app.init.postgres import init_db_pool
+    from app.init.redis import init_redis_client
+
+    parser = argparse.ArgumentParser(description="Precompute answers for the most frequent questions")
+    parser.add_argument("--top", type=int, default=None, help="Number of questions to warm")
+    parser.add_argument("--force", action="store_true", help="Recompute answers that are already cached")
+    parser.add_argument("--watch", action="store_true", help="Keep running and re-warm on corpus changes")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    async def run():
+        from app.agent import QueryProcessor
+
+        config = get_settings()
+        await init_db_pool(config.DATABASE_URL)
+        await init_redis_client(config.REDIS_URL)
+
+        processor = QueryProcessor()
+        if args.watch:
+            await watch_corpus(processor, args.top)
+        else:
+            await warm_faq_answers(processor, args.top, force=args.force)
+
+    asyncio.run(run())
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESTART_ANSWER = "I'm restarting for an update, please ask again in a minute."
+
+
+class LifecycleManager:
+    """Tracks in-flight questions so shutdown can finish them before closing resources"""
+
+    def __init__(self):
+        self.accepting = True
+        self.in_flight: Dict[asyncio.Task, object] = {}
+        self.closed = False
+
+    def begin_shutdown(self) -> bool:
+        """Stop accepting new questions, False if shutdown already started"""
+        if not self.accepting:
+            return False
+        self.accepting = False
+        logger.info(f"Shutdown started, {len(self.in_flight)} questions in flight")
+        return True
+
+    @asynccontextmanager
+    async def track(self, message):
+        """Register the current task as in-flight work answering message"""
+        task = asyncio.current_task()
+        self.in_flight[task] = message
+        try:
+            yield
+        finally:
+            self.in_flight.pop(task, None)
+
+    async def drain(self, timeout: float):
+        """
+        Wait for in-flight questions to be answered
+
+        Questions still running at the deadline are handed off: the user is asked
+        to repeat the question and the task is cancelled.
+        """
+        if not self.in_flight:
+            return
+
+        start = time.monotonic()
+        total = len(self.in_flight)
+        _, pending = await asyncio.wait(list(self.in_flight), timeout=timeout)
+        logger.info(f"Drained {total - len(pending)}/{total} questions in {time.monotonic() - start:.1f}s")
+
+        for task in pending:
+            message = self.in_flight.get(task)
+            try:
+                if message is not None:
+                    await message.reply(RESTART_ANSWER)
+            except Exception as e:
+                logger.error(f"Hand-off reply error: {e}")
+            task.cancel()
+
+        if pending:
+            logger.warning(f"Cancelled {len(pending)} questions still running after {timeout}s")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close_resources(self):
+        """Flush metrics and the query log, then close shared clients and pools"""
+        if self.closed:
+            return
+        self.closed = True
+
+        from app.init.model import get_route_stats
+        from app.init.postgres import close_db_pool
+        from app.init.redis import close_redis_client
+        from app.init.openai_client import close_openai_client
+        from app.agent.category_rules import get_routing_stats
+        from app.services.query_log import close_query_logger
+
+        logger.info(f"Model route stats: {get_route_stats()}")
+        logger.info(f"Category routing stats: {get_routing_stats()}")
+
+        # Query log first - it still needs the database pool to flush
+        for name, close in (
+            ("query log", close_query_logger),
+            ("OpenAI client", close_openai_client),
+            ("Redis client", close_redis_client),
+            ("database pool", close_db_pool)
+        ):
+            try:
+                await close()
+                logger.info(f"Closed {name}")
+            except Exception as e:
+                logger.error(f"Error closing {name}: {e}")
+
+
+# Global lifecycle manager
+_lifecycle: Optional[LifecycleManager] = None
+
+
+def get_lifecycle() -> LifecycleManager:
+    """Get process-wide lifecycle manager"""
+    global _lifecycle
+    if _lifecycle is None:
+        _lifecycle = LifecycleManager()
+    return _lifecycle
@@ -0,0 +1,135 @@
+import asyncio
+import importlib
+import random
+import time
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+from app.init.config import get_settings
+from app.services.query_log import start_trace, log_query, QueryTrace
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Available processors - imported on first use, all expose QueryProcessor.process_query
+PROCESSORS = {
+    "agent": "app.agent",
+    "new": "app.new_proccessor",
+    "old_title": "app.processor_old_title",
+    "hybrid": "app.old_releases.hybrid_proccessor"
+}
+
+# Latencies kept per processor for percentiles
+LATENCY_WINDOW = 1000
+
+# Per-processor latency, token and cost metrics, live and shadow runs alike
+_processor_stats: Dict[str, Dict] = {}
+
+
+def create_processor(name: str):
+    """Import and create the QueryProcessor registered under name"""
+    if name not in PROCESSORS:
+        raise ValueError(f"Unknown processor '{name}', available: {', '.join(PROCESSORS)}")
+    module = importlib.import_module(PROCESSORS[name])
+    return module.QueryProcessor()
+
+
+def record_processor_run(name: str, latency: float, trace: Optional[QueryTrace], error: bool = False):
+    """Add one answered question to the processor metrics"""
+    stats = _processor_stats.setdefault(name, {
+        "calls": 0,
+        "errors": 0,
+        "latencies": deque(maxlen=LATENCY_WINDOW),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0
+    })
+    stats["calls"] += 1
+    stats["errors"] += int(error)
+    stats["latencies"].append(latency)
+    if trace is not None:
+        stats["prompt_tokens"] += trace.prompt_tokens
+        stats["completion_tokens"] += trace.completion_tokens
+        stats["cost_usd"] += trace.cost_usd
+
+
+def get_processor_stats() -> Dict[str, Dict]:
+    """Get per-processor latency percentiles, tokens and cost per question"""
+    result = {}
+    for name, stats in _processor_stats.items():
+        latencies = sorted(stats["latencies"])
+        calls = stats["calls"]
+        result[name] = {
+            "calls": calls,
+            "errors": stats["errors"],
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0.0,
+            "tokens_per_question": round((stats["prompt_tokens"] + stats["completion_tokens"]) / calls, 1) if calls else 0.0,
+            "cost_per_question_usd": round(stats["cost_usd"] / calls, 6) if calls else 0.0
+        }
+    return result
+
+
+class ProcessorRouter:
+    """Answers with the configured processor and mirrors sampled traffic to a shadow candidate"""
+
+    def __init__(self):
+        self.config = get_settings()
+        self.name = self.config.PROCESSOR
+        self.processor = create_processor(self.name)
+
+        self.shadow_name = self.config.SHADOW_PROCESSOR if self.config.SHADOW_SAMPLE_RATE > 0 else None
+        self.shadow = create_processor(self.shadow_name) if self.shadow_name else None
+        self.shadow_tasks: Set[asyncio.Task] = set()
+        self.shadow_dropped = 0
+
+        logger.info(f"Processor: {self.name}" + (f", shadow: {self.shadow_name} at {self.config.SHADOW_SAMPLE_RATE:.0%}" if self.shadow else ""))
+
+    async def answer(self, question: str, state: Optional[Dict] = None) -> Tuple[str, Optional[Dict]]:
+        """Answer with the live processor; only the agent keeps conversation state"""
+        if hasattr(self.processor, "process_conversation"):
+            return await self.processor.process_conversation(question, state)
+        return await self.processor.process_query(question), None
+
+    def mirror(self, question: str):
+        """Send question to the shadow processor in the background, never blocking the reply"""
+        if not self.shadow or random.random() >= self.config.SHADOW_SAMPLE_RATE:
+            return
+
+        # Shadow traffic is shed instead of queued when the candidate is saturated
+        if len(self.shadow_tasks) >= self.config.SHADOW_CONCURRENCY:
+            self.shadow_dropped += 1
+            return
+
+        task = asyncio.create_task(self._run_shadow(question))
+        self.shadow_tasks.add(task)
+        task.add_done_callback(self.shadow_tasks.discard)
+
+    async def _run_shadow(self, question: str):
+        """Answer question with the shadow processor under its own trace, discarding the answer"""
+        # The task runs in a copied context, so this trace does not touch the live one
+        trace = start_trace(question, processor=self.shadow_name)
+        start = time.perf_counter()
+        error = False
+        try:
+            # Skip conversation bookkeeping (question frequency, answer cache) for the agent
+            if hasattr(self.shadow, "answer_question"):
+                await self.shadow.answer_question(question)
+            else:
+                await self.shadow.process_query(question)
+        except Exception as e:
+            error = True
+            logger.error(f"Shadow processor {self.shadow_name} error: {e}")
+        finally:
+            record_processor_run(self.shadow_name, time.perf_counter() - start, trace, error)
+            log_query(trace)
+
+    async def close(self):
+        """Cancel shadow runs still in progress, then close processors that hold resources"""
+        for task in list(self.shadow_tasks):
+            task.cancel()
+        if self.shadow_tasks:
+            await asyncio.gather(*self.shadow_tasks, return_exceptions=True)
+        for processor in (self.processor, self.shadow):
+            if hasattr(processor, "close"):
+                await processor.close()
+        logger.info(f"Processor stats: {get_processor_stats()}, shadow dropped: {self.shadow_dropped}")
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import logging.handlers
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.init.config import get_settings
+from app.init.postgres import get_db_pool
+from app.services.redis_service import normalize_question
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_QUERY = '''
+    CREATE TABLE IF NOT EXISTS zama_query_log (
+        id BIGSERIAL PRIMARY KEY,
+        created_at TIMESTAMPTZ NOT NULL,
+        question TEXT NOT NULL,
+        processor TEXT,
+        categories TEXT[],
+        titles TEXT[],
+        fallback BOOLEAN,
+        stage_ms JSONB,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        cost_usd DOUBLE PRECISION,
+        cache_hits JSONB,
+        total_ms DOUBLE PRECISION
+    )
+'''
+
+INSERT_QUERY = '''
+    INSERT INTO zama_query_log (
+        created_at, question, processor, categories, titles, fallback,
+        stage_ms, prompt_tokens, completion_tokens, cost_usd, cache_hits, total_ms
+    )
+    VALUES (to_timestamp($1), $2, $3, $4, $5, $6, $7::jsonb, $8, $9, $10, $11::jsonb, $12)
+'''
+
+# Trace of the request being processed in the current task
+_current_trace: ContextVar[Optional["QueryTrace"]] = ContextVar("query_trace", default=None)
+
+
+class QueryTrace:
+    """What happened while answering one question"""
+
+    def __init__(self, question: str, processor: str = "agent"):
+        self.created_at = time.time()
+        self.question = normalize_question(question)
+        self.processor = processor
+        self.categories: List[str] = []
+        self.titles: List[str] = []
+        self.fallback = False
+        self.stage_ms: Dict[str, float] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.cache_hits: Dict[str, bool] = {}
+        self.total_ms: Optional[float] = None
+
+    def finish(self):
+        self.total_ms = round((time.time() - self.created_at) * 1000, 1)
+
+    def to_record(self) -> Dict:
+        return {
+            "created_at": self.created_at,
+            "question": self.question,
+            "processor": self.processor,
+            "categories": self.categories,
+            "titles": self.titles,
+            "fallback": self.fallback,
+            "stage_ms": self.stage_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cache_hits": self.cache_hits,
+            "total_ms": self.total_ms
+        }
+
+
+def start_trace(question: str, processor: str = "agent") -> QueryTrace:
+    """Start tracing a question in the current task"""
+    trace = QueryTrace(question, processor)
+    _current_trace.set(trace)
+    return trace
+
+
+def get_current_trace() -> Optional[QueryTrace]:
+    """Trace of the current task, None outside of a traced request"""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Measure a pipeline stage duration into the current trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.stage_ms[name] = round(trace.stage_ms.get(name, 0) + (time.perf_counter() - start) * 1000, 1)
+
+
+def record_usage(prompt_tokens: int, completion_tokens: int, cost_usd: float):
+    """Add LLM usage to the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.prompt_tokens += prompt_tokens
+        trace.completion_tokens += completion_tokens
+        trace.cost_usd += cost_usd
+
+
+def record_selection(categories: List[str], titles: List[str]):
+    """Record selected categories and titles in the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.categories = list(categories)
+        trace.titles = list(titles)
+
+
+def record_fallback():
+    """Mark the current trace as answered through the fallback search"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fallback = True
+
+
+def record_cache(name: str, hit: bool):
+    """Record a cache lookup result in the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.cache_hits[name] = hit
+
+
+class QueryLogger:
+    """Async batched query log - callers never wait for storage"""
+
+    def __init__(self, sink: str):
+        self.config = get_settings()
+        self.sink = sink
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.QUERY_LOG_QUEUE_SIZE)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.batch: List[Dict] = []
+        self.file_logger: Optional[logging.Logger] = None
+
+    async def start(self):
+        """Prepare the sink and start the background flusher"""
+        if self.sink == "postgres":
+            pool = await get_db_pool()
+            async with pool.acquire() as conn:
+                await conn.execute(CREATE_TABLE_QUERY)
+        elif self.sink == "file":
+            handler = logging.handlers.RotatingFileHandler(
+                self.config.QUERY_LOG_FILE,
+                maxBytes=self.config.QUERY_LOG_FILE_MAX_BYTES,
+                backupCount=self.config.QUERY_LOG_FILE_BACKUPS,
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.file_logger = logging.getLogger("zama.query_log")
+            self.file_logger.propagate = False
+            self.file_logger.setLevel(logging.INFO)
+            self.file_logger.addHandler(handler)
+
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Query log started with {self.sink} sink")
+
+    def log(self, trace: QueryTrace):
+        """Queue trace for writing, dropping it if the queue is full"""
+        try:
+            self.queue.put_nowait(trace.to_record())
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Query log queue full, dropped {self.dropped} records")
+
+    async def _run(self):
+        """Flush batches when full or every flush interval"""
+        while True:
+            self.batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.config.QUERY_LOG_FLUSH_SECONDS
+            while len(self.batch) < self.config.QUERY_LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    self.batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(self.batch)
+            self.batch = []
+
+    async def _write(self, batch: List[Dict]):
+        """Write batch to the sink, logging and dropping it on failure"""
+        try:
+            if self.sink == "postgres":
+                pool = await get_db_pool()
+                async with pool.acquire() as conn:
+                    await conn.executemany(INSERT_QUERY, [
+                        (
+                            record["created_at"], record["question"], record["processor"],
+                            record["categories"], record["titles"], record["fallback"],
+                            json.dumps(record["stage_ms"]), record["prompt_tokens"],
+                            record["completion_tokens"], record["cost_usd"],
+                            json.dumps(record["cache_hits"]), record["total_ms"]
+                        )
+                        for record in batch
+                    ])
+            elif self.file_logger is not None:
+                lines = "\n".join(json.dumps(record, ensure_ascii=False) for record in batch)
+                await asyncio.to_thread(self.file_logger.info, lines)
+            logger.debug(f"Query log flushed {len(batch)} records")
+        except Exception as e:
+            logger.error(f"Query log write error: {e}")
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        # Records taken by the flusher but not written yet, then the queue
+        batch, self.batch = self.batch, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._write(batch)
+
+
+# Global query logger
+_query_logger: Optional[QueryLogger] = None
+
+
+async def init_query_logger() -> Optional[QueryLogger]:
+    """Initialize query logger for the configured sink, None when disabled"""
+    global _query_logger
+    config = get_settings()
+    if _query_logger is None and config.QUERY_LOG_SINK != "off":
+        _query_logger = QueryLogger(config.QUERY_LOG_SINK)
+        await _query_logger.start()
+    return _query_logger
+
+
+def log_query(trace: QueryTrace):
+    """Finish trace and queue it, no-op when the query log is disabled"""
+    trace.finish()
+    if _query_logger is not None:
+        _query_logger.log(trace)
+
+
+async def close_query_logger():
+    """Flush and stop query logger"""
+    global _query_logger
+    if _query_logger:
+        await _query_logger.stop()
+        _query_logger = None
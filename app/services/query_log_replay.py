@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List
+from app.init.config import get_settings
+from app.init.postgres import get_db_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def load_records_from_postgres(days: int) -> List[Dict]:
+    """Load query log records of the last days, oldest first"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT
+                extract(epoch FROM created_at) AS created_at,
+                question,
+                processor,
+                categories,
+                titles,
+                fallback,
+                prompt_tokens,
+                completion_tokens,
+                cost_usd,
+                total_ms
+            FROM zama_query_log
+            WHERE created_at >= now() - make_interval(days => $1)
+            ORDER BY created_at
+        ''', days)
+        return [dict(row) for row in rows]
+
+
+def load_records_from_file(path: str) -> List[Dict]:
+    """Load query log records from rotating JSON lines files, oldest first"""
+    config = get_settings()
+    paths = [f"{path}.{i}" for i in range(config.QUERY_LOG_FILE_BACKUPS, 0, -1)] + [path]
+
+    records = []
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda record: record["created_at"])
+
+
+def simulate_lru(records: List[Dict], key: Callable[[Dict], str], capacity: int) -> float:
+    """Hit rate of an LRU cache with fixed capacity"""
+    cache: OrderedDict = OrderedDict()
+    hits = 0
+    for record in records:
+        k = key(record)
+        if k in cache:
+            hits += 1
+            cache.move_to_end(k)
+        else:
+            cache[k] = True
+            if len(cache) > capacity:
+                cache.popitem(last=False)
+    return hits / len(records) if records else 0.0
+
+
+def simulate_ttl(records: List[Dict], key: Callable[[Dict], str], ttl: float) -> float:
+    """Hit rate of an unbounded cache whose entries expire after ttl seconds"""
+    stored_at: Dict[str, float] = {}
+    hits = 0
+    for record in records:
+        k = key(record)
+        if k in stored_at and record["created_at"] - stored_at[k] < ttl:
+            hits += 1
+        else:
+            stored_at[k] = record["created_at"]
+    return hits / len(records) if records else 0.0
+
+
+def simulate_precomputed(records: List[Dict], top_n: int) -> float:
+    """Hit rate of answers precomputed for the top questions of the first half, measured on the second half"""
+    split = len(records) // 2
+    top = {question for question, _ in Counter(r["question"] for r in records[:split]).most_common(top_n)}
+    evaluated = records[split:]
+    return sum(r["question"] in top for r in evaluated) / len(evaluated) if evaluated else 0.0
+
+
+def report_cache_policies(records: List[Dict]) -> Dict[str, float]:
+    """Achievable hit rates for different cache policies over the logged traffic"""
+    def question_key(record: Dict) -> str:
+        return record["question"]
+
+    def documents_key(record: Dict) -> str:
+        return f"{sorted(record['categories'] or [])}|{sorted(record['titles'] or [])}"
+
+    routed = [r for r in records if not r["fallback"] and r["titles"]]
+
+    policies = {}
+    for capacity in (100, 1000, 10000):
+        policies[f"answer LRU {capacity}"] = simulate_lru(records, question_key, capacity)
+    for hours in (1, 24, 24 * 7):
+        policies[f"answer TTL {hours}h"] = simulate_ttl(records, question_key, hours * 3600)
+    for top_n in (20, 50, 100):
+        policies[f"precomputed top {top_n}"] = simulate_precomputed(records, top_n)
+    policies["documents TTL 24h (routed only)"] = simulate_ttl(routed, documents_key, 24 * 3600)
+    return policies
+
+
+def report_processors(records: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Latency, tokens and cost per question for each processor, live and shadow runs side by side"""
+    by_processor: Dict[str, List[Dict]] = {}
+    for record in records:
+        by_processor.setdefault(record.get("processor") or "agent", []).append(record)
+
+    report = {}
+    for processor, runs in by_processor.items():
+        latencies = sorted(r["total_ms"] for r in runs if r.get("total_ms") is not None)
+        report[processor] = {
+            "questions": len(runs),
+            "p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            "tokens": sum((r.get("prompt_tokens") or 0) + (r.get("completion_tokens") or 0) for r in runs) / len(runs),
+            "cost_usd": sum(r.get("cost_usd") or 0 for r in runs) / len(runs),
+            "fallback": sum(bool(r["fallback"]) for r in runs) / len(runs)
+        }
+    return report
+
+
+async def replay_through_processor(records: List[Dict], limit: int, concurrency: int) -> Dict[str, float]:
+    """Replay distinct logged questions through the current pipeline and measure latency"""
+    from app.agent import QueryProcessor
+
+    processor = QueryProcessor()
+    questions = list(dict.fromkeys(r["question"] for r in records))[:limit]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(question: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await processor.answer_question(question)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[run(question) for question in questions])
+    latencies.sort()
+    if not latencies:
+        return {}
+    return {
+        "questions": len(latencies),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+if __name__ == "__main__":
+    from app.init.postgres import init_db_pool
+    from app.init.redis import init_redis_client
+
+    parser = argparse.ArgumentParser(description="Replay query log for cache analytics and benchmarking")
+    parser.add_argument("--source", choices=["postgres", "file"], default="postgres")
+    parser.add_argument("--file", default=None, help="Query log file, defaults to QUERY_LOG_FILE")
+    parser.add_argument("--days", type=int, default=7, help="Days of Postgres log to load")
+    parser.add_argument("--run", type=int, default=0, help="Replay this many distinct questions through the pipeline")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.WARNING
+    )
+
+    async def run():
+        config = get_settings()
+        if args.source == "postgres" or args.run:
+            await init_db_pool(config.DATABASE_URL)
+        if args.run:
+            await init_redis_client(config.REDIS_URL)
+
+        if args.source == "postgres":
+            records = await load_records_from_postgres(args.days)
+        else:
+            records = load_records_from_file(args.file or config.QUERY_LOG_FILE)
+
+        print("\nProcessors (per question):")
+        print(f"  {'processor':<12} {'questions':>9} {'p50_ms':>9} {'p95_ms':>9} {'tokens':>8} {'cost_usd':>10} {'fallback':>9}")
+        for processor, row in report_processors(records).items():
+            print(f"  {processor:<12} {row['questions']:>9} {row['p50_ms']:>9.0f} {row['p95_ms']:>9.0f} "
+                  f"{row['tokens']:>8.0f} {row['cost_usd']:>10.5f} {row['fallback']:>9.1%}")
+        
+        # Cache analytics only on live traffic, shadow runs would count questions twice
+        records = [r for r in records if (r.get("processor") or "agent") == config.PROCESSOR]
+        distinct = len({r["question"] for r in records})
+        fallback = sum(bool(r["fallback"]) for r in records)
+        print(f"\nLive records ({config.PROCESSOR}): {len(records)}, distinct questions: {distinct}, fallback: {fallback}")
+        print("\nAchievable cache hit rates:")
+        for policy, hit_rate in report_cache_policies(records).items():
+            print(f"  {policy:<34} {hit_rate:6.1%}")
+
+        if args.run:
+            print("\nPipeline replay:")
+            for name, value in (await replay_through_processor(records, args.run, args.concurrency)).items():
+                print(f"  {name:<10} {value:10.1f}")
+
+    asyncio.run(run())
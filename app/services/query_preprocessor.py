@@ -0,0 +1,184 @@
+import asyncio
+import difflib
+import re
+import time
+from typing import Dict, List, Optional, Set
+from app.init.config import get_settings
+from app.init.postgres import acquire_connection, query_timeout, BULK
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Zama-specific abbreviations expanded the same way UPDATE_PROMPT asks the LLM to
+ABBREVIATIONS = {
+    "fhe": "FHE fully homomorphic encryption",
+    "fhevm": "FHEVM",
+    "tfhe": "TFHE",
+    "kms": "KMS key management service",
+    "acl": "ACL access control list",
+    "tge": "TGE token generation event",
+    "sdk": "SDK",
+    "dapp": "dApp decentralized application",
+    "evm": "EVM",
+    "mpc": "MPC multi-party computation",
+    "zk": "ZK zero-knowledge",
+    "zkpok": "ZKPoK zero-knowledge proof of knowledge",
+    "erc20": "ERC20 token",
+    "erc7984": "ERC7984 confidential token",
+}
+
+# Function words that never need a rewrite
+ENGLISH_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "can", "could",
+    "should", "would", "will", "i", "you", "we", "it", "its", "my", "your", "our", "this", "that",
+    "these", "those", "what", "which", "who", "whom", "when", "where", "why", "how", "of", "in", "on",
+    "at", "to", "for", "from", "with", "by", "about", "into", "and", "or", "not", "no", "yes", "if",
+    "then", "there", "any", "some", "all", "use", "using", "used", "get", "make", "work", "works",
+    "need", "have", "has", "me", "please", "explain", "tell", "difference", "between",
+}
+
+# Product names kept in the query even when no title contains them
+PRODUCT_TERMS = {"zama"}
+
+# Frequent words of other Latin-script languages that mark a query as non-English
+FOREIGN_STOPWORDS = {
+    "que", "como", "qué", "cómo", "el", "los", "las", "una", "por", "para", "est", "le", "les", "des",
+    "une", "comment", "pourquoi", "der", "die", "das", "und", "ist", "wie", "nicht", "ein",
+    "eine", "o", "um", "uma", "não", "che", "il", "di", "perché", "cosa", "je", "ik", "het", "een",
+}
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_$.-]*")
+
+# Similarity a misspelled word needs to a vocabulary word to be corrected
+TYPO_CUTOFF = 0.85
+
+# Corrected words kept per vocabulary, typos repeat across queries
+CORRECTION_CACHE_SIZE = 4096
+
+# Vocabulary mined from document titles, shared by all preprocessors
+_vocabulary: Optional[Set[str]] = None
+_vocabulary_loaded_at = 0.0
+_words_by_length: Dict[int, List[str]] = {}
+_corrections: Dict[str, Optional[str]] = {}
+
+
+def detect_language(text: str) -> str:
+    """Detect query language: 'en' for English, 'other' otherwise"""
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return "other"
+
+    # Any non-Latin script (Cyrillic, CJK, ...) or accented text is not English
+    ascii_letters = sum(ch.isascii() for ch in letters)
+    if ascii_letters / len(letters) < 0.98:
+        return "other"
+
+    words = [w.lower() for w in re.findall(r"[A-Za-z]+", text)]
+    foreign = sum(w in FOREIGN_STOPWORDS for w in words)
+    english = sum(w in ENGLISH_STOPWORDS for w in words)
+    return "other" if foreign > english else "en"
+
+
+async def get_vocabulary() -> Set[str]:
+    """Get vocabulary of words used in zama_fdocs titles, refreshed after cache TTL"""
+    global _vocabulary, _vocabulary_loaded_at, _words_by_length, _corrections
+    config = get_settings()
+
+    if _vocabulary is not None and time.monotonic() - _vocabulary_loaded_at < config.CORPUS_VERSION_TTL_SECONDS:
+        return _vocabulary
+
+    try:
+        async with acquire_connection(BULK) as conn:
+            rows = await conn.fetch('SELECT DISTINCT title FROM zama_fdocs', timeout=query_timeout(BULK))
+
+        vocabulary = set(ENGLISH_STOPWORDS) | set(ABBREVIATIONS) | PRODUCT_TERMS
+        for row in rows:
+            vocabulary.update(w.lower() for w in WORD_PATTERN.findall(row['title']))
+
+        words_by_length: Dict[int, List[str]] = {}
+        for word in vocabulary:
+            words_by_length.setdefault(len(word), []).append(word)
+
+        _vocabulary = vocabulary
+        _words_by_length = words_by_length
+        _corrections = {}
+        _vocabulary_loaded_at = time.monotonic()
+        logger.info(f"Query vocabulary loaded: {len(vocabulary)} words")
+    except Exception as e:
+        logger.error(f"Vocabulary load error: {e}")
+        if _vocabulary is None:
+            return set()
+
+    return _vocabulary
+
+
+def correct_word(word: str) -> Optional[str]:
+    """
+    Closest vocabulary word to a misspelled word, None when nothing is close enough
+
+    Only vocabulary words whose length allows a similarity above TYPO_CUTOFF are compared,
+    which skips words that cannot match, and results are cached per vocabulary. The scan is
+    still linear in the vocabulary, so rewrite_locally runs uncached corrections in a thread.
+    """
+    if word in _corrections:
+        return _corrections[word]
+
+    # difflib ratio is at most 2 * min(a, b) / (a + b), which bounds the length of a match
+    shortest = int(len(word) * TYPO_CUTOFF / (2 - TYPO_CUTOFF))
+    longest = int(len(word) * (2 - TYPO_CUTOFF) / TYPO_CUTOFF) + 1
+    candidates = [w for length in range(shortest, longest + 1) for w in _words_by_length.get(length, ())]
+    matches = difflib.get_close_matches(word, candidates, n=1, cutoff=TYPO_CUTOFF)
+
+    if len(_corrections) >= CORRECTION_CACHE_SIZE:
+        _corrections.clear()
+    _corrections[word] = matches[0] if matches else None
+    return _corrections[word]
+
+
+async def rewrite_locally(query: str) -> Optional[str]:
+    """
+    Rewrite query without an LLM call when it is already English and in vocabulary
+
+    Fixes typos against title vocabulary and expands Zama abbreviations.
+
+    Returns:
+        Rewritten query, or None when the query needs the LLM rewrite
+    """
+    if detect_language(query) != "en":
+        return None
+
+    vocabulary = await get_vocabulary()
+    if not vocabulary:
+        return None
+
+    words = WORD_PATTERN.findall(query)
+    if not words or len(words) > 12:
+        return None
+
+    rewritten = []
+    for word in words:
+        lower = word.lower().strip(".-")
+        if lower in ABBREVIATIONS:
+            rewritten.append(ABBREVIATIONS[lower])
+        elif lower in vocabulary or lower.isdigit():
+            if lower not in ENGLISH_STOPWORDS:
+                rewritten.append(word)
+        else:
+            # Only long words are corrected, short ones are too ambiguous
+            if len(lower) < 5:
+                match = None
+            elif lower in _corrections:
+                match = _corrections[lower]
+            else:
+                # Keeps the event loop responsive while the vocabulary is scanned
+                match = await asyncio.to_thread(correct_word, lower)
+            if not match:
+                return None
+            if match not in ENGLISH_STOPWORDS:
+                rewritten.append(match)
+
+    if not rewritten:
+        return None
+
+    logger.debug(f"Local rewrite: {query} -> {' '.join(rewritten)}")
+    return " ".join(rewritten)
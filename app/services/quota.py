@@ -0,0 +1,269 @@
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.init.redis import get_redis_client
+from app.init.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_KEY = "quota:config"
+
+# Take one request from every bucket, or from none of them if any is empty.
+# KEYS: bucket hashes; ARGV: now, then capacity and refill rate (per second) per bucket.
+# Returns {1, 0} when admitted, {0, milliseconds until the emptiest bucket refills} otherwise.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait_ms = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait_ms = math.max(wait_ms, math.ceil((1 - tokens) / rate * 1000))
+    end
+end
+if wait_ms > 0 then
+    return {0, wait_ms}
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return {1, 0}
+"""
+
+# Cached quota config and when it was loaded from Redis
+_config_cache: Optional[Dict] = None
+_config_loaded_at = 0.0
+
+
+def _default_policy() -> Dict:
+    """Guild policy from Settings, used when Redis config does not override it"""
+    config = get_settings()
+    return {
+        "requests_per_minute": config.QUOTA_GUILD_REQUESTS_PER_MINUTE,
+        "burst": config.QUOTA_GUILD_BURST,
+        "user_requests_per_minute": config.USER_RATE_LIMIT_PER_MINUTE,
+        "user_burst": config.QUOTA_USER_BURST,
+        "daily_tokens": config.QUOTA_GUILD_DAILY_TOKENS,
+        "daily_cost_usd": config.QUOTA_GUILD_DAILY_COST_USD
+    }
+
+
+async def get_quota_config(refresh: bool = False) -> Dict:
+    """
+    Get quota config from Redis, reloaded every QUOTA_CONFIG_REFRESH_SECONDS
+
+    Config format (JSON in the quota:config key):
+        {
+            "default": {<policy>},
+            "tiers": {"moderator": {"user_requests_per_minute": 60, "user_burst": 20}},
+            "guilds": {
+                "<guild_id>": {
+                    <policy overrides>,
+                    "tier_roles": {"<role_id>": "moderator"},
+                    "whitelisted_channels": ["<channel_id>"]
+                }
+            },
+            "dm": {<policy overrides for direct messages>}
+        }
+
+    Whitelisted channels use the "whitelisted" tier.
+    """
+    global _config_cache, _config_loaded_at
+    settings = get_settings()
+
+    if not refresh and _config_cache is not None and time.monotonic() - _config_loaded_at < settings.QUOTA_CONFIG_REFRESH_SECONDS:
+        return _config_cache
+
+    try:
+        redis_client = await get_redis_client()
+        raw = await redis_client.get(CONFIG_KEY)
+        _config_cache = json.loads(raw) if raw else {}
+        _config_loaded_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Quota config load error: {e}")
+        if _config_cache is None:
+            return {}
+
+    return _config_cache
+
+
+async def set_quota_config(quota_config: Dict):
+    """Store quota config in Redis, every replica picks it up on its next refresh"""
+    redis_client = await get_redis_client()
+    await redis_client.set(CONFIG_KEY, json.dumps(quota_config))
+    await get_quota_config(refresh=True)
+
+
+def resolve_policy(quota_config: Dict, guild_id: Optional[int], channel_id: int, role_ids: List[int]) -> Tuple[Dict, Optional[str]]:
+    """
+    Resolve effective policy and tier for a message
+
+    Returns:
+        Tuple of (policy, tier name or None)
+    """
+    policy = {**_default_policy(), **quota_config.get("default", {})}
+    # DMs have no guild, they use the top-level "dm" overrides
+    guild_config = quota_config.get("guilds", {}).get(str(guild_id), {}) if guild_id else quota_config.get("dm", {})
+    policy.update({k: v for k, v in guild_config.items() if k not in ("tier_roles", "whitelisted_channels")})
+
+    # A member can match several tiers, the most generous one wins
+    tiers = quota_config.get("tiers", {})
+    matched = [guild_config.get("tier_roles", {}).get(str(role_id)) for role_id in role_ids]
+    if str(channel_id) in [str(c) for c in guild_config.get("whitelisted_channels", [])]:
+        matched.append("whitelisted")
+    matched = [tier for tier in matched if tier in tiers]
+
+    if not matched:
+        return policy, None
+
+    tier = max(matched, key=lambda name: tiers[name].get("user_requests_per_minute", 0))
+    return {**policy, **tiers[tier]}, tier
+
+
+def _get_quota_scope(guild_id: Optional[int], user_id: Optional[int]) -> str:
+    """Who shares a quota: the guild, or the user alone in DMs"""
+    return str(guild_id) if guild_id else f"dm:{user_id}"
+
+
+def _get_usage_key(scope: str, day: Optional[str] = None) -> str:
+    """Generate Redis key for daily usage of a quota scope (UTC day)"""
+    day = day or datetime.now(timezone.utc).strftime("%Y%m%d")
+    return f"quota:usage:{scope}:{day}"
+
+
+def _seconds_until_utc_midnight() -> int:
+    """Seconds until daily quotas reset"""
+    return 86400 - int(time.time()) % 86400
+
+
+async def check_quota(guild_id: Optional[int], user_id: int, channel_id: int,
+                      role_ids: Optional[List[int]] = None) -> Tuple[bool, Optional[int], Optional[str]]:
+    """
+    Check daily guild quota and take a request from the guild and user token buckets
+
+    DMs have no guild, so only the user's bucket and the user's own daily quota apply:
+    one heavy DM user cannot throttle the others.
+
+    Args:
+        guild_id: Discord guild ID, None for DMs
+        user_id: Discord user ID
+        channel_id: Discord channel ID
+        role_ids: Role IDs of the member
+
+    Returns:
+        Tuple of (is_allowed, seconds_to_wait, limit that was hit: "daily" or "minute")
+    """
+    settings = get_settings()
+    if not settings.QUOTA_ENABLED:
+        return True, None, None
+
+    try:
+        quota_config = await get_quota_config()
+        policy, tier = resolve_policy(quota_config, guild_id, channel_id, role_ids or [])
+        redis_client = await get_redis_client()
+        scope = _get_quota_scope(guild_id, user_id)
+
+        # Daily token/cost quota of the guild, or of the user in DMs
+        if policy.get("daily_tokens") or policy.get("daily_cost_usd"):
+            usage = await redis_client.hgetall(_get_usage_key(scope))
+            tokens = int(usage.get("tokens", 0))
+            cost_usd = int(usage.get("cost_micro_usd", 0)) / 1_000_000
+            if (policy.get("daily_tokens") and tokens >= policy["daily_tokens"]) or \
+                    (policy.get("daily_cost_usd") and cost_usd >= policy["daily_cost_usd"]):
+                logger.warning(f"Daily quota exhausted - {scope}: {tokens} tokens, ${cost_usd:.4f}")
+                return False, _seconds_until_utc_midnight(), "daily"
+
+        # Per-minute token buckets: guild budget and per-user budget of the member tier
+        keys, args = [], [time.time()]
+        if guild_id and policy.get("requests_per_minute"):
+            keys.append(f"quota:bucket:guild:{guild_id}")
+            args += [policy.get("burst") or policy["requests_per_minute"], policy["requests_per_minute"] / 60]
+        if policy.get("user_requests_per_minute"):
+            keys.append(f"quota:bucket:user:{guild_id or 'dm'}:{user_id}")
+            args += [policy.get("user_burst") or policy["user_requests_per_minute"], policy["user_requests_per_minute"] / 60]
+
+        if keys:
+            admitted, wait_ms = await redis_client.eval(_TAKE_SCRIPT, len(keys), *keys, *args)
+            if not admitted:
+                logger.warning(f"Quota bucket empty - guild {guild_id}, user {user_id}, tier {tier}")
+                return False, max(1, int(wait_ms) // 1000 + 1), "minute"
+
+        return True, None, None
+
+    except Exception as e:
+        logger.error(f"Quota check error: {e}")
+        # On error, allow the request (fail open)
+        return True, None, None
+
+
+async def record_quota_usage(guild_id: Optional[int], tokens: int, cost_usd: float, user_id: Optional[int] = None):
+    """Charge OpenAI usage of an answered question to the daily guild quota, or the user's in DMs"""
+    settings = get_settings()
+    if not settings.QUOTA_ENABLED or not tokens:
+        return
+
+    try:
+        redis_client = await get_redis_client()
+        usage_key = _get_usage_key(_get_quota_scope(guild_id, user_id))
+        pipe = redis_client.pipeline()
+        pipe.hincrby(usage_key, "tokens", tokens)
+        pipe.hincrby(usage_key, "cost_micro_usd", int(cost_usd * 1_000_000))
+        pipe.hincrby(usage_key, "questions", 1)
+        pipe.expire(usage_key, 2 * 86400)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Quota usage record error: {e}")
+
+
+async def get_quota_usage(guild_id: Optional[int], day: Optional[str] = None, user_id: Optional[int] = None) -> Dict:
+    """Get daily usage of a guild, or of a user in DMs"""
+    try:
+        redis_client = await get_redis_client()
+        usage = await redis_client.hgetall(_get_usage_key(_get_quota_scope(guild_id, user_id), day))
+        return {
+            "questions": int(usage.get("questions", 0)),
+            "tokens": int(usage.get("tokens", 0)),
+            "cost_usd": int(usage.get("cost_micro_usd", 0)) / 1_000_000
+        }
+    except Exception as e:
+        logger.error(f"Quota usage error: {e}")
+        return {"questions": 0, "tokens": 0, "cost_usd": 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from app.init.redis import init_redis_client
+
+    parser = argparse.ArgumentParser(description="Manage guild quotas stored in Redis")
+    parser.add_argument("--show", action="store_true", help="Print current quota config")
+    parser.add_argument("--set", dest="config_file", default=None, help="Load quota config from a JSON file")
+    parser.add_argument("--usage", default=None, help="Print today's usage of a guild ID, or 'dm:<user_id>' for a user's DMs")
+    args = parser.parse_args()
+
+    async def run():
+        await init_redis_client(get_settings().REDIS_URL)
+        if args.config_file:
+            with open(args.config_file, encoding="utf-8") as f:
+                await set_quota_config(json.load(f))
+            print("Quota config updated")
+        if args.show:
+            print(json.dumps(await get_quota_config(refresh=True), indent=2))
+        if args.usage:
+            if args.usage.startswith("dm:"):
+                print(await get_quota_usage(None, user_id=int(args.usage[3:])))
+            else:
+                print(await get_quota_usage(int(args.usage)))
+
+    asyncio.run(run())
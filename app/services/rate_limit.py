@@ -6,11 +6,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Get settings
-config = get_settings()
-USER_LIMIT_PER_MINUTE = config.USER_RATE_LIMIT_PER_MINUTE
-CHANNEL_LIMIT_PER_MINUTE = config.CHANNEL_RATE_LIMIT_PER_MINUTE
-RATE_LIMIT_TTL = config.RATE_LIMIT_TTL
+
+def _get_limits() -> Tuple[int, int, int]:
+    """Get user limit, channel limit and counter TTL from config"""
+    config = get_settings()
+    return config.USER_RATE_LIMIT_PER_MINUTE, config.CHANNEL_RATE_LIMIT_PER_MINUTE, config.RATE_LIMIT_TTL
 
 
 def _get_current_minute_window() -> int:
@@ -37,6 +37,7 @@ async def check_rate_limit(user_id: int, channel_id: int) -> Tuple[bool, Optiona
     Returns:
         Tuple of (is_allowed: bool, seconds_to_wait: Optional[int])
     """
+    user_limit, channel_limit, rate_limit_ttl = _get_limits()
     try:
         redis_client = await get_redis_client()
         user_key, channel_key = _get_rate_limit_keys(user_id, channel_id)
@@ -51,8 +52,8 @@ async def check_rate_limit(user_id: int, channel_id: int) -> Tuple[bool, Optiona
         channel_count = int(current_counts[1] or 0)
         
         # Check limits
-        user_limit_exceeded = user_count >= USER_LIMIT_PER_MINUTE
-        channel_limit_exceeded = channel_count >= CHANNEL_LIMIT_PER_MINUTE
+        user_limit_exceeded = user_count >= user_limit
+        channel_limit_exceeded = channel_count >= channel_limit
         
         if user_limit_exceeded or channel_limit_exceeded:
             # Calculate seconds to wait (until next minute window)
@@ -64,7 +65,7 @@ async def check_rate_limit(user_id: int, channel_id: int) -> Tuple[bool, Optiona
             limit_type = "user" if user_limit_exceeded else "channel"
             limit_id = user_id if user_limit_exceeded else channel_id
             current_limit = user_count if user_limit_exceeded else channel_count
-            max_limit = USER_LIMIT_PER_MINUTE if user_limit_exceeded else CHANNEL_LIMIT_PER_MINUTE
+            max_limit = user_limit if user_limit_exceeded else channel_limit
             
             logger.warning(f"Rate limit exceeded - {limit_type} {limit_id}: {current_limit}/{max_limit}")
             
@@ -75,16 +76,16 @@ async def check_rate_limit(user_id: int, channel_id: int) -> Tuple[bool, Optiona
         
         # Increment user counter
         pipe.incr(user_key)
-        pipe.expire(user_key, RATE_LIMIT_TTL)
+        pipe.expire(user_key, rate_limit_ttl)
         
         # Increment channel counter  
         pipe.incr(channel_key)
-        pipe.expire(channel_key, RATE_LIMIT_TTL)
+        pipe.expire(channel_key, rate_limit_ttl)
         
         await pipe.execute()
         
-        logger.debug(f"Rate limit check passed - user {user_id}: {user_count + 1}/{USER_LIMIT_PER_MINUTE}, "
-                    f"channel {channel_id}: {channel_count + 1}/{CHANNEL_LIMIT_PER_MINUTE}")
+        logger.debug(f"Rate limit check passed - user {user_id}: {user_count + 1}/{user_limit}, "
+                    f"channel {channel_id}: {channel_count + 1}/{channel_limit}")
         
         return True, None
         
@@ -101,6 +102,7 @@ async def get_rate_limit_status(user_id: int, channel_id: int) -> dict:
     Returns:
         Dict with current usage and limits
     """
+    user_limit, channel_limit, rate_limit_ttl = _get_limits()
     try:
         redis_client = await get_redis_client()
         user_key, channel_key = _get_rate_limit_keys(user_id, channel_id)
@@ -117,22 +119,22 @@ async def get_rate_limit_status(user_id: int, channel_id: int) -> dict:
         return {
             "user": {
                 "current": user_count,
-                "limit": USER_LIMIT_PER_MINUTE,
-                "remaining": max(0, USER_LIMIT_PER_MINUTE - user_count)
+                "limit": user_limit,
+                "remaining": max(0, user_limit - user_count)
             },
             "channel": {
                 "current": channel_count,
-                "limit": CHANNEL_LIMIT_PER_MINUTE,
-                "remaining": max(0, CHANNEL_LIMIT_PER_MINUTE - channel_count)
+                "limit": channel_limit,
+                "remaining": max(0, channel_limit - channel_count)
             },
-            "window_resets_in": RATE_LIMIT_TTL - (int(time.time()) % 60)
+            "window_resets_in": rate_limit_ttl - (int(time.time()) % 60)
         }
         
     except Exception as e:
         logger.error(f"Rate limit status error: {e}")
         return {
-            "user": {"current": 0, "limit": USER_LIMIT_PER_MINUTE, "remaining": USER_LIMIT_PER_MINUTE},
-            "channel": {"current": 0, "limit": CHANNEL_LIMIT_PER_MINUTE, "remaining": CHANNEL_LIMIT_PER_MINUTE},
+            "user": {"current": 0, "limit": user_limit, "remaining": user_limit},
+            "channel": {"current": 0, "limit": channel_limit, "remaining": channel_limit},
             "window_resets_in": 60
         }
 
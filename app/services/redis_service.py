@@ -1,5 +1,7 @@
 import json
 import hashlib
+import re
+import time
 from typing import List, Dict, Optional
 from app.init.redis import get_redis_client
 from app.init.config import get_settings
@@ -7,9 +9,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Get cache TTL from config
-config = get_settings()
-CACHE_TTL = config.CACHE_TTL_SECONDS
+
+def _cache_ttl(multiplier: int = 1) -> int:
+    """Cache TTL from config, read at call time"""
+    return get_settings().CACHE_TTL_SECONDS * multiplier
 
 
 def _normalize_query(query: str) -> str:
@@ -17,6 +20,12 @@ def _normalize_query(query: str) -> str:
     return query.lower().strip()
 
 
+def normalize_question(question: str) -> str:
+    """Normalize question for frequency counting and answer caching"""
+    question = re.sub(r'\s+', ' ', _normalize_query(question))
+    return question.strip(' ?!.')
+
+
 def _generate_cache_key(query: str) -> str:
     """Generate cache key for title search"""
     normalized_query = _normalize_query(query)
@@ -44,7 +53,7 @@ async def get_cached_documents(query: str) -> Optional[List[Dict]]:
         return None
 
 
-async def cache_documents(query: str, documents: List[Dict], ttl: int = CACHE_TTL):
+async def cache_documents(query: str, documents: List[Dict], ttl: int = None):
     """Cache documents in Redis"""
     try:
         redis_client = await get_redis_client()
@@ -54,7 +63,7 @@ async def cache_documents(query: str, documents: List[Dict], ttl: int = CACHE_TT
         cached_data = json.dumps(documents, ensure_ascii=False)
         
         # Set with TTL
-        await redis_client.setex(cache_key, ttl, cached_data)
+        await redis_client.setex(cache_key, ttl or _cache_ttl(), cached_data)
         
         logger.debug(f"Cached {len(documents)} documents for query: {query[:50]}...")
         
@@ -81,7 +90,7 @@ async def get_cached_categories() -> Optional[List[Dict]]:
         return None
 
 
-async def cache_categories(categories: List[Dict], ttl: int = CACHE_TTL * 24):  # Longer TTL for categories
+async def cache_categories(categories: List[Dict], ttl: int = None):  # Longer TTL for categories
     """Cache categories in Redis"""
     try:
         redis_client = await get_redis_client()
@@ -91,7 +100,7 @@ async def cache_categories(categories: List[Dict], ttl: int = CACHE_TTL * 24):
         cached_data = json.dumps(categories, ensure_ascii=False)
         
         # Set with TTL (24x longer than regular cache)
-        await redis_client.setex(cache_key, ttl, cached_data)
+        await redis_client.setex(cache_key, ttl or _cache_ttl(24), cached_data)
         
         logger.debug(f"Cached {len(categories)} categories")
         
@@ -130,7 +139,7 @@ async def get_cached_titles(categories: List[str]) -> Optional[List[Dict]]:
         return None
 
 
-async def cache_titles_by_category(titles_by_category: Dict[str, List[Dict]], ttl: int = CACHE_TTL * 24):
+async def cache_titles_by_category(titles_by_category: Dict[str, List[Dict]], ttl: int = None):
     """Cache titles by category in Redis"""
     try:
         redis_client = await get_redis_client()
@@ -142,7 +151,7 @@ async def cache_titles_by_category(titles_by_category: Dict[str, List[Dict]], tt
             cached_data = json.dumps(titles, ensure_ascii=False)
             
             # Set with TTL (12x longer than regular cache)
-            await redis_client.setex(cache_key, ttl, cached_data)
+            await redis_client.setex(cache_key, ttl or _cache_ttl(24), cached_data)
             
             logger.debug(f"Cached {len(titles)} titles for category: {category}")
         
@@ -184,7 +193,7 @@ async def get_cached_documents_by_title_category(titles: List[str], categories:
         return None
 
 
-async def cache_documents_by_title_category(documents: List[Dict], ttl: int = CACHE_TTL * 24):
+async def cache_documents_by_title_category(documents: List[Dict], ttl: int = None):
     """Cache documents by title and category in Redis"""
     try:
         redis_client = await get_redis_client()
@@ -208,7 +217,7 @@ async def cache_documents_by_title_category(documents: List[Dict], ttl: int = CA
             cached_data = json.dumps(docs, ensure_ascii=False)
             
             # Set with TTL (24 hours)
-            await redis_client.setex(cache_key, ttl, cached_data)
+            await redis_client.setex(cache_key, ttl or _cache_ttl(24), cached_data)
             
             logger.debug(f"Cached {len(docs)} documents for key: {key}")
         
@@ -258,4 +267,165 @@ async def get_cache_stats() -> Dict[str, int]:
         
     except Exception as e:
         logger.error(f"Error getting cache stats: {e}")
-        return {"title_search_entries": 0, "memory_used_bytes": 0, "memory_used_human": "0B"}
\ No newline at end of file
+        return {"title_search_entries": 0, "memory_used_bytes": 0, "memory_used_human": "0B"}
+
+
+async def get_conversation_state(conversation_key: str) -> Optional[Dict]:
+    """Get conversation state (last documents, rolling summary) from Redis"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = await redis_client.get(f"conversation:{conversation_key}")
+        if cached_data:
+            logger.debug(f"Conversation state hit: {conversation_key}")
+            return json.loads(cached_data)
+        
+        return None
+        
+    except Exception as e:
+        logger.error(f"Error getting conversation state: {e}")
+        return None
+
+
+async def save_conversation_state(conversation_key: str, state: Dict, ttl: int = None):
+    """Save conversation state in Redis"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = json.dumps(state, ensure_ascii=False)
+        await redis_client.setex(f"conversation:{conversation_key}", ttl or get_settings().CONVERSATION_TTL_SECONDS, cached_data)
+        
+        logger.debug(f"Saved conversation state: {conversation_key}")
+        
+    except Exception as e:
+        logger.error(f"Error saving conversation state: {e}")
+
+
+async def get_cached_corpus_version() -> Optional[str]:
+    """Get last known corpus version from Redis"""
+    try:
+        redis_client = await get_redis_client()
+        return await redis_client.get("corpus:version")
+        
+    except Exception as e:
+        logger.error(f"Error getting corpus version: {e}")
+        return None
+
+
+async def cache_corpus_version(version: str, ttl: int = None):
+    """Cache corpus version, the TTL bounds how long a docs change goes unnoticed"""
+    try:
+        redis_client = await get_redis_client()
+        await redis_client.setex("corpus:version", ttl or get_settings().CORPUS_VERSION_TTL_SECONDS, version)
+        
+    except Exception as e:
+        logger.error(f"Error caching corpus version: {e}")
+
+
+def _question_keys(days: int) -> List[str]:
+    """Daily question count keys, today first"""
+    today = int(time.time()) // 86400
+    return [f"faq:questions:{day}" for day in range(today, today - days, -1)]
+
+
+async def record_question(question: str):
+    """Count normalized question for FAQ warm-up in today's bounded, expiring sorted set"""
+    try:
+        config = get_settings()
+        key = _question_keys(1)[0]
+        redis_client = await get_redis_client()
+        pipe = redis_client.pipeline()
+        pipe.zincrby(key, 1, normalize_question(question))
+        pipe.expire(key, config.FAQ_QUESTION_DAYS * 86400)
+        pipe.zcard(key)
+        _, _, size = await pipe.execute()
+        
+        # Trim back to the cap only past twice the cap, so new questions get time
+        # to build a count before the least frequent are removed
+        if size > 2 * config.FAQ_QUESTIONS_PER_DAY:
+            await redis_client.zremrangebyrank(key, 0, -config.FAQ_QUESTIONS_PER_DAY - 1)
+        
+    except Exception as e:
+        logger.error(f"Error recording question: {e}")
+
+
+async def get_top_questions(limit: int) -> List[str]:
+    """Get most frequent normalized questions over the last FAQ_QUESTION_DAYS days"""
+    try:
+        redis_client = await get_redis_client()
+        # One transaction, so concurrent callers never see each other's temporary union
+        pipe = redis_client.pipeline()
+        pipe.zunionstore("faq:questions:top", _question_keys(get_settings().FAQ_QUESTION_DAYS))
+        pipe.zrevrange("faq:questions:top", 0, limit - 1)
+        pipe.delete("faq:questions:top")
+        _, questions, _ = await pipe.execute()
+        return questions
+        
+    except Exception as e:
+        logger.error(f"Error getting top questions: {e}")
+        return []
+
+
+def _generate_answer_key(question: str, corpus_version: str) -> str:
+    """Generate answer cache key, bound to corpus version"""
+    question_hash = hashlib.md5(normalize_question(question).encode()).hexdigest()
+    return f"answer:{corpus_version}:{question_hash}"
+
+
+async def get_cached_answer(question: str, corpus_version: str) -> Optional[Dict]:
+    """Get precomputed answer with the documents it was built from"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = await redis_client.get(_generate_answer_key(question, corpus_version))
+        if cached_data:
+            logger.debug(f"Answer cache hit for question: {question[:50]}...")
+            return json.loads(cached_data)
+        
+        return None
+        
+    except Exception as e:
+        logger.error(f"Error getting cached answer: {e}")
+        return None
+
+
+async def cache_answer(question: str, corpus_version: str, answer: Dict, ttl: int = None):
+    """Cache precomputed answer for current corpus version"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = json.dumps(answer, ensure_ascii=False)
+        await redis_client.setex(_generate_answer_key(question, corpus_version), ttl or get_settings().FAQ_ANSWER_TTL_SECONDS, cached_data)
+        
+        logger.debug(f"Cached answer for question: {question[:50]}...")
+        
+    except Exception as e:
+        logger.error(f"Error caching answer: {e}")
+
+
+async def get_cached_planner_index(version: str) -> Optional[Dict]:
+    """Get planner documentation index built for a document table version"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = await redis_client.get(f"planner_index:{version}")
+        if cached_data:
+            return json.loads(cached_data)
+        
+        return None
+        
+    except Exception as e:
+        logger.error(f"Error getting cached planner index: {e}")
+        return None
+
+
+async def cache_planner_index(version: str, index: Dict, ttl: int = None):
+    """Cache planner documentation index, the version in the key invalidates it"""
+    try:
+        redis_client = await get_redis_client()
+        
+        cached_data = json.dumps(index, ensure_ascii=False)
+        await redis_client.setex(f"planner_index:{version}", ttl or _cache_ttl(7), cached_data)
+        
+    except Exception as e:
+        logger.error(f"Error caching planner index: {e}")
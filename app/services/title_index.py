@@ -0,0 +1,196 @@
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set
+from app.agent.utils import DocumentRetriever
+from app.init.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Trigram overlap a fuzzy match needs, as a fraction of the query trigrams
+MIN_TRIGRAM_SCORE = 0.3
+
+# Prefix matches gathered before ranking, bounds work for one-letter queries
+MAX_PREFIX_CANDIDATES = 200
+
+# Suggestions kept per index - users typing the same prefixes is the common case under load
+SUGGESTION_CACHE_SIZE = 4096
+
+
+def _normalize(text: str) -> str:
+    """Lowercase words separated by single spaces"""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Trigrams of each word padded like pg_trgm, so short words still match"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """In-memory prefix and trigram index over document titles for autocomplete"""
+
+    def __init__(self, documents: List[Dict]):
+        # One entry per (title, category), the lowest id, so no two choices look the same
+        unique = {}
+        for doc in sorted(documents, key=lambda doc: doc['id']):
+            unique.setdefault((doc['title'], doc['category']), doc)
+        documents = list(unique.values())
+
+        self.documents = documents
+        self.by_id = {doc['id']: doc for doc in documents}
+        self.normalized = [_normalize(doc['title']) for doc in documents]
+
+        # Every word start of every title, sorted, so a prefix of any word is one bisect range
+        self.keys = sorted(
+            (title[match.start():], i)
+            for i, title in enumerate(self.normalized)
+            for match in re.finditer(r"\S+", title)
+        )
+
+        self.postings: Dict[str, List[int]] = {}
+        for i, title in enumerate(self.normalized):
+            for gram in _trigrams(title):
+                self.postings.setdefault(gram, []).append(i)
+
+        self.alphabetical = sorted(range(len(documents)), key=lambda i: self.normalized[i])
+        self._suggestions: Dict[tuple, List[Dict]] = {}
+
+    def suggest(self, query: str, limit: int = 25) -> List[Dict]:
+        """
+        Titles matching what the user typed so far
+
+        Titles starting with the query come first, then titles with a word starting with it,
+        then fuzzy trigram matches for typos and words in a different order.
+        """
+        query = _normalize(query)
+        cached = self._suggestions.get((query, limit))
+        if cached is not None:
+            return cached
+
+        if len(self._suggestions) >= SUGGESTION_CACHE_SIZE:
+            self._suggestions.clear()
+        suggestions = self._suggestions[(query, limit)] = [self.documents[i] for i in self._match(query, limit)]
+        return suggestions
+
+    def _match(self, query: str, limit: int) -> List[int]:
+        """Indices of documents matching a normalized query, best first"""
+        if not query:
+            return self.alphabetical[:limit]
+
+        candidates = []
+        seen = set()
+        position = bisect_left(self.keys, (query,))
+        while position < len(self.keys) and len(candidates) < MAX_PREFIX_CANDIDATES:
+            key, i = self.keys[position]
+            if not key.startswith(query):
+                break
+            if i not in seen:
+                seen.add(i)
+                candidates.append(i)
+            position += 1
+
+        candidates.sort(key=lambda i: (not self.normalized[i].startswith(query), len(self.normalized[i])))
+        results = candidates[:limit]
+
+        if len(results) < limit:
+            grams = _trigrams(query)
+            counts = Counter(i for gram in grams for i in self.postings.get(gram, ()) if i not in seen)
+            fuzzy = [i for i, count in counts.most_common() if count / len(grams) >= MIN_TRIGRAM_SCORE]
+            results += fuzzy[:limit - len(results)]
+
+        return results
+
+    def resolve(self, value: str) -> Optional[Dict]:
+        """Document chosen from autocomplete ('#id'), or the best match for free text"""
+        if value.startswith("#") and value[1:].isdigit() and int(value[1:]) in self.by_id:
+            return self.by_id[int(value[1:])]
+        matches = self.suggest(value, limit=1)
+        return matches[0] if matches else None
+
+
+class TitleAutocomplete:
+    """Title index kept current with the corpus, never waiting on the network when asked for it"""
+
+    def __init__(self, retriever: DocumentRetriever = None):
+        self.config = get_settings()
+        self.retriever = retriever or DocumentRetriever()
+        self.index: Optional[TitleIndex] = None
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Rebuild the index from the database if the corpus version changed
+
+        Titles are read from Postgres, not the Redis titles cache, which can still hold
+        the previous corpus right after a change.
+        """
+        async with self._lock:
+            try:
+                version = await self.retriever.get_corpus_version()
+                if self.index is None or (version and version != self.version):
+                    documents = await self.retriever.get_all_titles()
+                    if documents:
+                        start = time.perf_counter()
+                        self.index = TitleIndex(documents)
+                        self.version = version
+                        logger.info(f"Title index built: {len(documents)} titles in {(time.perf_counter() - start) * 1000:.1f}ms")
+            except Exception as e:
+                logger.error(f"Title index refresh error: {e}")
+            self._checked_at = time.monotonic()
+
+    def get_index(self) -> Optional[TitleIndex]:
+        """Current index; loading and version checks are scheduled in the background"""
+        if self.index is None or time.monotonic() - self._checked_at >= self.config.CORPUS_VERSION_TTL_SECONDS:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh())
+        return self.index
+
+    async def close(self):
+        """Cancel a background refresh still in progress"""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+
+
+if __name__ == "__main__":
+    # Benchmark: suggestion latency on a synthetic title set
+    import random
+
+    words = ["encrypted", "types", "access", "control", "decryption", "oracle", "relayer", "hardhat", "deploy",
+             "contract", "input", "proof", "gateway", "key", "management", "token", "auction", "branching"]
+    rng = random.Random(0)
+    documents = [
+        {"id": i, "title": " ".join(w.capitalize() for w in rng.sample(words, rng.randint(2, 5))), "category": f"category-{i % 8}"}
+        for i in range(2000)
+    ]
+
+    start = time.perf_counter()
+    index = TitleIndex(documents)
+    print(f"Built index over {len(documents)} titles in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    queries = ["", "e", "enc", "encrypted ty", "acess contrl", "token auction", "zzz"]
+    for name, cached in (("uncached", False), ("cached", True)):
+        latencies = []
+        for _ in range(200):
+            for query in queries:
+                if not cached:
+                    index._suggestions.clear()
+                start = time.perf_counter()
+                index.suggest(query)
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"suggest {name:<8} p50={latencies[len(latencies) // 2] * 1000:.3f}ms "
+              f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.3f}ms max={latencies[-1] * 1000:.3f}ms")
+    for query in queries[1:]:
+        print(f"{query!r:16} -> {[doc['title'] for doc in index.suggest(query, limit=3)]}")
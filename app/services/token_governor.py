@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from app.init.redis import get_redis_client
+from app.init.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency, fall back to a character heuristic
+    tiktoken = None
+
+# Priorities: low-priority calls (query rewrite) only get a share of the budget and are shed first
+HIGH_PRIORITY = "high"
+LOW_PRIORITY = "low"
+
+# Reserve tokens and a request in one round trip, only if both fit under the limits
+_RESERVE_SCRIPT = """
+local tokens = tonumber(redis.call('GET', KEYS[1]) or '0')
+local requests = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tokens + tonumber(ARGV[1]) > tonumber(ARGV[2]) or requests + 1 > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+
+class RateGovernorError(Exception):
+    """Raised when a call is shed to stay under provider TPM/RPM limits"""
+
+
+def estimate_tokens(content: Union[str, List[Dict]]) -> int:
+    """Estimate prompt tokens for a text or chat messages before sending"""
+    if isinstance(content, str):
+        texts = [content]
+        overhead = 0
+    else:
+        texts = [str(message.get('content', '')) for message in content]
+        overhead = 4 * len(content) + 3  # Per-message framing tokens
+
+    if tiktoken is not None:
+        encoding = tiktoken.get_encoding("o200k_base")
+        return overhead + sum(len(encoding.encode(text)) for text in texts)
+    return overhead + sum(len(text) for text in texts) // 4 + 1
+
+
+def _get_budget_keys(model: str, minute_window: int) -> Tuple[str, str]:
+    """Generate Redis keys for model token and request budgets"""
+    return (
+        f"openai_budget:{model}:tokens:{minute_window}",
+        f"openai_budget:{model}:requests:{minute_window}"
+    )
+
+
+async def reserve(model: str, tokens: int, priority: str = HIGH_PRIORITY, wait: bool = True) -> Optional[Tuple[str, int]]:
+    """
+    Reserve tokens and one request in the shared per-minute budget of a model
+
+    High-priority calls wait for the next window up to OPENAI_GOVERNOR_MAX_WAIT seconds,
+    low-priority calls are shed immediately when their share of the budget is used.
+
+    Args:
+        model: Model the budget belongs to
+        tokens: Estimated prompt tokens plus completion reservation
+        priority: HIGH_PRIORITY or LOW_PRIORITY
+        wait: Queue for the next window when allowed, False sheds immediately (retries inside a time budget)
+
+    Returns:
+        Reservation to settle after the call, None when the governor is disabled or Redis fails
+
+    Raises:
+        RateGovernorError: call was shed
+    """
+    config = get_settings()
+    if not config.OPENAI_TPM_LIMIT and not config.OPENAI_RPM_LIMIT:
+        return None
+
+    share = config.OPENAI_GOVERNOR_HEADROOM
+    if priority == LOW_PRIORITY:
+        share *= config.OPENAI_GOVERNOR_LOW_PRIORITY_SHARE
+    token_limit = int(config.OPENAI_TPM_LIMIT * share) if config.OPENAI_TPM_LIMIT else 2 ** 62
+    request_limit = int(config.OPENAI_RPM_LIMIT * share) if config.OPENAI_RPM_LIMIT else 2 ** 62
+
+    deadline = time.monotonic() + config.OPENAI_GOVERNOR_MAX_WAIT
+    try:
+        redis_client = await get_redis_client()
+        while True:
+            minute_window = int(time.time()) // 60
+            token_key, request_key = _get_budget_keys(model, minute_window)
+            admitted = await redis_client.eval(
+                _RESERVE_SCRIPT, 2, token_key, request_key,
+                tokens, token_limit, request_limit, 120
+            )
+            if admitted:
+                return token_key, tokens
+
+            wait_seconds = (minute_window + 1) * 60 - time.time()
+            if priority == LOW_PRIORITY or not wait or time.monotonic() + wait_seconds > deadline:
+                logger.warning(f"OpenAI budget exhausted for {model}, shedding {priority} priority call ({tokens} tokens)")
+                raise RateGovernorError(f"OpenAI budget exhausted for {model}")
+
+            logger.info(f"OpenAI budget exhausted for {model}, queueing call for {wait_seconds:.1f}s")
+            await asyncio.sleep(wait_seconds)
+
+    except RateGovernorError:
+        raise
+    except Exception as e:
+        logger.error(f"Token governor error: {e}")
+        # On error, allow the call (fail open)
+        return None
+
+
+async def settle(reservation: Optional[Tuple[str, int]], actual_tokens: int):
+    """Correct the reserved token count with the usage reported by the provider"""
+    if reservation is None:
+        return
+
+    try:
+        token_key, reserved_tokens = reservation
+        redis_client = await get_redis_client()
+        await redis_client.incrby(token_key, actual_tokens - reserved_tokens)
+    except Exception as e:
+        logger.error(f"Token governor settle error: {e}")